@@ -0,0 +1,30 @@
+"""
+Config de gunicorn:  gunicorn -c gunicorn.conf.py
+
+SERVER_MODE=wsgi (default): workers sync, un request por worker a la vez.
+SERVER_MODE=asgi: workers uvicorn sobre asgi.py. Las vistas async (keep-alive, feed SSE, estado en
+vivo) esperan sin ocupar el worker, así que cada uno sostiene cientos de conexiones; las sync
+corren en el pool de threads de asgiref.
+
+Comparar los dos modos: manage.py loadtest_connections --spawn wsgi asgi
+"""
+import multiprocessing
+import os
+
+mode = os.getenv("SERVER_MODE", "wsgi")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 4)))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 20
+keepalive = 5
+accesslog = "-" if os.getenv("GUNICORN_ACCESS_LOG") else None
+
+if mode == "asgi":
+    wsgi_app = "subasta_backend.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+elif mode == "wsgi":
+    wsgi_app = "subasta_backend.wsgi:application"
+    worker_class = "sync"
+else:
+    raise RuntimeError(f"SERVER_MODE must be 'wsgi' or 'asgi', not {mode!r}")
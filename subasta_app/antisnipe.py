@@ -0,0 +1,58 @@
+"""
+Anti-snipe (regla `anti_snipe_sec`): una oferta válida que llega a menos de N segundos del
+vencimiento del claim lo corre a `momento de la oferta + N`.
+
+La extensión es un solo UPDATE condicional (solo si el vencimiento nuevo es posterior al actual y
+el claim sigue abierto), así que con ofertas concurrentes el vencimiento solo avanza y ninguna
+extensión se pierde ni pisa a otra más tardía. El nuevo vencimiento se publica en el feed en vivo
+y se encola para el servicio de WhatsApp (outbox); el scheduler lo toma de la base en su próximo tick.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.db import transaction
+
+from . import auction_config, events, outbox, versioning
+from .models import Item
+
+RULE = "anti_snipe_sec"
+
+
+def window(auction_id: int) -> Optional[timedelta]:
+    """Ventana anti-snipe de la subasta (desde el bundle cacheado), o None si no tiene."""
+    bundle = auction_config.get_bundle(auction_id)
+    seconds = (bundle or {}).get("rules", {}).get(RULE)
+    if isinstance(seconds, bool) or not isinstance(seconds, int) or seconds <= 0:
+        return None
+    return timedelta(seconds=seconds)
+
+
+def extend(item_id: int, bid_at: datetime, snipe_window: timedelta) -> Optional[datetime]:
+    """Corre el vencimiento a bid_at + ventana si cae dentro de la ventana. Devuelve el nuevo o None."""
+    deadline = bid_at + snipe_window
+    updated = Item.objects.filter(
+        pk=item_id,
+        is_sold=False,
+        claim_closed_at__isnull=True,
+        claim_expires_at__gte=bid_at,  # ya vencido: no se revive
+        claim_expires_at__lt=deadline,
+    ).update(claim_expires_at=deadline)
+    if not updated:
+        return None
+    versioning.touch(item_ids=[item_id])
+    return deadline
+
+
+def on_bid(auction_id: int, item_id: int, bid_at: datetime) -> Optional[datetime]:
+    """Aplica la regla para una oferta aceptada. Devuelve el nuevo vencimiento si hubo extensión."""
+    snipe_window = window(auction_id)
+    if snipe_window is None:
+        return None
+    # El lock de la fila que toma el UPDATE cubre también el encolado: las extensiones de un item
+    # llegan al outbox en el mismo orden en que se aplicaron
+    with transaction.atomic():
+        deadline = extend(item_id, bid_at, snipe_window)
+        if deadline is not None:
+            outbox.enqueue_claim_extension(auction_id, item_id, deadline)
+            events.claim_extended(auction_id, item_id, deadline)
+    return deadline
@@ -0,0 +1,88 @@
+"""
+Bundle de configuración por subasta para el servicio de WhatsApp: reglas ya tipadas + templates.
+
+Se guarda en el cache de Django; lo invalidan las señales de Rule / MessageTemplate (signals.py).
+Con el cache local por proceso (sin CACHE_REDIS_URL) la invalidación solo limpia el worker que hizo
+el cambio, así que ahí el bundle se cachea unos segundos y no una hora. La versión es un hash del
+contenido, así que sirve como ETag aunque el cache se vacíe.
+"""
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Auction, MessageTemplate, Rule
+
+CACHE_TIMEOUT = 60 * 60
+LOCAL_CACHE_TIMEOUT = 5
+
+# Tipos de las reglas conocidas; el resto se infiere (int, decimal, bool o texto)
+RULE_TYPES = {
+    "claim_keyword": str,
+    "min_increment": Decimal,
+    "anti_snipe_sec": int,
+}
+
+
+def _cache_key(auction_id: int) -> str:
+    return f"auction-config:{auction_id}"
+
+
+def shared_cache() -> bool:
+    return not settings.CACHES["default"]["BACKEND"].endswith(".LocMemCache")
+
+
+def cache_timeout() -> int:
+    return CACHE_TIMEOUT if shared_cache() else LOCAL_CACHE_TIMEOUT
+
+
+def _infer(value: str) -> Any:
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    for cast in (int, Decimal):
+        try:
+            return cast(value)
+        except (ValueError, InvalidOperation):
+            pass
+    return value
+
+
+def parse_rule(key: str, value: str) -> Any:
+    cast = RULE_TYPES.get(key)
+    if cast is None:
+        return _infer(value)
+    try:
+        return cast(value)
+    except (ValueError, InvalidOperation):
+        return value  # valor mal cargado: lo devolvemos crudo
+
+
+def build_bundle(auction_id: int) -> Dict[str, Any]:
+    rules = {r.key: parse_rule(r.key, r.value) for r in Rule.objects.filter(auction_id=auction_id).order_by("key")}
+    templates = dict(
+        MessageTemplate.objects.filter(auction_id=auction_id).order_by("key").values_list("key", "template")
+    )
+    bundle = {"auction_id": auction_id, "rules": rules, "templates": templates}
+    payload = json.dumps(bundle, sort_keys=True, default=str)
+    # Decimal -> str para que el JSON de la respuesta sea igual al que se hashea
+    bundle = json.loads(payload)
+    bundle["version"] = hashlib.sha1(payload.encode()).hexdigest()[:16]
+    return bundle
+
+
+def get_bundle(auction_id: int) -> Optional[Dict[str, Any]]:
+    """Bundle desde el cache (o la base si no está). None si la subasta no existe."""
+    bundle = cache.get(_cache_key(auction_id))
+    if bundle is None:
+        if not Auction.objects.filter(pk=auction_id).exists():
+            return None
+        bundle = build_bundle(auction_id)
+        cache.set(_cache_key(auction_id), bundle, cache_timeout())
+    return bundle
+
+
+def invalidate(auction_id: int):
+    cache.delete(_cache_key(auction_id))
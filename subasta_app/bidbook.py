@@ -0,0 +1,323 @@
+"""
+Libro de ofertas en Redis para subastas RUNNING.
+
+Cada item cargado vive en un hash `bidbook:item:{id}` con su config (base, paso, vencimiento)
+y la mejor oferta. Un script Lua acepta/rechaza la oferta de forma atómica y encola las
+aceptadas en `bidbook:pending`; `flush()` las escribe en la tabla Bid por lotes.
+Si Redis se reinicia, `reconcile()` reconstruye el estado desde la base.
+"""
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from . import antisnipe, events, versioning
+from .bidding import min_increments
+from .models import Auction, Bid, Item, Participant, bid_summary_in_db
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "bidbook:pending"
+FLUSH_LOCK_KEY = "bidbook:flush-lock"
+
+
+# Lo que sync_item copia de la base; la mejor oferta la maneja Redis hasta el flush
+_CONFIG_FIELDS = ("base", "step", "expires", "sold", "snipe")
+
+
+def _item_key(item_id: int) -> str:
+    return f"bidbook:item:{item_id}"
+
+
+def _auction_key(auction_id: int) -> str:
+    return f"bidbook:auction:{auction_id}"
+
+
+def _msgs_key(auction_id: int) -> str:
+    return f"bidbook:auction:{auction_id}:msgs"
+
+
+def _cents(amount: Decimal) -> int:
+    return int(amount * 100)
+
+
+def _ms(dt) -> int:
+    return int(dt.timestamp() * 1000)
+
+
+# KEYS: item, auction, msgs, pending
+# ARGV: amount_cents, participant_id, msg_id, now_ms, payload
+_PLACE_LUA = """
+local item = redis.call('HGETALL', KEYS[1])
+if #item == 0 then return {'not_loaded', ''} end
+local h = {}
+for i = 1, #item, 2 do h[item[i]] = item[i + 1] end
+if ARGV[3] ~= '' and redis.call('SISMEMBER', KEYS[3], ARGV[3]) == 1 then return {'duplicate', h['highest']} end
+
+if redis.call('HGET', KEYS[2], 'status') ~= 'RUNNING' then return {'auction_not_running', ''} end
+if h['sold'] == '1' then return {'item_sold', ''} end
+local now = tonumber(ARGV[4])
+if h['expires'] ~= '' and now > tonumber(h['expires']) then return {'claim_expired', ''} end
+
+local amount = tonumber(ARGV[1])
+local required = tonumber(h['base'])
+-- paso mínimo de un centavo: igualar la mejor oferta nunca alcanza (hashes cargados con step 0)
+if h['highest'] ~= '' then required = tonumber(h['highest']) + math.max(tonumber(h['step']), 1) end
+if amount < required then return {'amount_too_low', tostring(required)} end
+
+redis.call('HSET', KEYS[1], 'highest', ARGV[1], 'participant', ARGV[2], 'last_ms', ARGV[4])
+redis.call('HINCRBY', KEYS[1], 'count', 1)
+if ARGV[3] ~= '' then redis.call('SADD', KEYS[3], ARGV[3]) end
+redis.call('RPUSH', KEYS[4], ARGV[5])
+
+-- anti-snipe: oferta dentro de la ventana -> el vencimiento pasa a now + ventana
+local snipe = tonumber(h['snipe'] or '0') or 0
+if snipe > 0 and h['expires'] ~= '' and now + snipe > tonumber(h['expires']) then
+  redis.call('HSET', KEYS[1], 'expires', tostring(now + snipe))
+  return {'accepted', ARGV[1], tostring(now + snipe)}
+end
+return {'accepted', ARGV[1]}
+"""
+
+# Carga un item solo si no está (no pisa ofertas aceptadas que todavía no se escribieron).
+# KEYS: item. ARGV: pares campo/valor
+_LOAD_IF_ABSENT_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+"""
+
+
+@dataclass
+class BookResult:
+    status: str  # accepted | duplicate | amount_too_low | claim_expired | item_sold | auction_not_running
+    amount: Optional[Decimal] = None  # oferta aceptada / mejor oferta / mínimo requerido según status
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("accepted", "duplicate")
+
+
+class BidBook:
+    def __init__(self, client: redis.Redis):
+        self.r = client
+        self._place = client.register_script(_PLACE_LUA)
+        self._load_if_absent = client.register_script(_LOAD_IF_ABSENT_LUA)
+
+    # ---- carga / reconciliación ----
+
+    def _item_fields(
+            self, item: Item, min_increment: Optional[Decimal], snipe_window: Optional[timedelta] = None,
+    ) -> Dict[str, Any]:
+        # Sin incremento configurado hay que superar la mejor oferta: un centavo (los montos van en centavos)
+        step = max(item.increment, min_increment or Decimal("0")) or Decimal("0.01")
+        return {
+            "auction": item.auction_id,
+            "base": _cents(item.base_price),
+            "step": _cents(step),
+            "expires": _ms(item.claim_expires_at) if item.claim_expires_at else "",
+            "sold": "1" if item.is_sold else "0",
+            "highest": _cents(item.highest_bid_amount) if item.highest_bid_amount is not None else "",
+            "participant": item.leading_participant_id or "",
+            "count": item.bids_count,
+            "last_ms": _ms(item.last_bid_at) if item.last_bid_at else "",
+            "snipe": int(snipe_window.total_seconds() * 1000) if snipe_window else 0,
+        }
+
+    def load_item(self, item: Item) -> bool:
+        """Carga el item si no está en Redis. Devuelve True si lo cargó."""
+        increments = min_increments([item.auction_id])
+        # Los mensajes ya registrados en la base, antes que el item: tras un reinicio de Redis un
+        # mensaje reenviado tiene que seguir contando como duplicado
+        msg_ids = list(item.bids.exclude(source_message_id="").values_list("source_message_id", flat=True))
+        if msg_ids:
+            self.r.sadd(_msgs_key(item.auction_id), *msg_ids)
+        self.r.hset(_auction_key(item.auction_id), "status", item.auction.status)
+        fields = self._item_fields(item, increments.get(item.auction_id), antisnipe.window(item.auction_id))
+        args = [v for pair in fields.items() for v in pair]
+        return bool(self._load_if_absent(keys=[_item_key(item.id)], args=args))
+
+    def sync_item(self, item: Item):
+        """Actualiza la config del item (vencimiento, vendido, etc.) sin tocar la mejor oferta."""
+        if not self.r.exists(_item_key(item.id)):
+            return
+        fields = self._item_fields(
+            item, min_increments([item.auction_id]).get(item.auction_id), antisnipe.window(item.auction_id),
+        )
+        self.r.hset(_item_key(item.id), mapping={k: fields[k] for k in _CONFIG_FIELDS})
+
+    def sync_auction_items(self, auction_id: int):
+        """sync_item para todos los items cargados de la subasta (reglas cambiadas, Node editó items)."""
+        min_increment = min_increments([auction_id]).get(auction_id)
+        snipe_window = antisnipe.window(auction_id)
+        items = list(Item.objects.filter(auction_id=auction_id))
+        pipe = self.r.pipeline()
+        for item in items:
+            pipe.exists(_item_key(item.id))
+        loaded = pipe.execute()
+        pipe = self.r.pipeline()
+        for item, is_loaded in zip(items, loaded):
+            if is_loaded:
+                fields = self._item_fields(item, min_increment, snipe_window)
+                pipe.hset(_item_key(item.id), mapping={k: fields[k] for k in _CONFIG_FIELDS})
+        pipe.execute()
+
+    def discard(self, item_id: int):
+        """Saca del libro un item borrado (una oferta nueva responde item_not_found desde la base)."""
+        self.r.delete(_item_key(item_id))
+
+    def sync_auction_status(self, auction: Auction):
+        self.r.hset(_auction_key(auction.id), "status", auction.status)
+
+    def load_auction(self, auction_id: int):
+        """Reescribe el libro de la subasta desde la base (la base es la fuente de verdad)."""
+        auction = Auction.objects.get(pk=auction_id)
+        min_increment = min_increments([auction_id]).get(auction_id)
+        snipe_window = antisnipe.window(auction_id)
+        pipe = self.r.pipeline()
+        pipe.hset(_auction_key(auction_id), "status", auction.status)
+        pipe.delete(_msgs_key(auction_id))
+        msg_ids = list(
+            Bid.objects.filter(item__auction_id=auction_id).exclude(source_message_id="")
+            .values_list("source_message_id", flat=True)
+        )
+        if msg_ids:
+            pipe.sadd(_msgs_key(auction_id), *msg_ids)
+        for item in Item.objects.filter(auction_id=auction_id):
+            pipe.delete(_item_key(item.id))
+            pipe.hset(_item_key(item.id), mapping=self._item_fields(item, min_increment, snipe_window))
+        pipe.execute()
+
+    def reconcile(self) -> int:
+        """Tras un reinicio: escribe lo pendiente y reconstruye los libros de las subastas RUNNING."""
+        self.flush_all()
+        auction_ids = list(Auction.objects.filter(status=Auction.Status.RUNNING).values_list("pk", flat=True))
+        for auction_id in auction_ids:
+            self.load_auction(auction_id)
+        return len(auction_ids)
+
+    # ---- ofertas ----
+
+    def place(self, item_id: int, data: Dict[str, Any]) -> BookResult:
+        """Misma entrada que bidding.place_bid; la oferta se persiste después con flush()."""
+        now_ms = int(time.time() * 1000)
+        msg_id = data.get("source_message_id") or ""
+        payload = json.dumps({
+            "item": item_id,
+            "participant": data["participant_id"],
+            "amount": str(data["amount"]),
+            "ts": now_ms,
+            # Sin id de mensaje generamos uno: el flush es idempotente gracias al unique de Bid
+            "msg": msg_id or f"bidbook-{uuid.uuid4().hex}",
+            "chat": data.get("source_chat_id") or "",
+        })
+        for _ in range(2):
+            auction_id = self.r.hget(_item_key(item_id), "auction")
+            if auction_id is None:
+                item = Item.objects.select_related("auction").get(pk=item_id)
+                self.load_item(item)
+                continue
+            status, amount, *extended = self._place(
+                keys=[_item_key(item_id), _auction_key(int(auction_id)), _msgs_key(int(auction_id)), PENDING_KEY],
+                args=[_cents(data["amount"]), data["participant_id"], msg_id, now_ms, payload],
+            )
+            status = status.decode() if isinstance(status, bytes) else status
+            amount = amount.decode() if isinstance(amount, bytes) else amount
+            if status == "not_loaded":
+                continue
+            if status == "accepted":
+                events.bid_accepted(int(auction_id), item_id, data["participant_id"], data["amount"])
+                if extended:
+                    # Redis ya corrió el vencimiento; lo llevamos a la base ya (no en el flush) porque
+                    # de ahí lee el scheduler
+                    bid_at = datetime.fromtimestamp(now_ms / 1000, tz=dt_timezone.utc)
+                    antisnipe.on_bid(int(auction_id), item_id, bid_at)
+            return BookResult(status, Decimal(amount) / 100 if amount else None)
+        raise RuntimeError(f"Item {item_id} could not be loaded into the bid book")
+
+    # ---- write-back ----
+
+    def flush(self, batch_size: int = 500) -> int:
+        """Escribe un lote de ofertas aceptadas en la tabla Bid. Devuelve cuántas procesó."""
+        with self.r.lock(FLUSH_LOCK_KEY, timeout=60, blocking_timeout=5):
+            raw = self.r.lrange(PENDING_KEY, 0, batch_size - 1)
+            if not raw:
+                return 0
+            entries = [json.loads(x) for x in raw]
+            with transaction.atomic():
+                # Una oferta de un item/participante borrado rompería el FK de todo el lote (y se
+                # reintentaría para siempre): esas se descartan
+                items = set(Item.objects.filter(pk__in={e["item"] for e in entries}).values_list("pk", flat=True))
+                people = set(
+                    Participant.objects.filter(pk__in={e["participant"] for e in entries}).values_list("pk", flat=True)
+                )
+                orphans = [e for e in entries if e["item"] not in items or e["participant"] not in people]
+                if orphans:
+                    logger.warning("Dropping %d pending bids of deleted items/participants: %s", len(orphans), orphans)
+                    entries = [e for e in entries if e["item"] in items and e["participant"] in people]
+                Bid.objects.bulk_create(
+                    [
+                        Bid(
+                            item_id=e["item"],
+                            participant_id=e["participant"],
+                            amount=Decimal(e["amount"]),
+                            created_at=datetime.fromtimestamp(e["ts"] / 1000, tz=dt_timezone.utc),
+                            source_message_id=e["msg"],
+                            source_chat_id=e["chat"],
+                        )
+                        for e in entries
+                    ],
+                    ignore_conflicts=True,  # re-flush tras una caída: el unique de source_message_id descarta
+                )
+                # bulk_create no pasa por Bid.save (en PostgreSQL el trigger ya actualizó los items)
+                item_ids = {e["item"] for e in entries}
+                if bid_summary_in_db():
+                    versioning.touch(item_ids=item_ids)
+                else:
+                    Item.objects.filter(pk__in=item_ids).refresh_bid_summary()
+            # Recién con la transacción confirmada sacamos el lote de la cola
+            self.r.ltrim(PENDING_KEY, len(raw), -1)
+            return len(raw)
+
+    def flush_all(self, batch_size: int = 500) -> int:
+        total = 0
+        while True:
+            n = self.flush(batch_size)
+            total += n
+            if n < batch_size:
+                return total
+
+    def pending(self) -> int:
+        return self.r.llen(PENDING_KEY)
+
+
+_book: Optional[BidBook] = None
+
+
+def get_bid_book() -> Optional[BidBook]:
+    """Libro configurado por BID_BOOK_REDIS_URL, o None si el modo Redis está apagado."""
+    global _book
+    if _book is None and getattr(settings, "BID_BOOK_REDIS_URL", ""):
+        _book = BidBook(redis.Redis.from_url(settings.BID_BOOK_REDIS_URL))
+    return _book
+
+
+def place_bids(book: BidBook, entries: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Variante batch (mismo formato de resultados que bidding.place_bids, sin `bid`)."""
+    results = []
+    for idx, data in enumerate(entries):
+        try:
+            res = book.place(data["item_id"], data)
+        except Item.DoesNotExist:
+            results.append({"index": idx, "ok": False, "code": "item_not_found", "message": "Item not found"})
+            continue
+        results.append({"index": idx, "ok": res.ok, "code": res.status, "amount": res.amount})
+    return results
@@ -0,0 +1,154 @@
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import antisnipe, events
+from .models import Auction, Bid, Item, Rule
+
+
+class BidRejected(Exception):
+    """La oferta no cumple las reglas del item / subasta."""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+@dataclass
+class BidResult:
+    bid: Bid
+    created: bool  # False si ya existía una oferta con el mismo source_message_id
+
+
+def min_increments(auction_ids: Iterable[int]) -> Dict[int, Decimal]:
+    """Regla `min_increment` de cada subasta (las que no la tienen o no parsean quedan afuera)."""
+    out = {}
+    for auction_id, value in Rule.objects.filter(auction_id__in=auction_ids, key="min_increment").values_list(
+        "auction_id", "value"
+    ):
+        try:
+            out[auction_id] = Decimal(value)
+        except InvalidOperation:
+            pass
+    return out
+
+
+def minimum_bid(item: Item, min_increment: Optional[Decimal] = None) -> Decimal:
+    """Monto mínimo aceptable para la próxima oferta del item."""
+    if item.highest_bid_amount is None:
+        return item.base_price
+    step = max(item.increment, min_increment or Decimal("0"))
+    return item.highest_bid_amount + step
+
+
+def _existing(source_message_id: str) -> Optional[Bid]:
+    if not source_message_id:
+        return None
+    return Bid.objects.filter(source_message_id=source_message_id).exclude(source_message_id="").first()
+
+
+def _check(item: Item, amount: Decimal, now, min_increment: Optional[Decimal]):
+    if item.auction.status != Auction.Status.RUNNING:
+        raise BidRejected("auction_not_running", f"Auction is {item.auction.status}")
+    if item.is_sold:
+        raise BidRejected("item_sold", "Item already sold")
+    if item.claim_expires_at and now > item.claim_expires_at:
+        raise BidRejected("claim_expired", "Bidding for this item has closed")
+    required = minimum_bid(item, min_increment)
+    if amount < required:
+        raise BidRejected("amount_too_low", f"Minimum bid is {required}")
+    if item.highest_bid_amount is not None and amount <= item.highest_bid_amount:
+        # Sin incremento (step 0): igualar la mejor oferta no alcanza para quedar al frente
+        raise BidRejected("amount_too_low", f"Bid must be above {item.highest_bid_amount}")
+
+
+def _insert(item: Item, data: Dict[str, Any], now) -> BidResult:
+    bid = Bid(
+        item=item,
+        participant_id=data["participant_id"],
+        amount=data["amount"],
+        created_at=now,
+        source_message_id=data.get("source_message_id", ""),
+        source_chat_id=data.get("source_chat_id", ""),
+    )
+    try:
+        # Savepoint: si otro proceso insertó el mismo mensaje, no perdemos la transacción
+        with transaction.atomic():
+            bid.save()  # Bid.save actualiza el resumen del item
+    except IntegrityError:
+        existing = _existing(bid.source_message_id)
+        if existing is None:
+            raise
+        return BidResult(existing, False)
+
+    # Reflejamos el nuevo resumen en la instancia bloqueada (para los siguientes del batch)
+    if item.highest_bid_amount is None or bid.amount > item.highest_bid_amount:
+        item.highest_bid_amount = bid.amount
+        item.leading_participant_id = bid.participant_id
+    item.bids_count += 1
+    item.last_bid_at = now
+    events.bid_accepted(item.auction_id, item.id, bid.participant_id, bid.amount, bid.id)
+    deadline = antisnipe.on_bid(item.auction_id, item.id, now)
+    if deadline is not None:
+        item.claim_expires_at = deadline
+    return BidResult(bid, True)
+
+
+def place_bid(item_id: int, data: Dict[str, Any]) -> BidResult:
+    """
+    Valida e inserta una oferta en una sola transacción corta.
+    `data`: participant_id, amount, source_message_id, source_chat_id.
+    """
+    existing = _existing(data.get("source_message_id", ""))
+    if existing is not None:
+        return BidResult(existing, False)
+
+    with transaction.atomic():
+        item = Item.objects.select_for_update(of=("self",)).select_related("auction").get(pk=item_id)
+        existing = _existing(data.get("source_message_id", ""))  # re-chequeo con el lock tomado
+        if existing is not None:
+            return BidResult(existing, False)
+        now = timezone.now()
+        _check(item, data["amount"], now, min_increments([item.auction_id]).get(item.auction_id))
+        return _insert(item, data, now)
+
+
+def place_bids(entries: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Variante batch: cada entry trae `item_id` además de los campos de place_bid.
+    Bloquea todos los items involucrados (ordenados por id, evita deadlocks) y procesa
+    las ofertas en el orden recibido. Una oferta rechazada no aborta el resto.
+    """
+    entries = list(entries)
+    results: List[Dict[str, Any]] = []
+    with transaction.atomic():
+        item_ids = sorted({e["item_id"] for e in entries})
+        items = {
+            i.pk: i
+            for i in Item.objects.select_for_update(of=("self",)).select_related("auction")
+            .filter(pk__in=item_ids).order_by("pk")
+        }
+        increments = min_increments({i.auction_id for i in items.values()})
+
+        for idx, data in enumerate(entries):
+            item = items.get(data["item_id"])
+            if item is None:
+                results.append({"index": idx, "ok": False, "code": "item_not_found", "message": "Item not found"})
+                continue
+            existing = _existing(data.get("source_message_id", ""))
+            if existing is not None:
+                results.append({"index": idx, "ok": True, "created": False, "bid": existing})
+                continue
+            now = timezone.now()
+            try:
+                _check(item, data["amount"], now, increments.get(item.auction_id))
+            except BidRejected as e:
+                results.append({"index": idx, "ok": False, "code": e.code, "message": e.message})
+                continue
+            res = _insert(item, data, now)
+            results.append({"index": idx, "ok": True, "created": res.created, "bid": res.bid})
+    return results
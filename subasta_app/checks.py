@@ -0,0 +1,18 @@
+from django.core.checks import Tags, Warning, register
+
+from . import auction_config
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """manage.py check --deploy: en producción el cache tiene que ser compartido entre workers."""
+    if auction_config.shared_cache():
+        return []
+    return [
+        Warning(
+            "CACHE_REDIS_URL is not set: the cache is per process, so invalidations (auction config, "
+            "circuit breaker state) only reach the worker that made them.",
+            hint="Set CACHE_REDIS_URL to a Redis shared by all workers.",
+            id="subasta_app.W001",
+        )
+    ]
@@ -0,0 +1,101 @@
+"""
+Circuit breaker para el servicio de WhatsApp, con el estado en el cache de Django: compartido entre
+workers con CACHE_REDIS_URL; con el cache local por proceso cada worker lleva su propio breaker.
+
+- closed: las llamadas pasan; cada falla (5xx / conexión) suma al contador, un éxito lo resetea.
+- open: tras `failure_threshold` fallas seguidas. Las llamadas fallan al toque con
+  WhatsAppServiceUnavailable durante `cooldown` segundos.
+- half_open: pasado el cooldown se deja pasar una sola llamada de prueba; si anda se cierra,
+  si falla vuelve a abrirse otro cooldown.
+
+Mientras está abierto cada worker recuerda hasta cuándo en memoria, así que el fast-fail ni
+siquiera consulta el cache.
+"""
+import time
+from typing import Any, Dict, Optional
+
+from django.core.cache import cache
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """La llamada no se hizo porque el circuito está abierto."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown: float = 30, window: float = 60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.window = window  # las fallas más viejas que esto no cuentan
+        self._open_until = 0.0
+
+    def _key(self, suffix: str) -> str:
+        return f"circuit:{self.name}:{suffix}"
+
+    def state(self) -> str:
+        opened_at = cache.get(self._key("opened_at"))
+        if opened_at is None:
+            return CLOSED
+        return OPEN if time.time() < opened_at + self.cooldown else HALF_OPEN
+
+    def before_call(self):
+        """Levanta CircuitOpen si la llamada no debe hacerse."""
+        now = time.time()
+        if now < self._open_until:
+            raise CircuitOpen(self.name)
+        opened_at = cache.get(self._key("opened_at"))
+        if opened_at is None:
+            return
+        if now < opened_at + self.cooldown:
+            self._open_until = opened_at + self.cooldown
+            raise CircuitOpen(self.name)
+        # half-open: un solo worker hace la prueba
+        if not cache.add(self._key("probe"), 1, timeout=self.cooldown):
+            raise CircuitOpen(self.name)
+
+    def record_success(self):
+        if cache.get_many([self._key("opened_at"), self._key("failures")]):
+            cache.delete_many([self._key("opened_at"), self._key("failures"), self._key("probe")])
+        self._open_until = 0.0
+
+    def record_failure(self):
+        if cache.get(self._key("opened_at")) is not None:
+            self._open()  # falló la prueba del half-open
+            return
+        if cache.add(self._key("failures"), 1, timeout=self.window):
+            failures = 1
+        else:
+            try:
+                failures = cache.incr(self._key("failures"))
+            except ValueError:  # expiró entre el add y el incr
+                cache.set(self._key("failures"), 1, timeout=self.window)
+                failures = 1
+        if failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        now = time.time()
+        # Sin vencimiento corto: el half-open necesita saber cuándo se abrió
+        cache.set(self._key("opened_at"), now, timeout=max(self.cooldown * 10, 3600))
+        cache.delete(self._key("probe"))
+        self._open_until = now + self.cooldown
+
+    def reset(self):
+        cache.delete_many([self._key("opened_at"), self._key("failures"), self._key("probe")])
+        self._open_until = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        opened_at: Optional[float] = cache.get(self._key("opened_at"))
+        return {
+            "name": self.name,
+            "state": self.state(),
+            "failures": cache.get(self._key("failures")) or 0,
+            "failure_threshold": self.failure_threshold,
+            "cooldown_seconds": self.cooldown,
+            "opened_at": opened_at,
+            "retry_at": opened_at + self.cooldown if opened_at is not None else None,
+        }
@@ -0,0 +1,153 @@
+"""
+Eventos en vivo por subasta (para el feed SSE del panel).
+
+Cada evento se publica una sola vez en un Redis Stream `livefeed:auction:{id}` con el payload
+ya armado; los clientes conectados leen del stream (no de la base), así que N pestañas abiertas
+cuestan una lectura de Redis cada una y ninguna query extra. El id del stream es el `id:` del
+evento SSE, lo que permite reanudar con Last-Event-ID.
+"""
+import asyncio
+import json
+import logging
+import re
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+BID_ACCEPTED = "bid-accepted"
+ITEM_SOLD = "item-sold"
+CLAIM_EXPIRED = "claim-expired"
+CLAIM_EXTENDED = "claim-extended"
+AUCTION_STATUS = "auction-status"
+
+STREAM_ID = re.compile(r"\d+-\d+")
+
+
+def _stream_key(auction_id: int) -> str:
+    return f"livefeed:auction:{auction_id}"
+
+
+def _str(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class EventBus:
+    def __init__(self, client: redis.Redis, async_client_factory: Callable[[], aioredis.Redis], maxlen: int = 1000):
+        self.r = client
+        self._async_client_factory = async_client_factory
+        # Un cliente async por event loop: sus conexiones no se pueden usar desde otro loop
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.maxlen = maxlen  # eventos que se guardan para reanudar
+
+    @property
+    def ar(self) -> aioredis.Redis:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = self._async_client_factory()
+        return client
+
+    def publish(self, auction_id: int, event: str, data: Dict[str, Any]) -> Optional[str]:
+        """Publica un evento. Un Redis caído no debe tirar abajo la operación que lo origina."""
+        try:
+            event_id = self.r.xadd(
+                _stream_key(auction_id),
+                {"event": event, "data": json.dumps(data, default=str)},
+                maxlen=self.maxlen,
+                approximate=True,
+            )
+        except redis.RedisError:
+            logger.exception("Could not publish %s for auction %s", event, auction_id)
+            return None
+        return _str(event_id)
+
+    async def last_id(self, auction_id: int) -> str:
+        entries = await self.ar.xrevrange(_stream_key(auction_id), count=1)
+        return _str(entries[0][0]) if entries else "0-0"
+
+    async def listen(
+            self, auction_id: int, last_event_id: Optional[str] = None, block_ms: int = 15000
+    ) -> AsyncIterator[Optional[Tuple[str, str, str]]]:
+        """
+        Genera (id, event, data) desde `last_event_id` (exclusivo) o desde ahora.
+        Genera None cada `block_ms` sin eventos (para mandar un heartbeat).
+        """
+        key = _stream_key(auction_id)
+        last = last_event_id or await self.last_id(auction_id)
+        while True:
+            response = await self.ar.xread({key: last}, block=block_ms, count=100)
+            if not response:
+                yield None
+                continue
+            for entry_id, fields in response[0][1]:
+                last = _str(entry_id)
+                fields = {_str(k): _str(v) for k, v in fields.items()}
+                yield last, fields["event"], fields["data"]
+
+
+_bus: Optional[EventBus] = None
+
+
+def get_event_bus() -> Optional[EventBus]:
+    """Bus configurado por LIVE_EVENTS_REDIS_URL, o None si el feed en vivo está apagado."""
+    global _bus
+    url = getattr(settings, "LIVE_EVENTS_REDIS_URL", "")
+    if _bus is None and url:
+        _bus = EventBus(redis.Redis.from_url(url), lambda: aioredis.Redis.from_url(url))
+    return _bus
+
+
+def publish_on_commit(auction_id: int, event: str, data: Dict[str, Any]):
+    """Publica cuando confirma la transacción actual (o ya, si no hay transacción)."""
+    bus = get_event_bus()
+    if bus is None:
+        return
+    transaction.on_commit(lambda: bus.publish(auction_id, event, data))
+
+
+def auction_status_changed(auction):
+    publish_on_commit(auction.id, AUCTION_STATUS, {"auction_id": auction.id, "status": auction.status})
+
+
+def bid_accepted(auction_id: int, item_id: int, participant_id: int, amount, bid_id: Optional[int] = None):
+    publish_on_commit(auction_id, BID_ACCEPTED, {
+        "auction_id": auction_id,
+        "item_id": item_id,
+        "participant_id": participant_id,
+        "amount": str(amount),
+        "bid_id": bid_id,
+    })
+
+
+def item_sold(item):
+    publish_on_commit(item.auction_id, ITEM_SOLD, {
+        "auction_id": item.auction_id,
+        "item_id": item.id,
+        "sold_to": item.sold_to_id,
+        "amount": str(item.highest_bid_amount) if item.highest_bid_amount is not None else None,
+        "sold_at": item.sold_at,
+    })
+
+
+def claim_expired(item):
+    publish_on_commit(item.auction_id, CLAIM_EXPIRED, {
+        "auction_id": item.auction_id,
+        "item_id": item.id,
+        "claim_expires_at": item.claim_expires_at,
+    })
+
+
+def claim_extended(auction_id: int, item_id: int, claim_expires_at):
+    publish_on_commit(auction_id, CLAIM_EXTENDED, {
+        "auction_id": auction_id,
+        "item_id": item_id,
+        "claim_expires_at": claim_expires_at,
+    })
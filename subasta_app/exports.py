@@ -0,0 +1,219 @@
+"""
+Exportes post-subasta (resultados por item y historial de ofertas) en CSV o XLSX, en streaming.
+
+Las filas salen de querysets `.values_list().iterator(chunk_size=...)` (sin instanciar modelos
+ni cargar todo en memoria) y se escriben por bloques a un StreamingHttpResponse, así que la
+memoria es constante aunque sean millones de ofertas. El XLSX se arma a mano (zip + XML con
+inline strings), escribiendo el zip en streaming: no hace falta openpyxl ni un archivo temporal.
+"""
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, List, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .models import Bid, Item
+
+CHUNK_SIZE = 2000  # filas por ida a la base y por bloque escrito
+
+RESULT_COLUMNS = (
+    ("auction_id", "auction_id"),
+    ("auction", "auction__title"),
+    ("item_id", "id"),
+    ("item", "name"),
+    ("order", "order"),
+    ("base_price", "base_price"),
+    ("final_price", "highest_bid_amount"),
+    ("bids", "bids_count"),
+    ("sold", "is_sold"),
+    ("sold_at", "sold_at"),
+    ("winner_id", "sold_to_id"),
+    ("winner", "sold_to__display_name"),
+    ("winner_phone", "sold_to__phone"),
+    ("winner_wa_user_id", "sold_to__wa_user_id"),
+)
+
+BID_COLUMNS = (
+    ("bid_id", "id"),
+    ("auction_id", "item__auction_id"),
+    ("item_id", "item_id"),
+    ("item", "item__name"),
+    ("participant_id", "participant_id"),
+    ("participant", "participant__display_name"),
+    ("wa_user_id", "participant__wa_user_id"),
+    ("amount", "amount"),
+    ("valid", "is_valid"),
+    ("created_at", "created_at"),
+    ("source_message_id", "source_message_id"),
+)
+
+
+def results_queryset(auction_ids: Sequence[int] = (), since=None, until=None) -> QuerySet:
+    """Items con su ganador (sold_to). El rango de fechas es sobre la creación de la subasta."""
+    qs = Item.objects.all()
+    if auction_ids:
+        qs = qs.filter(auction_id__in=auction_ids)
+    if since:
+        qs = qs.filter(auction__created_at__gte=since)
+    if until:
+        qs = qs.filter(auction__created_at__lt=until)
+    return qs.order_by("auction_id", "order", "id").values_list(*(f for _, f in RESULT_COLUMNS))
+
+
+def bids_queryset(auction_ids: Sequence[int] = (), since=None, until=None) -> QuerySet:
+    """Historial completo de ofertas; el rango es sobre Bid.created_at (índice bid_created_idx)."""
+    qs = Bid.objects.all()
+    if auction_ids:
+        qs = qs.filter(item__auction_id__in=auction_ids)
+    if since:
+        qs = qs.filter(created_at__gte=since)
+    if until:
+        qs = qs.filter(created_at__lt=until)
+    return qs.order_by("created_at", "id").values_list(*(f for _, f in BID_COLUMNS))
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if value is None:
+        return ""
+    return value
+
+
+def _chunks(rows: Iterable[Tuple], size: int) -> Iterator[List[Tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ---- CSV ----
+
+def stream_csv(header: Sequence[str], rows: Iterable[Tuple]) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        writer.writerows([_cell(v) for v in row] for row in chunk)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+# ---- XLSX ----
+
+class _Pipe(io.RawIOBase):
+    """Destino no seekable para zipfile: acumula lo escrito hasta que lo levantamos con take()."""
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._buf.extend(b)
+        return len(b)
+
+    def take(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _xlsx_row(values: Iterable[Any]) -> str:
+    cells = []
+    for value in values:
+        value = _cell(value)
+        if isinstance(value, bool):
+            cells.append(f'<c t="b"><v>{int(value)}</v></c>')
+        elif isinstance(value, (int, float, Decimal)):
+            cells.append(f"<c><v>{value}</v></c>")
+        else:
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>')
+    return f"<row>{''.join(cells)}</row>"
+
+
+def stream_xlsx(header: Sequence[str], rows: Iterable[Tuple], sheet_name: str = "Sheet1") -> Iterator[bytes]:
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK.format(name=escape(sheet_name)))
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((_SHEET_HEAD + _xlsx_row(header)).encode())
+            for chunk in _chunks(rows, CHUNK_SIZE):
+                sheet.write("".join(_xlsx_row(row) for row in chunk).encode())
+                yield pipe.take()
+            sheet.write(_SHEET_TAIL.encode())
+    yield pipe.take()
+
+
+EXPORTS = {
+    "results": (RESULT_COLUMNS, results_queryset),
+    "bids": (BID_COLUMNS, bids_queryset),
+}
+
+
+def export(kind: str, fmt: str, auction_ids: Sequence[int] = (), since=None, until=None) -> Iterator:
+    columns, queryset = EXPORTS[kind]
+    header = [name for name, _ in columns]
+    rows = queryset(auction_ids, since, until).iterator(chunk_size=CHUNK_SIZE)
+    if fmt == "xlsx":
+        return stream_xlsx(header, rows, sheet_name=kind)
+    return stream_csv(header, rows)
@@ -0,0 +1,138 @@
+"""
+Imágenes de Item: originales direccionados por contenido + variantes redimensionadas.
+
+- El original se guarda en `products/{hash[:2]}/{hash}{ext}` (sha256 del contenido): subir dos
+  veces la misma foto no duplica el archivo.
+- Las variantes (thumb / whatsapp / full, en WebP y JPEG) se generan fuera del request con
+  `manage.py process_images` (worker) o `backfill_images` (imágenes viejas). También van por hash,
+  así que dos items con la misma foto comparten variantes y se generan una sola vez.
+"""
+import hashlib
+import io
+import logging
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import versioning
+from .models import Item
+
+logger = logging.getLogger(__name__)
+
+# nombre -> lado mayor en px (nunca se agranda)
+VARIANTS = {
+    "thumb": 320,
+    "whatsapp": 1600,
+    "full": 2048,
+}
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def original_path(digest: str, filename: str) -> str:
+    ext = os.path.splitext(filename)[1].lower() or ".jpg"
+    return f"products/{digest[:2]}/{digest}{ext}"
+
+
+def store_bytes(data: bytes, filename: str) -> Tuple[str, str]:
+    """Guarda el original si no existe. Devuelve (path, hash)."""
+    digest = content_hash(data)
+    path = original_path(digest, filename)
+    if not default_storage.exists(path):
+        path = default_storage.save(path, ContentFile(data))
+    return path, digest
+
+
+def store_upload(upload) -> Tuple[str, str]:
+    if hasattr(upload, "seek"):
+        upload.seek(0)
+    return store_bytes(upload.read(), upload.name)
+
+
+def _variant_path(digest: str, variant: str, fmt: str) -> str:
+    return f"products/variants/{digest[:2]}/{digest}/{variant}.{'jpg' if fmt == 'jpeg' else fmt}"
+
+
+def _encode(img: Image.Image, fmt: str) -> bytes:
+    pil_format, options = FORMATS[fmt]
+    if pil_format == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")
+    elif img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    buf = io.BytesIO()
+    img.save(buf, pil_format, **options)
+    return buf.getvalue()
+
+
+def build_variants(data: bytes, digest: str) -> Dict[str, Dict[str, str]]:
+    """Genera (o reusa) las variantes. Devuelve {variante: {formato: path}}."""
+    paths = {v: {fmt: _variant_path(digest, v, fmt) for fmt in FORMATS} for v in VARIANTS}
+    missing = [(v, fmt) for v in VARIANTS for fmt in FORMATS if not default_storage.exists(paths[v][fmt])]
+    if not missing:
+        return paths
+    with Image.open(io.BytesIO(data)) as src:
+        src = ImageOps.exif_transpose(src)  # fotos de celular rotadas por EXIF
+        src.load()
+    for variant, size in VARIANTS.items():
+        if not any(v == variant for v, _ in missing):
+            continue
+        img = src.copy()
+        img.thumbnail((size, size), Image.LANCZOS)
+        for fmt in FORMATS:
+            if (variant, fmt) in missing:
+                default_storage.save(paths[variant][fmt], ContentFile(_encode(img, fmt)))
+    return paths
+
+
+def process_item(item: Item) -> bool:
+    """
+    Hash + variantes de la imagen del item. Actualiza de una vez todos los items pendientes
+    con el mismo archivo. False si la imagen no se pudo leer.
+    """
+    name = item.image.name
+    try:
+        with default_storage.open(name, "rb") as f:
+            data = f.read()
+        digest = item.image_hash or content_hash(data)
+        variants = build_variants(data, digest)
+    except (OSError, Image.DecompressionBombError, ValueError) as e:
+        # Archivo borrado / no es imagen: se marca procesado para no reintentar en loop
+        logger.warning("Could not process image %s of item %s: %s", name, item.pk, e)
+        Item.objects.filter(pk=item.pk).update(image_processed_at=timezone.now())
+        return False
+    same_image = Item.objects.filter(Q(image=name, image_processed_at__isnull=True) | Q(pk=item.pk))
+    with transaction.atomic():
+        versioning.touch(item_ids=list(same_image.values_list("pk", flat=True)))
+        same_image.update(image_hash=digest, image_variants=variants, image_processed_at=timezone.now())
+    return True
+
+
+def pending(limit: Optional[int] = None) -> Iterable[Item]:
+    qs = Item.objects.filter(image_processed_at__isnull=True).exclude(image="").exclude(image__isnull=True)
+    qs = qs.order_by("id").only("id", "image", "image_hash")
+    return qs[:limit] if limit else qs
+
+
+def process_pending(limit: int = 100) -> int:
+    """Una pasada del worker. Devuelve cuántos items procesó (los que comparten archivo cuentan una vez)."""
+    done, seen = 0, set()
+    for item in pending(limit):
+        # process_item ya resolvió los otros items con el mismo archivo
+        if item.image.name in seen:
+            continue
+        seen.add(item.image.name)
+        process_item(item)
+        done += 1
+    return done
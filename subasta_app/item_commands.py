@@ -0,0 +1,73 @@
+"""
+Arma los comandos por item para services.wa_batch a partir de la base.
+
+Cada tipo lleva por defecto lo que Node necesita para ejecutarlo (datos del lote para publicar,
+vencimiento del claim, ganador); lo que venga en `payload` desde el panel pisa esos valores.
+"""
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.core.files.storage import default_storage
+
+from .models import Item
+
+
+def _amount(value) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def _image(item: Item) -> Dict[str, Optional[str]]:
+    # Variante para WhatsApp (ver images.py); la original solo mientras el worker no la generó
+    whatsapp = (item.image_variants or {}).get("whatsapp")
+    if whatsapp:
+        return {"image": default_storage.url(whatsapp["jpeg"]), "image_webp": default_storage.url(whatsapp["webp"])}
+    return {"image": item.image.url if item.image else None, "image_webp": None}
+
+
+def _default_payload(item: Item, command_type: str) -> Dict[str, Any]:
+    if command_type == "publish":
+        return {
+            "name": item.name,
+            "description": item.description,
+            **_image(item),
+            "base_price": _amount(item.base_price),
+            "increment": _amount(item.increment),
+            "order": item.order,
+            "claim_expires_at": item.claim_expires_at.isoformat() if item.claim_expires_at else None,
+        }
+    if command_type == "expire":
+        return {"claim_expires_at": item.claim_expires_at.isoformat() if item.claim_expires_at else None}
+    # announce_winner: el comprador si ya se vendió, si no el que va ganando
+    winner = item.sold_to or item.leading_participant
+    return {
+        "participant_id": winner.id if winner else None,
+        "wa_user_id": winner.wa_user_id if winner else None,
+        "display_name": winner.display_name if winner else None,
+        "amount": _amount(item.highest_bid_amount),
+        "wa_stanza_id": item.wa_stanza_id,
+    }
+
+
+def build(entries: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    entries: [{"item", "type", "payload"?, "idempotency_key"?}].
+    Devuelve (comandos para wa_batch con su "index", errores por index). Una query para todos los items.
+    La idempotency key que falte se genera acá: el que encola la devuelve y cada reintento manda la misma.
+    """
+    entries = list(entries)
+    items = Item.objects.select_related("sold_to", "leading_participant").in_bulk({e["item"] for e in entries})
+    commands, errors = [], []
+    for idx, e in enumerate(entries):
+        item = items.get(e["item"])
+        if item is None:
+            errors.append({"index": idx, "ok": False, "item_id": e["item"], "error": "Item not found"})
+            continue
+        commands.append({
+            "index": idx,
+            "type": e["type"],
+            "auction_id": item.auction_id,
+            "item_id": item.id,
+            "payload": {**_default_payload(item, e["type"]), **(e.get("payload") or {})},
+            "idempotency_key": e.get("idempotency_key") or uuid.uuid4().hex,
+        })
+    return commands, errors
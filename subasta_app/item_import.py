@@ -0,0 +1,272 @@
+"""
+Importación masiva de items (manifest CSV/JSON + zip de imágenes, o el form-data legacy).
+
+1. Valida todas las filas (e imágenes) antes de escribir nada; si hay errores, no se crea ningún item.
+2. Escribe las imágenes en el storage en paralelo, por hash de contenido (las variantes las genera
+   después el worker de images.py).
+3. Inserta los items con bulk_create en una sola transacción.
+El avance queda en un ItemImport (stage / processed_rows), que se puede consultar mientras corre.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import re
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import versioning
+from .images import store_bytes
+from .models import Auction, Item, ItemImport
+from .serializers import ItemImportRowSerializer
+
+logger = logging.getLogger(__name__)
+
+MAX_ROWS = 10000
+MAX_IMAGE_BYTES = 15 * 1024 * 1024
+IMAGE_WORKERS = 8
+PROGRESS_EVERY = 100
+INSERT_BATCH_SIZE = 500
+
+# Nombres legacy del form de crear_subasta_api
+ALIASES = {"title": "name", "price": "base_price"}
+
+# nombre -> función que devuelve los bytes de la imagen
+ImageSource = Dict[str, Callable[[], bytes]]
+
+
+class ManifestError(ValueError):
+    """Manifest o zip ilegible (antes de llegar a validar filas)."""
+
+
+# ---- entrada ----
+
+def _normalize(row: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for key, value in row.items():
+        if key is None:
+            continue  # columnas de más en el CSV
+        key = ALIASES.get(key.strip(), key.strip())
+        if isinstance(value, str):
+            value = value.strip()
+        if value == "" and key in ("increment", "order"):
+            continue  # vacío -> default
+        out[key] = value
+    return out
+
+
+def parse_manifest(data: bytes, filename: str = "") -> List[Dict[str, Any]]:
+    """CSV (con encabezado) o JSON (lista, o {"items": [...]})."""
+    is_json = filename.lower().endswith(".json") or data.lstrip()[:1] in (b"[", b"{")
+    try:
+        if is_json:
+            rows = json.loads(data)
+            if isinstance(rows, dict):
+                rows = rows.get("items")
+        else:
+            rows = list(csv.DictReader(io.StringIO(data.decode("utf-8-sig"))))
+    except (ValueError, csv.Error) as e:
+        raise ManifestError(f"Unreadable manifest: {e}") from e
+    return from_records(rows)
+
+
+def from_records(records) -> List[Dict[str, Any]]:
+    """Filas ya decodificadas (ej. el body JSON del endpoint)."""
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise ManifestError("Items must be a list of objects")
+    if len(records) > MAX_ROWS:
+        raise ManifestError(f"Too many rows ({len(records)} > {MAX_ROWS})")
+    return [_normalize(r) for r in records]
+
+
+def zip_images(fileobj) -> ImageSource:
+    """
+    Imágenes de un zip, por nombre de archivo (sin carpetas). Dos archivos con el mismo nombre en
+    carpetas distintas se rechazan: la columna image no tiene cómo elegir entre ellos.
+    """
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise ManifestError(f"Invalid images zip: {e}") from e
+    images, paths = {}, {}
+    duplicates = set()
+    for info in zf.infolist():
+        if info.is_dir() or info.file_size > MAX_IMAGE_BYTES:
+            continue
+        name = os.path.basename(info.filename)
+        if name in paths:
+            duplicates.add(name)
+        paths.setdefault(name, []).append(info.filename)
+        images[name] = (lambda info=info: zf.read(info))
+    if duplicates:
+        detail = "; ".join(f"{name} ({', '.join(paths[name])})" for name in sorted(duplicates))
+        raise ManifestError(f"Duplicate image names in zip: {detail}")
+    return images
+
+
+# ---- pipeline ----
+
+def _progress(job: ItemImport, **fields):
+    for k, v in fields.items():
+        setattr(job, k, v)
+    # Fuera de cualquier transacción larga, así el avance se ve desde otro request
+    ItemImport.objects.filter(pk=job.pk).update(**fields)
+
+
+def _check_image(data: bytes) -> Optional[str]:
+    if len(data) > MAX_IMAGE_BYTES:
+        return "Image is too large"
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+    except Exception:
+        return "Upload a valid image. The file you uploaded was either not an image or a corrupted image."
+    return None
+
+
+def validate(rows: List[Dict[str, Any]], images: ImageSource) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Devuelve (filas validadas, errores [{"index", "errors"}])."""
+    valid, errors = [], []
+    checked: Dict[str, Optional[str]] = {}  # una imagen usada por varias filas se verifica una vez
+    for idx, row in enumerate(rows):
+        s = ItemImportRowSerializer(data=row)
+        if not s.is_valid():
+            errors.append({"index": idx, "errors": s.errors})
+            continue
+        data = dict(s.validated_data)
+        data.setdefault("order", idx)
+        if data["image"]:
+            if data["image"] not in images:
+                errors.append({"index": idx, "errors": {"image": [f"Image {data['image']!r} not found"]}})
+                continue
+            if data["image"] not in checked:
+                checked[data["image"]] = _check_image(images[data["image"]]())
+            error = checked[data["image"]]
+            if error:
+                errors.append({"index": idx, "errors": {"image": [error]}})
+                continue
+        valid.append(data)
+    return valid, errors
+
+
+def _save_images(
+        rows: List[Dict[str, Any]], images: ImageSource, report: Callable[[float], Any],
+) -> Dict[str, Tuple[str, str]]:
+    """
+    Guarda cada imagen una vez (aunque la usen varias filas), direccionada por contenido.
+    Devuelve nombre -> (path en el storage, hash).
+    """
+    names = sorted({r["image"] for r in rows if r["image"]})
+
+    def save(name):
+        return name, store_bytes(images[name](), os.path.basename(name))
+
+    saved = {}
+    with ThreadPoolExecutor(max_workers=IMAGE_WORKERS) as pool:
+        for n, (name, stored) in enumerate(pool.map(save, names), start=1):
+            saved[name] = stored
+            if n % PROGRESS_EVERY == 0:
+                report(n / len(names))
+    return saved
+
+
+def run(
+        auction: Auction,
+        rows: List[Dict[str, Any]],
+        images: Optional[ImageSource] = None,
+        source: str = "manifest",
+        on_progress: Optional[Callable[[ItemImport], Any]] = None,
+) -> ItemImport:
+    images = images or {}
+    job = ItemImport.objects.create(auction=auction, source=source, total_rows=len(rows))
+
+    def progress(**fields):
+        _progress(job, **fields)
+        if on_progress:
+            on_progress(job)
+
+    valid, errors = validate(rows, images)
+    if errors:
+        progress(status=ItemImport.Status.FAILED, stage=ItemImport.Stage.FINISHED, errors=errors,
+                 finished_at=timezone.now())
+        return job
+
+    progress(stage=ItemImport.Stage.IMAGES)
+    saved = _save_images(valid, images, lambda done: progress(processed_rows=int(len(rows) * done)))
+
+    progress(stage=ItemImport.Stage.INSERTING, processed_rows=len(rows))
+    items = [
+        Item(
+            auction=auction,
+            name=r["name"],
+            description=r["description"],
+            base_price=r["base_price"],
+            increment=r["increment"],
+            order=r["order"],
+            image=saved[r["image"]][0] if r["image"] else None,
+            image_hash=saved[r["image"]][1] if r["image"] else "",
+        )
+        for r in valid
+    ]
+    try:
+        with transaction.atomic():
+            Item.objects.bulk_create(items, batch_size=INSERT_BATCH_SIZE)
+            versioning.touch(auction_ids=[auction.id])  # bulk_create no manda post_save
+    except Exception as e:
+        logger.exception("Item import %s failed", job.pk)
+        for path, _ in saved.values():
+            if not Item.objects.filter(image=path).exists():  # puede ser de otro item (mismo contenido)
+                default_storage.delete(path)
+        progress(status=ItemImport.Status.FAILED, stage=ItemImport.Stage.FINISHED,
+                 errors=[{"index": None, "errors": str(e)}], finished_at=timezone.now())
+        return job
+
+    progress(status=ItemImport.Status.DONE, stage=ItemImport.Stage.FINISHED, created_items=len(items),
+             finished_at=timezone.now())
+    return job
+
+
+_FORM_KEY_RE = re.compile(r"^productos\[(\d+)\]\[(\w+)\]$")
+
+
+def _reader(upload) -> Callable[[], bytes]:
+    def read():
+        upload.seek(0)
+        return upload.read()
+    return read
+
+
+def form_rows(data, files) -> Tuple[List[Dict[str, Any]], ImageSource]:
+    """
+    Filas del form-data legacy (productos[i][title], productos[i][price], productos[i][image], ...),
+    en una sola pasada por las keys.
+    """
+    by_index: Dict[int, Dict[str, Any]] = {}
+    images: ImageSource = {}
+    for key in list(data.keys()) + list(files.keys()):
+        m = _FORM_KEY_RE.match(key)
+        if not m:
+            continue
+        idx, field = int(m.group(1)), m.group(2)
+        row = by_index.setdefault(idx, {})
+        if field == "image":
+            upload = files.get(key)
+            if upload is not None:
+                name = f"{idx}/{upload.name}"  # el nombre del archivo puede repetirse entre filas
+                images[name] = _reader(upload)
+                row["image"] = name
+            continue
+        row[field] = data.get(key)
+    rows = []
+    for position, idx in enumerate(sorted(by_index)):
+        row = _normalize(by_index[idx])
+        row.setdefault("order", position)
+        rows.append(row)
+    return rows, images
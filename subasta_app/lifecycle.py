@@ -0,0 +1,42 @@
+"""
+Transiciones de estado de la subasta que disparan efectos (comando para Node, feed en vivo,
+libro de ofertas, adjudicación). Las usan tanto las acciones start/finish como el scheduler.
+"""
+from typing import Tuple
+
+from django.db import transaction
+
+from . import bidbook, events, outbox, settlement
+from .models import Auction, OutboxCommand
+
+
+def status_changed(auction: Auction):
+    """Avisa el cambio de estado cuando confirma la transacción (o ya, si no hay una)."""
+    def notify():
+        # Con el libro de ofertas en Redis activo, el script Lua lee de ahí el estado de la subasta
+        book = bidbook.get_bid_book()
+        if book:
+            book.sync_auction_status(auction)
+    transaction.on_commit(notify)
+    events.auction_status_changed(auction)
+
+
+def start(auction: Auction) -> OutboxCommand:
+    # Estado + comando para Node en la misma transacción; lo envía el worker (drain_outbox)
+    with transaction.atomic():
+        auction.status = Auction.Status.RUNNING
+        auction.save(update_fields=["status"])
+        cmd = outbox.enqueue(auction, OutboxCommand.Command.START)
+        status_changed(auction)
+    return cmd
+
+
+def finish(auction: Auction, ends_at=None) -> Tuple[OutboxCommand, settlement.Settlement]:
+    with transaction.atomic():
+        auction.status = Auction.Status.FINISHED
+        auction.ends_at = ends_at or auction.ends_at or auction.created_at  # o timezone.now()
+        auction.save(update_fields=["status", "ends_at"])
+        # Avisar a Node para que cierre si corresponde
+        cmd = outbox.enqueue(auction, OutboxCommand.Command.CLOSE)
+        status_changed(auction)
+    return cmd, settlement.settle(auction)
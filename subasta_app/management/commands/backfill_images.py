@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from subasta_app import images
+from subasta_app.models import Item
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill de imágenes existentes: mueve los originales a paths por hash (dedup) "
+        "y genera sus variantes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Revisar también los ya procesados (rehace variantes faltantes)")
+        parser.add_argument("--keep-originals", action="store_true", help="No borrar el archivo viejo tras moverlo")
+
+    def handle(self, *args, **options):
+        qs = Item.objects.exclude(Q(image="") | Q(image__isnull=True)).order_by("id")
+        if not options["force"]:
+            qs = qs.filter(Q(image_hash="") | Q(image_processed_at__isnull=True))
+
+        moved = processed = failed = 0
+        relocated = {}  # path viejo -> (path nuevo, hash), para items que compartían archivo
+        for item in qs.iterator(chunk_size=200):
+            old = item.image.name
+            if not item.image_hash and old in relocated:
+                continue  # ya movido y procesado junto con el primer item que lo usaba
+            if not item.image_hash:
+                try:
+                    with item.image.open("rb") as f:
+                        new, digest = images.store_bytes(f.read(), old)
+                except OSError as e:
+                    self.stderr.write(f"item {item.pk}: {e}")
+                    failed += 1
+                    continue
+                # Todos los items que apuntaban al archivo viejo pasan al path por hash
+                Item.objects.filter(image=old).update(image=new, image_hash=digest, image_processed_at=None)
+                if new != old:
+                    moved += 1
+                    if not options["keep_originals"]:
+                        item.image.storage.delete(old)
+                item.image.name, item.image_hash = relocated[old] = (new, digest)
+            if images.process_item(item):
+                processed += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f"{moved} originals moved, {processed} processed, {failed} failed"))
@@ -0,0 +1,225 @@
+import dataclasses
+import io
+import json
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from django.contrib.auth.models import User
+from subasta_app import outbox, services
+from subasta_app.models import Auction, Bid, Item, Participant
+from subasta_app.wa_stub import serve_in_background
+
+# métrica -> True si más alto es peor
+METRICS = {"p50_ms": True, "p95_ms": True, "rps": False}
+
+
+def generate(rnd, auctions, items, bids_per_item, participants):
+    """Subastas con N items, M ofertas válidas por item (montos crecientes) y P participantes."""
+    people = Participant.objects.bulk_create(
+        Participant(display_name=f"bench {i}", wa_user_id=f"bench-{i}@whatsapp") for i in range(participants)
+    )
+    start = timezone.now() - timedelta(days=1)
+    created = []
+    for a in range(auctions):
+        auction = Auction.objects.create(title=f"bench {a}", status=Auction.Status.RUNNING)
+        lots = Item.objects.bulk_create(
+            Item(auction=auction, name=f"bench {a}/{i}", base_price=Decimal("100"), increment=Decimal("10"), order=i)
+            for i in range(items)
+        )
+        bids = []
+        for item in lots:
+            for j in range(bids_per_item):
+                bids.append(Bid(
+                    item=item, participant=rnd.choice(people), amount=Decimal(100 + 10 * j),
+                    created_at=start + timedelta(seconds=len(bids)),
+                ))
+        # bulk_create no pasa por Bid.save: el resumen de los items se recalcula de una
+        Bid.objects.bulk_create(bids, batch_size=5000)
+        Item.objects.filter(auction=auction).refresh_bid_summary()
+        created.append(auction)
+    return created, people
+
+
+def summarize(latencies, wall, queries):
+    q = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(q[49] * 1000, 3),
+        "p95_ms": round(q[94] * 1000, 3),
+        "p99_ms": round(q[98] * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+        "queries": queries,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Regresiones de `current` contra `baseline`: [(escenario, métrica, antes, ahora)]."""
+    regressions = []
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for metric, higher_is_worse in METRICS.items():
+            before, now = base.get(metric), result[metric]
+            if not before:
+                continue
+            worse = now > before * (1 + tolerance) if higher_is_worse else now < before * (1 - tolerance)
+            if worse:
+                regressions.append((name, metric, before, now))
+        # La cantidad de queries es determinística: cualquier aumento es una regresión (ej. un N+1)
+        if base.get("queries") is not None and result["queries"] > base["queries"]:
+            regressions.append((name, "queries", base["queries"], result["queries"]))
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de los endpoints calientes de la API (listas, detalle, crear_subasta_api, start/finish "
+        "contra el stub de WhatsApp). Genera los datos en una transacción que se revierte al final, "
+        "escribe los resultados en JSON y con --baseline falla si alguna métrica empeora."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--auctions", type=int, default=20)
+        parser.add_argument("--items", type=int, default=50, help="Items por subasta (N)")
+        parser.add_argument("--bids-per-item", type=int, default=20, help="Ofertas por item (M)")
+        parser.add_argument("--participants", type=int, default=200, help="Participantes (P)")
+        parser.add_argument("--requests", type=int, default=200, help="Requests medidos por escenario")
+        parser.add_argument("--warmup", type=int, default=10, help="Requests sin medir antes de cada escenario")
+        parser.add_argument("--import-items", type=int, default=50, help="Items por request de crear_subasta_api")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="Archivo JSON con los resultados")
+        parser.add_argument("--baseline", help="JSON de una corrida anterior: falla si alguna métrica empeora")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Margen relativo para latencias y throughput (0.25 = 25%%)")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        rnd = random.Random(options["seed"])
+        media = tempfile.mkdtemp()
+        server, _ = serve_in_background("127.0.0.1", 0)
+        stub_url = f"http://127.0.0.1:{server.server_address[1]}"
+        original_cfg = services._cfg
+        services._cfg = dataclasses.replace(original_cfg, base_url=stub_url, api_key="")
+        try:
+            # DEBUG=False: como en producción (sin el log de queries de Django sumando tiempo y memoria)
+            with override_settings(DEBUG=False, MEDIA_ROOT=media, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]), \
+                    transaction.atomic():
+                results = self.run(rnd, options)
+                transaction.set_rollback(True)
+        finally:
+            services._cfg = original_cfg
+            server.shutdown()
+            server.server_close()
+            shutil.rmtree(media, ignore_errors=True)
+
+        self.report(results)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Results written to {options['output']}")
+        if baseline is not None:
+            regressions = compare(results, baseline, options["tolerance"])
+            for name, metric, before, now in regressions:
+                self.stderr.write(f"REGRESSION {name}.{metric}: {before} -> {now}")
+            if regressions:
+                raise CommandError(f"{len(regressions)} metrics regressed")
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
+
+    def run(self, rnd, options):
+        auctions, _ = generate(rnd, options["auctions"], options["items"], options["bids_per_item"],
+                               options["participants"])
+        user = User.objects.create_user(username=f"bench-{time.time_ns()}", password="x", is_staff=True)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        items = list(Item.objects.filter(auction__in=auctions).values_list("id", flat=True))
+        png = io.BytesIO()
+        Image.new("RGB", (64, 64), "red").save(png, "PNG")
+
+        def import_form():
+            data = {"auction_title": "bench import"}
+            for i in range(options["import_items"]):
+                data[f"productos[{i}][title]"] = f"Lote {i}"
+                data[f"productos[{i}][price]"] = "100"
+                if i % 5 == 0:
+                    data[f"productos[{i}][image]"] = io.BytesIO(png.getvalue())
+                    data[f"productos[{i}][image]"].name = f"lote-{i}.png"
+            return data
+
+        def start_finish():
+            # Un ciclo completo: start + envío al stub + finish (con adjudicación) + envío al stub
+            auction = Auction.objects.create(title="bench lifecycle", status=Auction.Status.SCHEDULED)
+            r1 = client.post(f"/api/auctions/{auction.id}/start/")
+            outbox.drain()
+            r2 = client.post(f"/api/auctions/{auction.id}/finish/")
+            outbox.drain()
+            return r2 if r1.status_code < 400 else r1
+
+        scenarios = {
+            "auction_list": lambda: client.get("/api/auctions/"),
+            "auction_detail": lambda: client.get(f"/api/auctions/{rnd.choice(auctions).id}/"),
+            "item_list": lambda: client.get(f"/api/items/?auction={rnd.choice(auctions).id}"),
+            "bid_list": lambda: client.get(f"/api/bids/?item={rnd.choice(items)}"),
+            "crear_subasta_api": lambda: client.post("/api/subastas/crear/", import_form(), format="multipart"),
+            "start_finish": start_finish,
+        }
+
+        results = {
+            "meta": {
+                "timestamp": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "params": {k: options[k] for k in ("auctions", "items", "bids_per_item", "participants",
+                                                    "requests", "import_items", "seed")},
+            },
+            "scenarios": {},
+        }
+        for name, call in scenarios.items():
+            for _ in range(options["warmup"]):
+                call()
+            # Queries de un request (aparte: capturarlas agrega overhead a la latencia)
+            with CaptureQueriesContext(connection) as ctx:
+                resp = call()
+            # captured_queries lee el log de la conexión, que se vacía al empezar el próximo request
+            queries = len(ctx.captured_queries)
+            if resp.status_code >= 400:
+                raise CommandError(f"{name} returned {resp.status_code}: {resp.content[:200]!r}")
+            latencies = []
+            t0 = time.perf_counter()
+            for _ in range(options["requests"]):
+                t = time.perf_counter()
+                call()
+                latencies.append(time.perf_counter() - t)
+            wall = time.perf_counter() - t0
+            results["scenarios"][name] = summarize(latencies, wall, queries)
+            self.stdout.write(f"{name}: {options['requests']} requests in {wall:.2f}s",
+                              style_func=self.style.HTTP_INFO)
+        return results
+
+    def report(self, results):
+        self.stdout.write(f"{'scenario':<20}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}")
+        for name, r in results["scenarios"].items():
+            self.stdout.write(
+                f"{name:<20}{r['rps']:>10.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+                f"{r['queries']:>9}"
+            )
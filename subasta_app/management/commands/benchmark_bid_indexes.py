@@ -0,0 +1,114 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from subasta_app.models import Auction, Bid, Item, Participant
+
+SEEDED_SPAN = timedelta(days=30)
+HISTORY_SPAN = timedelta(days=3)
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga ~1M de ofertas y mide las queries calientes de Bid con y sin los índices compuestos. "
+        "Todo corre en una transacción que se revierte al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bids", type=int, default=1_000_000)
+        parser.add_argument("--items", type=int, default=1_000)
+        parser.add_argument("--participants", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=200, help="Ejecuciones por query")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["seed"])
+        # SQLite no permite apagar los chequeos de FK dentro de la transacción (los pide el schema editor)
+        with connection.constraint_checks_disabled(), transaction.atomic():
+            items, participants = self._seed(rnd, options)
+            self._analyze()
+            with_idx = self._run(rnd, items, participants, options)
+
+            with connection.schema_editor() as editor:
+                for index in Bid._meta.indexes:
+                    editor.remove_index(Bid, index)
+                for constraint in Bid._meta.constraints:
+                    editor.remove_constraint(Bid, constraint)
+            self._analyze()
+            without_idx = self._run(rnd, items, participants, options)
+
+            # Revertimos datos y DDL (Postgres y SQLite soportan DDL transaccional)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'query':<28}{'with idx (ms)':>16}{'without (ms)':>16}")
+        for name in with_idx:
+            self.stdout.write(f"{name:<28}{with_idx[name]:>16.3f}{without_idx[name]:>16.3f}")
+
+    def _seed(self, rnd, options):
+        auction = Auction.objects.create(title="benchmark")
+        items = Item.objects.bulk_create(
+            Item(auction=auction, name=f"bench {i}", base_price=Decimal("100"), order=i)
+            for i in range(options["items"])
+        )
+        participants = Participant.objects.bulk_create(
+            Participant(display_name=f"bench {i}", wa_user_id=f"bench-{i}@whatsapp")
+            for i in range(options["participants"])
+        )
+
+        # Repartidas parejo en los últimos 30 días: el rango de 3 días de las queries de historial
+        # cubre ~10% de las ofertas
+        start = timezone.now() - SEEDED_SPAN
+        spacing = SEEDED_SPAN / max(options["bids"], 1)
+        batch = []
+        for n in range(options["bids"]):
+            batch.append(Bid(
+                item=rnd.choice(items),
+                participant=rnd.choice(participants),
+                amount=Decimal(rnd.randint(100, 100_000)),
+                created_at=start + spacing * n,
+                is_valid=rnd.random() > 0.05,
+                source_message_id=f"bench-{n}",
+            ))
+            if len(batch) == 10_000:
+                # bulk_create no pasa por Bid.save: no toca los resúmenes de Item
+                Bid.objects.bulk_create(batch)
+                batch = []
+                self.stdout.write(f"seeded {n + 1} bids", ending="\r")
+        Bid.objects.bulk_create(batch)
+        self.stdout.write("")
+        return items, participants
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(Bid._meta.db_table)}")
+
+    def _run(self, rnd, items, participants, options):
+        since = timezone.now() - HISTORY_SPAN
+        queries = {
+            "top_bid_by_item": lambda: list(
+                Bid.objects.filter(item=rnd.choice(items), is_valid=True).order_by("-amount")[:1]
+            ),
+            "item_history": lambda: list(
+                Bid.objects.filter(item=rnd.choice(items), created_at__gte=since).order_by("created_at")[:100]
+            ),
+            "participant_history": lambda: list(
+                Bid.objects.filter(participant=rnd.choice(participants), created_at__gte=since)
+                .order_by("created_at")[:100]
+            ),
+            # Repetimos la condición del índice parcial para que SQLite también lo use
+            "dedup_lookup": lambda: Bid.objects.exclude(source_message_id="").filter(
+                source_message_id=f"bench-{rnd.randrange(options['bids'])}"
+            ).exists(),
+        }
+        results = {}
+        for name, query in queries.items():
+            t0 = time.perf_counter()
+            for _ in range(options["repeat"]):
+                query()
+            results[name] = (time.perf_counter() - t0) * 1000 / options["repeat"]
+        return results
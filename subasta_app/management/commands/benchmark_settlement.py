@@ -0,0 +1,66 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from subasta_app import settlement
+from subasta_app.models import Auction, Bid, Item, Participant
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide settle() sobre una subasta FINISHED con miles de items (por defecto 5.000). "
+        "Todo corre en una transacción que se revierte al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=5_000)
+        parser.add_argument("--bids-per-item", type=int, default=5)
+        parser.add_argument("--participants", type=int, default=200)
+        parser.add_argument("--unsold", type=float, default=0.1, help="Fracción de items sin ofertas válidas")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["seed"])
+        with transaction.atomic():
+            auction = self._seed(rnd, options)
+            t0 = time.perf_counter()
+            with CaptureQueriesContext(connection) as ctx:
+                result = settlement.settle(auction)
+            elapsed = (time.perf_counter() - t0) * 1000
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{options['items']} items: {result.sold} sold, {result.unsold} unsold "
+            f"in {elapsed:.1f} ms ({len(ctx.captured_queries)} queries)"
+        )
+
+    def _seed(self, rnd, options):
+        auction = Auction.objects.create(title="benchmark", status=Auction.Status.FINISHED)
+        items = Item.objects.bulk_create(
+            Item(auction=auction, name=f"bench {i}", base_price=Decimal("100"), order=i)
+            for i in range(options["items"])
+        )
+        participants = Participant.objects.bulk_create(
+            Participant(display_name=f"bench {i}", wa_user_id=f"bench-{i}@whatsapp")
+            for i in range(options["participants"])
+        )
+        now = timezone.now()
+        bids = []
+        for item in items:
+            # Los items "sin vender" tienen ofertas, pero todas invalidadas
+            valid = rnd.random() >= options["unsold"]
+            bids += [
+                Bid(
+                    item=item, participant=rnd.choice(participants), amount=Decimal(rnd.randint(100, 10_000)),
+                    created_at=now, is_valid=valid,
+                )
+                for _ in range(options["bids_per_item"])
+            ]
+        # bulk_create no pasa por Bid.save: settle elige el ganador desde Bid, no desde el resumen del item
+        Bid.objects.bulk_create(bids, batch_size=10_000)
+        return auction
@@ -0,0 +1,67 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from django.core.management.base import BaseCommand
+
+from subasta_app import services, services_async
+from subasta_app.wa_stub import serve_in_background
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el cliente sync (requests) con el async (aiohttp) mandando N comandos wa_start. "
+        "Por defecto levanta el stub (wa_stub.py) en WHATSAPP_SERVICE_BASEURL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--commands", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=50, help="Hilos (sync) / comandos en vuelo (async)")
+        parser.add_argument("--latency-ms", type=float, default=20, help="Latencia del stub")
+        parser.add_argument("--external", action="store_true", help="No levantar el stub: usar el servicio configurado")
+        parser.add_argument("--skip-sequential", action="store_true", help="Omitir el sync secuencial (el más lento)")
+
+    def handle(self, *args, **options):
+        n, concurrency = options["commands"], options["concurrency"]
+        server = None
+        if not options["external"]:
+            url = urlparse(services._cfg.base_url)
+            server, _ = serve_in_background(url.hostname or "127.0.0.1", url.port or 3000, options["latency_ms"])
+        ids = list(range(1, n + 1))
+
+        try:
+            if not options["skip_sequential"]:
+                self.report("sync sequential", self.timed(lambda: [self.sync_call(i) for i in ids]))
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                self.report(f"sync {concurrency} threads", self.timed(lambda: list(pool.map(self.sync_call, ids))))
+            self.report(f"async {concurrency} in flight", self.timed(lambda: asyncio.run(self.run_async(ids, concurrency))))
+        finally:
+            if server:
+                server.shutdown()
+                server.server_close()
+
+    @staticmethod
+    def sync_call(auction_id):
+        try:
+            return services.wa_start(auction_id)
+        except services.WhatsAppServiceError as e:
+            return {"ok": False, "error": str(e)}
+
+    @staticmethod
+    async def run_async(ids, concurrency):
+        async with services_async.AsyncWhatsAppClient() as client:
+            results = await services_async.gather_limited([lambda a=a: client.wa_start(a) for a in ids], concurrency)
+        return [r.get("result") or r for r in results]
+
+    @staticmethod
+    def timed(fn):
+        t0 = time.perf_counter()
+        results = fn()
+        return results, time.perf_counter() - t0
+
+    def report(self, label, timed):
+        results, wall = timed
+        ok = sum(1 for r in results if r.get("ok"))
+        self.stdout.write(f"{label:<22} {len(results)} commands in {wall:.2f}s "
+                          f"({len(results) / wall:.0f} cmd/s), ok: {ok}")
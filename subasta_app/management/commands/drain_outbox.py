@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from subasta_app import outbox
+
+
+class Command(BaseCommand):
+    help = "Envía al servicio de WhatsApp los comandos pendientes del outbox (loop o una sola pasada)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--interval", type=float, default=1.0, help="Segundos entre pasadas si no hay pendientes")
+        parser.add_argument("--once", action="store_true", help="Una pasada y salir")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            n = outbox.drain(options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{n} commands sent"))
+            return
+
+        while True:
+            n = outbox.drain(options["batch_size"])
+            if n:
+                self.stdout.write(f"{n} commands sent")
+            else:
+                time.sleep(options["interval"])
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from subasta_app.bidbook import get_bid_book
+
+
+class Command(BaseCommand):
+    help = "Escribe en la tabla Bid las ofertas aceptadas por el libro de Redis (loop o una sola pasada)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--interval", type=float, default=0.5, help="Segundos entre pasadas si no hay pendientes")
+        parser.add_argument("--once", action="store_true", help="Vaciar la cola y salir")
+
+    def handle(self, *args, **options):
+        book = get_bid_book()
+        if book is None:
+            raise CommandError("BID_BOOK_REDIS_URL is not configured")
+
+        if options["once"]:
+            n = book.flush_all(options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{n} bids written"))
+            return
+
+        while True:
+            n = book.flush(options["batch_size"])
+            if n:
+                self.stdout.write(f"{n} bids written")
+            else:
+                time.sleep(options["interval"])
@@ -0,0 +1,46 @@
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+
+from subasta_app import item_import
+from subasta_app.models import Auction, ItemImport
+
+
+class Command(BaseCommand):
+    help = "Importa items a una subasta desde un manifest CSV/JSON y (opcional) un zip de imágenes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("auction_id", type=int)
+        parser.add_argument("manifest", help="Archivo .csv o .json")
+        parser.add_argument("--images", help="Zip con las imágenes referenciadas en la columna image")
+
+    def handle(self, *args, **options):
+        try:
+            auction = Auction.objects.get(pk=options["auction_id"])
+        except Auction.DoesNotExist:
+            raise CommandError(f"Auction {options['auction_id']} does not exist")
+
+        def progress(job):
+            self.stdout.write(f"[{time.perf_counter() - t0:6.2f}s] {job.stage}: {job.processed_rows}/{job.total_rows}")
+
+        t0 = time.perf_counter()
+        # El zip queda abierto mientras corre el import: las imágenes se leen a medida que se usan
+        with ExitStack() as stack:
+            try:
+                with open(options["manifest"], "rb") as f:
+                    rows = item_import.parse_manifest(f.read(), options["manifest"])
+                images = {}
+                if options["images"]:
+                    images = item_import.zip_images(stack.enter_context(open(options["images"], "rb")))
+            except (OSError, item_import.ManifestError) as e:
+                raise CommandError(str(e))
+            job = item_import.run(auction, rows, images, on_progress=progress)
+
+        if job.status != ItemImport.Status.DONE:
+            for error in job.errors[:20]:
+                self.stderr.write(f"row {error['index']}: {error['errors']}")
+            raise CommandError(f"Import {job.id} failed with {len(job.errors)} invalid rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"Import {job.id}: {job.created_items} items in {time.perf_counter() - t0:.2f}s"
+        ))
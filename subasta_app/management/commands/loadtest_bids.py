@@ -0,0 +1,88 @@
+import itertools
+import statistics
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from subasta_app.bidding import BidRejected, place_bid
+from subasta_app.models import Auction, Item, Participant
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test de bidding.place_bid: N hilos ofertando sobre el MISMO item (contención en el lock). "
+        "Usar contra Postgres; SQLite serializa todas las escrituras."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--bids", type=int, default=2000, help="Total de ofertas")
+        parser.add_argument("--keep", action="store_true", help="No borrar la subasta de prueba")
+
+    def handle(self, *args, **options):
+        auction = Auction.objects.create(title="loadtest", status=Auction.Status.RUNNING)
+        item = Item.objects.create(auction=auction, name="loadtest", base_price=Decimal("100"), increment=Decimal("1"))
+        participants = Participant.objects.bulk_create(
+            Participant(display_name=f"loadtest {i}", wa_user_id=f"loadtest-{auction.id}-{i}@whatsapp")
+            for i in range(options["threads"])
+        )
+
+        amounts = itertools.count(100)
+        seq = itertools.count()
+        lock = threading.Lock()
+        latencies, outcomes = [], {"accepted": 0, "rejected": 0, "errors": 0}
+        per_thread = options["bids"] // options["threads"]
+
+        def worker(participant):
+            try:
+                for _ in range(per_thread):
+                    with lock:
+                        amount, n = Decimal(next(amounts)), next(seq)
+                    data = {"participant_id": participant.id, "amount": amount,
+                            "source_message_id": f"loadtest-{auction.id}-{n}"}
+                    t0 = time.perf_counter()
+                    try:
+                        place_bid(item.id, data)
+                        outcome = "accepted"
+                    except BidRejected:
+                        outcome = "rejected"  # otra oferta más alta ganó el lock antes
+                    except Exception:
+                        outcome = "errors"
+                    elapsed = (time.perf_counter() - t0) * 1000
+                    with lock:
+                        latencies.append(elapsed)
+                        outcomes[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(p,)) for p in participants]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+
+        item.refresh_from_db()
+        self.stdout.write(f"bids: {len(latencies)} in {wall:.2f}s ({len(latencies) / wall:.0f} bids/s)")
+        self.stdout.write(", ".join(f"{k}: {v}" for k, v in outcomes.items()))
+        self.stdout.write(
+            f"latency ms  p50: {percentile(latencies, 50):.2f}  p99: {percentile(latencies, 99):.2f}  "
+            f"max: {max(latencies, default=0):.2f}  mean: {statistics.fmean(latencies) if latencies else 0:.2f}"
+        )
+        self.stdout.write(f"final highest bid: {item.highest_bid_amount} ({item.bids_count} valid bids)")
+
+        if not options["keep"]:
+            auction.delete()
+            Participant.objects.filter(pk__in=[p.pk for p in participants]).delete()
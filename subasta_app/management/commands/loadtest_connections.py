@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import aiohttp
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from subasta_app.models import Auction
+
+MODES = ("wsgi", "asgi")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def latency_stats(latencies, wall, errors):
+    q = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(q[49] * 1000, 2) if q else None,
+        "p95_ms": round(q[94] * 1000, 2) if q else None,
+        "p99_ms": round(q[98] * 1000, 2) if q else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Capacidad de conexiones concurrentes: WSGI (gunicorn sync) vs ASGI (gunicorn + uvicorn). "
+        "Con --spawn levanta cada modo con gunicorn.conf.py contra la base configurada; con --url mide "
+        "un servidor ya levantado. Escenarios: `poll` (N clientes consultando keep-alive y el estado en "
+        "vivo en loop) y `streams` (N feeds SSE abiertos a la vez + la latencia del healthcheck mientras "
+        "tanto; necesita LIVE_EVENTS_REDIS_URL compartido con el servidor). Bajo WSGI el feed responde 503 "
+        "(no se sirve), así que ahí los streams salen 0/N sin tomar workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--spawn", nargs="+", choices=MODES, help="Modos a levantar y comparar")
+        parser.add_argument("--url", help="Servidor ya levantado (en lugar de --spawn)")
+        parser.add_argument("--workers", type=int, default=2, help="WEB_CONCURRENCY de los servidores levantados")
+        parser.add_argument("--clients", type=int, default=200, help="Clientes concurrentes del escenario poll")
+        parser.add_argument("--duration", type=float, default=10, help="Segundos del escenario poll")
+        parser.add_argument("--streams", type=int, default=200, help="Feeds SSE abiertos a la vez (0 = omitir)")
+        parser.add_argument("--probes", type=int, default=20, help="Healthchecks mientras los feeds están abiertos")
+        parser.add_argument("--timeout", type=float, default=10, help="Timeout por request / para abrir un feed")
+        parser.add_argument("--auction", type=int, help="Subasta del estado en vivo / feed (default: la última)")
+        parser.add_argument("--host-header", help="Header Host (default: el primero de ALLOWED_HOSTS)")
+        parser.add_argument("--output", help="Archivo JSON con los resultados")
+
+    def handle(self, *args, **options):
+        if bool(options["spawn"]) == bool(options["url"]):
+            raise CommandError("Use either --spawn wsgi asgi or --url")
+        auction_id = options["auction"] or Auction.objects.order_by("-id").values_list("id", flat=True).first()
+        hosts = [h for h in settings.ALLOWED_HOSTS if h not in ("*", "")]
+        headers = {
+            "Host": options["host_header"] or (hosts[0].lstrip(".") if hosts else "localhost"),
+            "Authorization": f"Bearer {AccessToken()}",
+        }
+        if not getattr(settings, "LIVE_EVENTS_REDIS_URL", "") and options["streams"]:
+            self.stderr.write("LIVE_EVENTS_REDIS_URL is not set: skipping the streams scenario")
+            options["streams"] = 0
+
+        results = {}
+        if options["url"]:
+            results["target"] = asyncio.run(self.measure(options["url"].rstrip("/"), headers, auction_id, options))
+        for mode in options["spawn"] or ():
+            port = free_port()
+            server = self.spawn(mode, port, options["workers"])
+            try:
+                base = f"http://127.0.0.1:{port}"
+                self.wait_ready(server, base, headers)
+                results[mode] = asyncio.run(self.measure(base, headers, auction_id, options))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+        self.report(results)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    # ---- servidores ----
+
+    @staticmethod
+    def spawn(mode, port, workers):
+        env = {**os.environ, "SERVER_MODE": mode, "PORT": str(port), "WEB_CONCURRENCY": str(workers)}
+        return subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", str(settings.BASE_DIR / "gunicorn.conf.py")],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+
+    @staticmethod
+    def wait_ready(server, base, headers, seconds=30):
+        async def ping():
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"{base}/keep-alive/", headers=headers) as resp:
+                    return resp.status
+
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"Server exited: {server.stderr.read().decode(errors='replace')[-2000:]}")
+            try:
+                if asyncio.run(ping()) == 200:
+                    return
+            except aiohttp.ClientError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f"Server at {base} did not become ready in {seconds}s")
+
+    # ---- escenarios ----
+
+    async def measure(self, base, headers, auction_id, options):
+        paths = ["/keep-alive/"]
+        if auction_id:
+            paths.append(f"/api/auctions/{auction_id}/live/")
+        connector = aiohttp.TCPConnector(limit=0)
+        timeout = aiohttp.ClientTimeout(total=options["timeout"])
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            result = {"poll": await self.poll(session, base, paths, headers, options["clients"], options["duration"])}
+            if options["streams"] and auction_id:
+                result["streams"] = await self.streams(
+                    session, base, f"/api/auctions/{auction_id}/events/", headers, options,
+                )
+        self.stdout.write(f"{base}: done")
+        return result
+
+    @staticmethod
+    async def poll(session, base, paths, headers, clients, duration):
+        latencies, errors = [], 0
+        deadline = time.monotonic() + duration
+
+        async def client(n):
+            nonlocal errors
+            while time.monotonic() < deadline:
+                path = paths[n % len(paths)]
+                n += 1
+                t = time.perf_counter()
+                try:
+                    async with session.get(base + path, headers=headers) as resp:
+                        await resp.read()
+                        if resp.status != 200:
+                            errors += 1
+                            continue
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - t)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(clients)))
+        return {"clients": clients, **latency_stats(latencies, time.perf_counter() - t0, errors)}
+
+    @staticmethod
+    async def streams(session, base, path, headers, options):
+        """Abre N feeds a la vez, cuenta cuántos llegan a mandar su primer byte y mide el healthcheck."""
+        stop = asyncio.Event()
+        established = 0
+        no_timeout = aiohttp.ClientTimeout(total=None, sock_connect=options["timeout"])
+
+        async def stream():
+            nonlocal established
+            try:
+                async with session.get(base + path, headers=headers, timeout=no_timeout) as resp:
+                    if resp.status != 200:
+                        return
+                    await asyncio.wait_for(resp.content.readline(), options["timeout"])  # "retry: ..."
+                    established += 1
+                    await stop.wait()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+
+        tasks = [asyncio.create_task(stream()) for _ in range(options["streams"])]
+        await asyncio.sleep(min(options["timeout"], 5))  # que los feeds terminen de abrirse
+
+        latencies, errors = [], 0
+        t0 = time.perf_counter()
+        for _ in range(options["probes"]):
+            t = time.perf_counter()
+            try:
+                async with session.get(f"{base}/keep-alive/", headers=headers) as resp:
+                    await resp.read()
+                    ok = resp.status == 200
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - t)
+            else:
+                errors += 1
+        probe = latency_stats(latencies, time.perf_counter() - t0, errors)
+
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return {"opened": options["streams"], "established": established, "probe": probe}
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'target':<8}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+            f"{'streams':>10}{'probe p95':>11}"
+        )
+        for target, r in results.items():
+            poll = r["poll"]
+            streams = r.get("streams")
+            held = f"{streams['established']}/{streams['opened']}" if streams else "-"
+            probe = streams["probe"]["p95_ms"] if streams else None
+            self.stdout.write(
+                f"{target:<8}{poll['clients']:>8}{poll['rps']:>10.1f}{poll['p50_ms'] or 0:>10.2f}"
+                f"{poll['p95_ms'] or 0:>10.2f}{poll['p99_ms'] or 0:>10.2f}{poll['errors']:>8}"
+                f"{held:>10}{probe if probe is not None else '-':>11}"
+            )
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from subasta_app import images
+
+
+class Command(BaseCommand):
+    help = "Genera hash y variantes (thumb/whatsapp/full, WebP+JPEG) de las imágenes de items pendientes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--interval", type=float, default=2.0, help="Segundos entre pasadas si no hay pendientes")
+        parser.add_argument("--once", action="store_true", help="Procesar lo pendiente y salir")
+
+    def handle(self, *args, **options):
+        while True:
+            n = images.process_pending(options["batch_size"])
+            if n:
+                self.stdout.write(f"{n} images processed")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["interval"])
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from subasta_app.models import Item
+
+
+class Command(BaseCommand):
+    help = "Recalcula el resumen de ofertas (highest_bid_amount, leading_participant, bids_count, last_bid_at) de cada Item."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--auction", type=int, help="Solo los items de esta subasta")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        qs = Item.objects.order_by("pk")
+        if options["auction"]:
+            qs = qs.filter(auction_id=options["auction"])
+
+        batch_size = options["batch_size"]
+        pks = list(qs.values_list("pk", flat=True))
+        updated = 0
+        # Lotes chicos: cada uno es su propia transacción y bloquea pocos items a la vez
+        for start in range(0, len(pks), batch_size):
+            updated += Item.objects.filter(pk__in=pks[start:start + batch_size]).refresh_bid_summary()
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} items updated"))
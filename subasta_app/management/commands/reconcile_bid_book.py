@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from subasta_app.bidbook import get_bid_book
+from subasta_app.models import Auction
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el libro de ofertas de Redis desde la base (correr tras reiniciar Redis)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--auction", type=int, help="Solo esta subasta")
+        parser.add_argument(
+            "--config-only", action="store_true",
+            help="Solo copia precio base / incremento / vencimiento de la base (tras editar items por fuera "
+                 "de Django, p. ej. desde Node); no toca las ofertas",
+        )
+
+    def handle(self, *args, **options):
+        book = get_bid_book()
+        if book is None:
+            raise CommandError("BID_BOOK_REDIS_URL is not configured")
+
+        if options["config_only"]:
+            auction_ids = [options["auction"]] if options["auction"] else list(
+                Auction.objects.filter(status=Auction.Status.RUNNING).values_list("pk", flat=True)
+            )
+            for auction_id in auction_ids:
+                book.sync_auction_items(auction_id)
+            self.stdout.write(self.style.SUCCESS(f"{len(auction_ids)} auctions synced"))
+            return
+
+        if options["auction"]:
+            book.flush_all()
+            book.load_auction(options["auction"])
+            self.stdout.write(self.style.SUCCESS(f"Auction {options['auction']} reloaded"))
+            return
+
+        n = book.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"{n} running auctions reloaded"))
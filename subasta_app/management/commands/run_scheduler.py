@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from subasta_app import scheduler
+
+
+class Command(BaseCommand):
+    help = "Arranca / cierra subastas y vence claims a horario (loop o una sola pasada). Se puede correr en varias réplicas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--interval", type=float, default=1.0,
+                            help="Máximo de segundos entre pasadas (antes si hay un vencimiento más cercano)")
+        parser.add_argument("--once", action="store_true", help="Una pasada y salir")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            n, _ = scheduler.tick(limit=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{n} transitions"))
+            return
+
+        while True:
+            n, next_at = scheduler.tick(limit=options["batch_size"])
+            if n:
+                self.stdout.write(f"{n} transitions")
+                continue
+            # Dormir hasta el próximo vencimiento, pero no más de --interval: así se ven los que se
+            # agregan o se mueven (ej. un claim extendido) sin esperar demasiado
+            wait = options["interval"]
+            if next_at is not None:
+                wait = min(wait, max((next_at - timezone.now()).total_seconds(), 0))
+            time.sleep(wait)
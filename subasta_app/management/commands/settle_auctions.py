@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+
+from subasta_app.models import Auction, Bid
+from subasta_app.settlement import SettlementError, settle
+
+
+class Command(BaseCommand):
+    help = "Adjudica los items de subastas FINISHED (ganador = mejor oferta válida). Idempotente."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--auction", type=int, action="append",
+                            help="Solo estas subastas (repetible). Sin esto: las FINISHED con items por adjudicar")
+
+    def handle(self, *args, **options):
+        if options["auction"]:
+            auctions = Auction.objects.filter(pk__in=options["auction"])
+        else:
+            pending = Bid.objects.filter(item__auction=OuterRef("pk"), item__is_sold=False, is_valid=True)
+            auctions = Auction.objects.filter(status=Auction.Status.FINISHED).filter(Exists(pending))
+
+        total = 0
+        for auction in auctions.order_by("pk"):
+            try:
+                result = settle(auction)
+            except SettlementError as e:
+                raise CommandError(f"Auction {auction.id}: {e}")
+            total += result.sold
+            self.stdout.write(f"Auction {auction.id}: {result.sold} sold, {result.unsold} without bids")
+        self.stdout.write(self.style.SUCCESS(f"{total} items sold"))
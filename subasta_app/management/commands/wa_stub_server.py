@@ -0,0 +1,27 @@
+from urllib.parse import urlparse
+
+from django.core.management.base import BaseCommand
+
+from subasta_app.services import _cfg
+from subasta_app.wa_stub import make_server
+
+
+class Command(BaseCommand):
+    help = "Levanta un servicio de WhatsApp falso (start/close/health) en WHATSAPP_SERVICE_BASEURL."
+
+    def add_arguments(self, parser):
+        url = urlparse(_cfg.base_url)
+        parser.add_argument("--host", default=url.hostname or "127.0.0.1")
+        parser.add_argument("--port", type=int, default=url.port or 3000)
+        parser.add_argument("--latency-ms", type=float, default=20, help="Latencia simulada por comando")
+
+    def handle(self, *args, **options):
+        server = make_server(options["host"], options["port"], options["latency_ms"])
+        self.stdout.write(f"WhatsApp stub on http://{options['host']}:{options['port']} "
+                          f"({options['latency_ms']}ms per command)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,216 @@
+"""
+Métricas por endpoint (nombre de la URL resuelta + método): latencia, queries, tiempo de base y
+tamaño de respuesta, expuestas en formato texto de Prometheus en /metrics/.
+
+- MetricsMiddleware mide cada request y deja un Collector en un ContextVar.
+- Cada conexión a la base lleva un execute wrapper (instalado al conectarse) que suma en el
+  Collector del request actual; al ser un ContextVar también cuenta las queries de vistas sync
+  servidas por ASGI (sync_to_async copia el contexto al thread).
+- Con METRICS_SLOW_REQUEST_MS > 0, los requests más lentos que eso se loguean con sus peores SQL.
+
+Las métricas viven en memoria del proceso: con varios workers cada uno expone las suyas.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SLOW_LOG_STATEMENTS = 5
+SQL_LOG_CHARS = 500
+
+UNRESOLVED = "<unresolved>"
+
+
+@dataclass
+class Collector:
+    """Lo que juntó un request: queries y tiempo de base (y las sentencias si hay slow log)."""
+    keep_statements: bool = False
+    queries: int = 0
+    db_seconds: float = 0.0
+    statements: List[Tuple[float, str]] = field(default_factory=list)
+
+    def record(self, sql: str, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        if self.keep_statements:
+            self.statements.append((seconds, sql))
+
+    def worst(self, n: int = SLOW_LOG_STATEMENTS) -> List[Tuple[float, str]]:
+        return sorted(self.statements, key=lambda s: s[0], reverse=True)[:n]
+
+
+_current: ContextVar[Optional[Collector]] = ContextVar("metrics_collector", default=None)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    collector = _current.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.record(sql, time.perf_counter() - start)
+
+
+def install_db_wrapper(connection, **kwargs):
+    """Receiver de connection_created: el wrapper queda puesto para toda la vida de la conexión."""
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.queries: Dict[Tuple[str, str], Histogram] = {}
+        self.db_seconds: Dict[Tuple[str, str], float] = {}
+        self.response_bytes: Dict[Tuple[str, str], int] = {}
+
+    def observe(self, view: str, method: str, status: int, seconds: float, collector: Collector,
+                size: Optional[int]):
+        key = (view, method)
+        with self._lock:
+            self.requests[(view, method, status)] = self.requests.get((view, method, status), 0) + 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.queries.setdefault(key, Histogram(QUERY_BUCKETS)).observe(collector.queries)
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + collector.db_seconds
+            if size is not None:  # streaming: el tamaño no se conoce al devolver la respuesta
+                self.response_bytes[key] = self.response_bytes.get(key, 0) + size
+
+    def reset(self):
+        with self._lock:
+            for data in (self.requests, self.latency, self.queries, self.db_seconds, self.response_bytes):
+                data.clear()
+
+    def render(self) -> str:
+        """Formato texto de Prometheus (exposition format 0.0.4)."""
+        out: List[str] = []
+        with self._lock:
+            out += [
+                "# HELP subasta_http_requests_total Requests by view, method and status.",
+                "# TYPE subasta_http_requests_total counter",
+            ]
+            for (view, method, status), n in sorted(self.requests.items()):
+                out.append(f'subasta_http_requests_total{{{_labels(view, method)},status="{status}"}} {n}')
+            _render_histograms(out, "subasta_http_request_duration_seconds", "Request latency.", self.latency)
+            _render_histograms(out, "subasta_http_db_queries", "DB queries per request.", self.queries)
+            out += [
+                "# HELP subasta_http_db_duration_seconds_total Time spent in DB queries.",
+                "# TYPE subasta_http_db_duration_seconds_total counter",
+            ]
+            for (view, method), seconds in sorted(self.db_seconds.items()):
+                out.append(f"subasta_http_db_duration_seconds_total{{{_labels(view, method)}}} {seconds:.6f}")
+            out += [
+                "# HELP subasta_http_response_size_bytes_total Response body bytes (non-streaming).",
+                "# TYPE subasta_http_response_size_bytes_total counter",
+            ]
+            for (view, method), size in sorted(self.response_bytes.items()):
+                out.append(f"subasta_http_response_size_bytes_total{{{_labels(view, method)}}} {size}")
+        return "\n".join(out) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(view: str, method: str) -> str:
+    return f'view="{_escape(view)}",method="{_escape(method)}"'
+
+
+def _render_histograms(out: List[str], name: str, help_text: str, histograms: Dict[Tuple[str, str], Histogram]):
+    out += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (view, method), h in sorted(histograms.items()):
+        labels = _labels(view, method)
+        cumulative = 0
+        for bound, n in zip(h.buckets, h.counts):
+            cumulative += n
+            out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        out.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+        out.append(f"{name}_sum{{{labels}}} {h.sum:.6f}")
+        out.append(f"{name}_count{{{labels}}} {h.count}")
+
+
+registry = Registry()
+
+
+def _slow_threshold() -> float:
+    return float(getattr(settings, "METRICS_SLOW_REQUEST_MS", 0) or 0) / 1000
+
+
+def _view_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else UNRESOLVED
+
+
+def _finish(request, response, collector: Collector, seconds: float):
+    view = _view_name(request)
+    size = None if response.streaming else len(response.content)
+    registry.observe(view, request.method, response.status_code, seconds, collector, size)
+    threshold = _slow_threshold()
+    if threshold and seconds >= threshold:
+        worst = "\n".join(f"  {s * 1000:.1f}ms {sql[:SQL_LOG_CHARS]}" for s, sql in collector.worst())
+        logger.warning(
+            "Slow request %s %s (%s) %s: %.1fms, %d queries, %.1fms in DB\n%s",
+            request.method, request.path, view, response.status_code, seconds * 1000,
+            collector.queries, collector.db_seconds * 1000, worst,
+        )
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        collector = Collector(keep_statements=bool(_slow_threshold()))
+        token = _current.set(collector)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, collector, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        collector = Collector(keep_statements=bool(_slow_threshold()))
+        token = _current.set(collector)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, collector, time.perf_counter() - start)
+        return response
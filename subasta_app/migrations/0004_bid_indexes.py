@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subasta_app', '0003_item_bid_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['item', 'is_valid', '-amount'], name='bid_item_valid_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['item', 'created_at'], name='bid_item_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['participant', 'created_at'], name='bid_participant_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bid',
+            constraint=models.UniqueConstraint(condition=models.Q(('source_message_id', ''), _negated=True), fields=('source_message_id',), name='bid_unique_source_message'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subasta_app', '0004_bid_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bid',
+            name='source_chat_id',
+            field=models.CharField(blank=True, default='', max_length=128),
+        ),
+    ]
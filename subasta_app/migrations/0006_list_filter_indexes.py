@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subasta_app', '0005_bid_source_chat_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['created_at', 'id'], name='bid_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['auction', 'is_sold'], name='item_auction_sold_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subasta_app', '0007_outbox_command'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(default='manifest', max_length=20)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='RUNNING', max_length=10)),
+                ('stage', models.CharField(choices=[('validating', 'Validating'), ('images', 'Images'), ('inserting', 'Inserting'), ('finished', 'Finished')], default='validating', max_length=12)),
+                ('total_rows', models.PositiveIntegerField(default=0)),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('created_items', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('auction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imports', to='subasta_app.auction')),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subasta_app', '0009_item_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='claim_closed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='auction',
+            index=models.Index(fields=['status', 'starts_at'], name='auction_status_starts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auction',
+            index=models.Index(fields=['status', 'ends_at'], name='auction_status_ends_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('claim_closed_at__isnull', True), ('is_sold', False)), fields=['claim_expires_at'], name='item_claim_due_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:07
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subasta_app', '0011_outbox_extend_claim'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='participant',
+            name='subasta_app_phone_2032f1_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='participant',
+            name='subasta_app_wa_user_bb0beb_idx',
+        ),
+    ]
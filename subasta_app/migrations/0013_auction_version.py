@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subasta_app', '0012_participant_drop_redundant_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auction',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='auction',
+            name='version',
+            field=models.PositiveBigIntegerField(default=1),
+        ),
+    ]
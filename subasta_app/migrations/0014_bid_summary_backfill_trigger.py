@@ -0,0 +1,107 @@
+"""
+Resumen de ofertas de Item (0003) calculado para los items existentes, y en PostgreSQL un trigger
+que lo mantiene desde la base: el servicio de Node inserta ofertas directo en la tabla (sin pasar
+por Bid.save), así que el resumen tiene que actualizarse también para esas filas.
+
+El trigger es por statement (tablas de transición): un bulk_create de 500 ofertas recalcula cada
+item tocado una sola vez. También sube Auction.version (ETag, ver versioning.py), salvo en las
+conexiones de Django, que la suben al confirmar sin bloquear la fila de la subasta en la
+transacción de la oferta (ver versioning.mark_connection).
+"""
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill(apps, schema_editor):
+    # Misma lógica que ItemQuerySet.refresh_bid_summary (los modelos históricos no tienen el queryset)
+    Item = apps.get_model("subasta_app", "Item")
+    Bid = apps.get_model("subasta_app", "Bid")
+    valid = Bid.objects.filter(item=OuterRef("pk"), is_valid=True)
+    top = valid.order_by("-amount", "created_at", "id")
+    Item.objects.update(
+        highest_bid_amount=Subquery(top.values("amount")[:1]),
+        leading_participant=Subquery(top.values("participant")[:1]),
+        bids_count=Coalesce(Subquery(valid.order_by().values("item").annotate(n=Count("id")).values("n")), 0),
+        last_bid_at=Subquery(valid.order_by("-created_at").values("created_at")[:1]),
+    )
+
+
+TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION subasta_bid_summary() RETURNS trigger AS $$
+DECLARE
+    touched bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT item_id) INTO touched FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT item_id) INTO touched FROM old_rows;
+    ELSE
+        SELECT array_agg(DISTINCT item_id) INTO touched
+        FROM (SELECT item_id FROM new_rows UNION SELECT item_id FROM old_rows) AS changed;
+    END IF;
+    IF touched IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE subasta_app_item AS i
+    SET highest_bid_amount = top.amount,
+        leading_participant_id = top.participant_id,
+        bids_count = agg.n,
+        last_bid_at = agg.last
+    FROM unnest(touched) AS t(id)
+    LEFT JOIN LATERAL (
+        SELECT b.amount, b.participant_id FROM subasta_app_bid b
+        WHERE b.item_id = t.id AND b.is_valid
+        ORDER BY b.amount DESC, b.created_at, b.id LIMIT 1
+    ) AS top ON true
+    CROSS JOIN LATERAL (
+        SELECT count(*) AS n, max(b.created_at) AS last FROM subasta_app_bid b
+        WHERE b.item_id = t.id AND b.is_valid
+    ) AS agg
+    WHERE i.id = t.id;
+
+    IF current_setting('subasta.writer', true) IS DISTINCT FROM 'django' THEN
+        UPDATE subasta_app_auction SET version = version + 1, updated_at = now()
+        WHERE id IN (SELECT auction_id FROM subasta_app_item WHERE id = ANY(touched));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER subasta_bid_summary_insert AFTER INSERT ON subasta_app_bid
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION subasta_bid_summary();
+CREATE TRIGGER subasta_bid_summary_update AFTER UPDATE ON subasta_app_bid
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION subasta_bid_summary();
+CREATE TRIGGER subasta_bid_summary_delete AFTER DELETE ON subasta_app_bid
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION subasta_bid_summary();
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS subasta_bid_summary_insert ON subasta_app_bid;
+DROP TRIGGER IF EXISTS subasta_bid_summary_update ON subasta_app_bid;
+DROP TRIGGER IF EXISTS subasta_bid_summary_delete ON subasta_app_bid;
+DROP FUNCTION IF EXISTS subasta_bid_summary();
+"""
+
+
+def create_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(TRIGGER_SQL)
+
+
+def drop_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_TRIGGER_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subasta_app', '0013_auction_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.RunPython(create_trigger, drop_trigger),
+    ]
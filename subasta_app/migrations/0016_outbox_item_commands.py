@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subasta_app', '0015_outbox_sending'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxcommand',
+            name='command',
+            field=models.CharField(choices=[('start', 'Start'), ('close', 'Close'), ('extend_claim', 'Extend Claim'), ('item_commands', 'Item Commands')], max_length=32),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subasta_app', '0016_outbox_item_commands'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auction',
+            name='scheduler_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='auction',
+            name='scheduler_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='scheduler_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='scheduler_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,82 @@
+"""
+Trigger del resumen de ofertas (0014) con lock de los items antes de recalcular.
+
+Con READ COMMITTED, dos INSERT concurrentes de Node sobre el mismo item corrían los subqueries con
+un snapshot que no veía la oferta (sin confirmar) de la otra transacción; esperar el lock de la
+fila en el UPDATE no los vuelve a evaluar, así que el último en escribir podía dejar bids_count o
+la mejor oferta viejos. Ahora se bloquean primero las filas de los items (en orden de id, sin
+deadlocks entre triggers) y el UPDATE, que en plpgsql toma un snapshot nuevo, ya ve lo confirmado.
+"""
+import importlib
+
+from django.db import migrations
+
+FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION subasta_bid_summary() RETURNS trigger AS $$
+DECLARE
+    touched bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT item_id) INTO touched FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT item_id) INTO touched FROM old_rows;
+    ELSE
+        SELECT array_agg(DISTINCT item_id) INTO touched
+        FROM (SELECT item_id FROM new_rows UNION SELECT item_id FROM old_rows) AS changed;
+    END IF;
+    IF touched IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- Serializa a los escritores concurrentes del mismo item: quien espera acá recalcula
+    -- después con un snapshot que ya incluye las ofertas del otro
+    PERFORM 1 FROM subasta_app_item WHERE id = ANY(touched) ORDER BY id FOR UPDATE;
+
+    UPDATE subasta_app_item AS i
+    SET highest_bid_amount = top.amount,
+        leading_participant_id = top.participant_id,
+        bids_count = agg.n,
+        last_bid_at = agg.last
+    FROM unnest(touched) AS t(id)
+    LEFT JOIN LATERAL (
+        SELECT b.amount, b.participant_id FROM subasta_app_bid b
+        WHERE b.item_id = t.id AND b.is_valid
+        ORDER BY b.amount DESC, b.created_at, b.id LIMIT 1
+    ) AS top ON true
+    CROSS JOIN LATERAL (
+        SELECT count(*) AS n, max(b.created_at) AS last FROM subasta_app_bid b
+        WHERE b.item_id = t.id AND b.is_valid
+    ) AS agg
+    WHERE i.id = t.id;
+
+    IF current_setting('subasta.writer', true) IS DISTINCT FROM 'django' THEN
+        UPDATE subasta_app_auction SET version = version + 1, updated_at = now()
+        WHERE id IN (SELECT auction_id FROM subasta_app_item WHERE id = ANY(touched));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def lock_items(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(FUNCTION_SQL)
+
+
+def unlock_items(apps, schema_editor):
+    # La función de 0014 (el CREATE TRIGGER de ese SQL ya existe: solo la función)
+    if schema_editor.connection.vendor == "postgresql":
+        previous = importlib.import_module("subasta_app.migrations.0014_bid_summary_backfill_trigger")
+        schema_editor.execute(previous.TRIGGER_SQL.split("CREATE TRIGGER")[0])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subasta_app', '0017_scheduler_backoff'),
+    ]
+
+    operations = [
+        migrations.RunPython(lock_items, unlock_items),
+    ]
@@ -1,17 +1,19 @@
-from django.db import models
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from . import versioning
+
 
 class Participant(models.Model):
     display_name = models.CharField(max_length=120, blank=True, default="")
     phone = models.CharField(max_length=32, unique=True, null=True, blank=True)
     wa_user_id = models.CharField(max_length=64, unique=True, null=True, blank=True)  # ej "12345@whatsapp"
-
-    class Meta:
-        indexes = [
-            models.Index(fields=["phone"]),
-            models.Index(fields=["wa_user_id"]),
-        ]
+    # Sin índices extra: los unique de phone y wa_user_id ya crean uno cada uno
 
     def __str__(self):
         return self.display_name or self.phone or self.wa_user_id or "participant"
@@ -39,17 +41,84 @@ class Auction(models.Model):
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.DRAFT)
     starts_at = models.DateTimeField(null=True, blank=True)
     ends_at = models.DateTimeField(null=True, blank=True)
+    # Transiciones del scheduler que fallaron: no se reintentan antes de scheduler_retry_at
+    scheduler_failures = models.PositiveIntegerField(default=0)
+    scheduler_retry_at = models.DateTimeField(null=True, blank=True)
     wa_group = models.ForeignKey(WhatsAppGroup, null=True, blank=True, on_delete=models.SET_NULL,
                                  related_name="auctions")
     created_at = models.DateTimeField(default=timezone.now)
+    # Suben con cualquier cambio de la subasta o de lo que cuelga de ella (ETag / Last-Modified, ver versioning.py)
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Próximos inicios / cierres (scheduler.py)
+            models.Index(fields=["status", "starts_at"], name="auction_status_starts_idx"),
+            models.Index(fields=["status", "ends_at"], name="auction_status_ends_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} [{self.status}]"
 
 
+def bid_summary_in_db(using: str = "default") -> bool:
+    """
+    En PostgreSQL el resumen de ofertas de Item lo mantiene un trigger (migraciones 0014 / 0018), también
+    para las ofertas que Node inserta directo en la tabla; en el resto de las bases, Bid.save.
+    """
+    return connections[using].vendor == "postgresql"
+
+
+class ItemQuerySet(models.QuerySet):
+    def apply_bid(self, bid):
+        """Suma una oferta válida nueva al resumen del item en un solo UPDATE (sin leer la fila)."""
+        if bid_summary_in_db(self.db):
+            versioning.touch(item_ids=[bid.item_id])  # el trigger ya actualizó el item
+            return 1
+        higher = Q(highest_bid_amount__isnull=True) | Q(highest_bid_amount__lt=bid.amount)
+        later = Q(last_bid_at__isnull=True) | Q(last_bid_at__lt=bid.created_at)
+        updated = self.filter(pk=bid.item_id).update(
+            bids_count=F("bids_count") + 1,
+            last_bid_at=Case(
+                When(later, then=Value(bid.created_at)),
+                default=F("last_bid_at"),
+                output_field=models.DateTimeField(),
+            ),
+            highest_bid_amount=Case(
+                When(higher, then=Value(bid.amount)),
+                default=F("highest_bid_amount"),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            leading_participant=Case(
+                When(higher, then=Value(bid.participant_id)),
+                default=F("leading_participant"),
+                output_field=models.BigIntegerField(),
+            ),
+        )
+        versioning.touch(item_ids=[bid.item_id])
+        return updated
+
+    def refresh_bid_summary(self):
+        """Recalcula el resumen desde la tabla Bid (para invalidaciones, borrados y rebuilds)."""
+        valid = Bid.objects.filter(item=OuterRef("pk"), is_valid=True)
+        top = valid.order_by("-amount", "created_at", "id")
+        with transaction.atomic():
+            # Bloqueamos los items para no pisar un apply_bid concurrente
+            pks = list(self.select_for_update().values_list("pk", flat=True))
+            versioning.touch(item_ids=pks)  # se aplica al confirmar, después del UPDATE
+            return Item.objects.filter(pk__in=pks).update(
+                highest_bid_amount=Subquery(top.values("amount")[:1]),
+                leading_participant=Subquery(top.values("participant")[:1]),
+                bids_count=Coalesce(
+                    Subquery(valid.order_by().values("item").annotate(n=Count("id")).values("n")),
+                    0,
+                ),
+                last_bid_at=Subquery(valid.order_by("-created_at").values("created_at")[:1]),
+            )
+
+
 class Item(models.Model):  # Nueva versión de Product
     auction = models.ForeignKey(Auction, related_name="items", on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
@@ -67,13 +136,50 @@ class Item(models.Model):  # Nueva versión de Product
     wa_message_id = models.CharField(max_length=128, blank=True, default="")
     wa_stanza_id = models.CharField(max_length=128, blank=True, default="")
     claim_expires_at = models.DateTimeField(null=True, blank=True)
+    claim_closed_at = models.DateTimeField(null=True, blank=True)  # cuando el scheduler procesó el vencimiento
+    scheduler_failures = models.PositiveIntegerField(default=0)  # vencimientos que fallaron (ver Auction)
+    scheduler_retry_at = models.DateTimeField(null=True, blank=True)
+
+    # Resumen de las ofertas VÁLIDAS (bids_count no cuenta las invalidadas). Lo mantiene el trigger de
+    # la migración 0014 en PostgreSQL, o Bid.save / BidViewSet en el resto (ver ItemQuerySet)
+    highest_bid_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    leading_participant = models.ForeignKey(Participant, null=True, blank=True, on_delete=models.SET_NULL,
+                                            related_name="leading_items")
+    bids_count = models.PositiveIntegerField(default=0)
+    last_bid_at = models.DateTimeField(null=True, blank=True)
+
+    # Imagen: sha256 del original + variantes {thumb|whatsapp|full: {webp|jpeg: path}} (ver images.py)
+    image_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    image_variants = models.JSONField(default=dict, blank=True)
+    image_processed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ItemQuerySet.as_manager()
 
     class Meta:
         ordering = ["auction_id", "order", "id"]
+        indexes = [
+            models.Index(fields=["auction", "is_sold"], name="item_auction_sold_idx"),
+            # Claims por vencer: solo los que el scheduler todavía no procesó
+            models.Index(fields=["claim_expires_at"], name="item_claim_due_idx",
+                         condition=Q(claim_closed_at__isnull=True, is_sold=False)),
+        ]
 
     def __str__(self):
         return f"{self.name} - ${self.base_price}"
 
+    def save(self, *args, **kwargs):
+        if self.image and not self.image._committed:
+            # Upload nuevo: se guarda por hash (sin duplicar) y las variantes quedan pendientes
+            from .images import store_upload
+
+            self.image.name, self.image_hash = store_upload(self.image.file)
+            self.image._committed = True
+            self.image_variants = {}
+            self.image_processed_at = None
+        elif not self.image and self.image_hash:
+            self.image_hash, self.image_variants, self.image_processed_at = "", {}, None
+        super().save(*args, **kwargs)
+
 
 class Rule(models.Model):
     auction = models.ForeignKey(Auction, related_name="rules", on_delete=models.CASCADE)
@@ -98,6 +204,14 @@ class MessageTemplate(models.Model):
     def __str__(self):
         return f"{self.auction_id}:{self.key}"
 
+    def clean(self):
+        from .templating import TemplateSyntaxError, parse
+
+        try:
+            parse(self.template)
+        except TemplateSyntaxError as e:
+            raise ValidationError({"template": str(e)})
+
 
 class Bid(models.Model):
     item = models.ForeignKey(Item, related_name="bids", on_delete=models.CASCADE)
@@ -106,3 +220,113 @@ class Bid(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     is_valid = models.BooleanField(default=True)
     source_message_id = models.CharField(max_length=128, blank=True, default="")  # WhatsApp msg id
+    source_chat_id = models.CharField(max_length=128, blank=True, default="")  # WhatsApp chat (grupo) id
+
+    class Meta:
+        indexes = [
+            # Precio actual de un item (mejor oferta válida)
+            models.Index(fields=["item", "is_valid", "-amount"], name="bid_item_valid_amount_idx"),
+            # Historial de un item / de un participante
+            models.Index(fields=["item", "created_at"], name="bid_item_created_idx"),
+            models.Index(fields=["participant", "created_at"], name="bid_participant_created_idx"),
+            # Listado paginado por cursor (GET /api/bids/?since=...)
+            models.Index(fields=["created_at", "id"], name="bid_created_idx"),
+        ]
+        constraints = [
+            # Un mensaje de WhatsApp genera como mucho una oferta ("" = sin mensaje asociado)
+            models.UniqueConstraint(
+                fields=["source_message_id"],
+                condition=~Q(source_message_id=""),
+                name="bid_unique_source_message",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Node inserta directo en la tabla: en PostgreSQL esas ofertas las refleja el trigger
+        # (migraciones 0014 / 0018); en otras bases hace falta `rebuild_bid_summaries`
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if created:
+                if self.is_valid:
+                    Item.objects.apply_bid(self)
+            elif bid_summary_in_db(self._state.db):
+                versioning.touch(item_ids=[self.item_id])
+            else:
+                # Puede haber cambiado is_valid / amount: recalculamos
+                Item.objects.filter(pk=self.item_id).refresh_bid_summary()
+
+
+def _idempotency_key():
+    return uuid.uuid4().hex
+
+
+class OutboxCommand(models.Model):
+    """Comando para el servicio de WhatsApp, confirmado junto con el cambio que lo origina (ver outbox.py)."""
+
+    class Command(models.TextChoices):
+        START = "start"
+        CLOSE = "close"
+        EXTEND_CLAIM = "extend_claim"
+        ITEM_COMMANDS = "item_commands"  # publish / expire / announce_winner (POST /api/items/commands/)
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING"
+        SENDING = "SENDING"  # tomado por un worker, llamada en curso
+        DONE = "DONE"
+        FAILED = "FAILED"
+
+    auction = models.ForeignKey(Auction, related_name="commands", on_delete=models.CASCADE)
+    command = models.CharField(max_length=32, choices=Command.choices)
+    payload = models.JSONField(default=dict, blank=True)
+    idempotency_key = models.CharField(max_length=64, unique=True, default=_idempotency_key)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # inicio del último intento
+    last_error = models.TextField(blank=True, default="")
+    response = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_status_next_idx"),
+            models.Index(fields=["auction", "status", "id"], name="outbox_auction_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.auction_id}:{self.command} [{self.status}]"
+
+
+class ItemImport(models.Model):
+    """Carga masiva de items (ver item_import.py); las filas de progreso se consultan mientras corre."""
+
+    class Status(models.TextChoices):
+        RUNNING = "RUNNING"
+        DONE = "DONE"
+        FAILED = "FAILED"
+
+    class Stage(models.TextChoices):
+        VALIDATING = "validating"
+        IMAGES = "images"
+        INSERTING = "inserting"
+        FINISHED = "finished"
+
+    auction = models.ForeignKey(Auction, related_name="imports", on_delete=models.CASCADE)
+    source = models.CharField(max_length=20, default="manifest")  # manifest | form
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.RUNNING)
+    stage = models.CharField(max_length=12, choices=Stage.choices, default=Stage.VALIDATING)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_items = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-id"]
+
+    def __str__(self):
+        return f"import {self.id} ({self.auction_id}) [{self.status}]"
@@ -0,0 +1,177 @@
+"""
+Outbox de comandos para el servicio de WhatsApp (wa_start / wa_close / claims / comandos de item).
+
+El cambio de estado de la subasta y el comando se guardan en la misma transacción, así que
+nunca queda una subasta RUNNING sin su `start` ni un `close` enviado por un cambio que hizo rollback.
+Un worker (`manage.py drain_outbox`) los envía después con reintentos y backoff. Cada comando
+lleva su Idempotency-Key, así que reenviarlo tras una caída no lo duplica en Node.
+Los comandos de una misma subasta salen en orden: uno no se envía mientras haya uno anterior pendiente.
+
+El envío no tiene una transacción abierta durante el HTTP: el comando se toma con un UPDATE
+condicional que lo pasa a SENDING, la llamada se hace fuera de toda transacción y el resultado se
+guarda con otro UPDATE. Un SENDING de hace más de SEND_TIMEOUT es de un worker que se cayó a
+mitad del envío y se vuelve a tomar (la Idempotency-Key evita el duplicado).
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from . import services
+from .models import Auction, OutboxCommand
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 300
+# Bastante más que una llamada con todos sus reintentos (services.WAConfig)
+SEND_TIMEOUT = timedelta(minutes=5)
+
+_HANDLERS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    OutboxCommand.Command.START: services.wa_start,
+    OutboxCommand.Command.CLOSE: services.wa_close,
+    OutboxCommand.Command.EXTEND_CLAIM: services.wa_extend_claim,
+    OutboxCommand.Command.ITEM_COMMANDS: services.wa_item_commands,
+}
+
+
+def enqueue(auction: Auction, command: str, payload: Optional[Dict[str, Any]] = None) -> OutboxCommand:
+    """Encola un comando. Llamarlo dentro de la transacción que cambia la subasta."""
+    return OutboxCommand.objects.create(auction=auction, command=command, payload=payload or {})
+
+
+def enqueue_claim_extension(auction_id: int, item_id: int, claim_expires_at) -> OutboxCommand:
+    """
+    Nuevo vencimiento de un claim. Si ya hay uno sin enviar para el item se le actualiza la fecha
+    (solo interesa la última), así una ráfaga de ofertas no encola un comando por oferta.
+    """
+    payload = {"item_id": item_id, "claim_expires_at": claim_expires_at.isoformat()}
+    pending = OutboxCommand.objects.filter(
+        auction_id=auction_id, command=OutboxCommand.Command.EXTEND_CLAIM, status=OutboxCommand.Status.PENDING,
+        payload__item_id=item_id,
+    ).order_by("-id").first()
+    # UPDATE condicional: si un worker lo tomó entre la lectura y acá, ya no está PENDING y el
+    # vencimiento nuevo va en un comando nuevo (pisar uno ya enviado lo perdería)
+    if pending is not None and OutboxCommand.objects.filter(
+        pk=pending.pk, status=OutboxCommand.Status.PENDING,
+    ).update(payload=payload):
+        pending.payload = payload
+        return pending
+    return OutboxCommand.objects.create(
+        auction_id=auction_id, command=OutboxCommand.Command.EXTEND_CLAIM, payload=payload,
+    )
+
+
+def enqueue_item_commands(commands: List[Dict[str, Any]]) -> List[OutboxCommand]:
+    """Comandos de item (item_commands.build, ya con su idempotency key) en el outbox, uno por subasta."""
+    by_auction: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for c in commands:
+        by_auction[c["auction_id"]].append({
+            "type": c["type"],
+            "auction_id": c["auction_id"],
+            "item_id": c["item_id"],
+            "payload": c["payload"],
+            "idempotency_key": c["idempotency_key"],
+        })
+    return [
+        OutboxCommand.objects.create(
+            auction_id=auction_id, command=OutboxCommand.Command.ITEM_COMMANDS, payload={"commands": chunk},
+        )
+        for auction_id, chunk in by_auction.items()
+    ]
+
+
+def backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS ** attempts, BACKOFF_MAX_SECONDS))
+
+
+def _claimable(now) -> Q:
+    # Pendiente con el backoff vencido, o en vuelo desde hace demasiado (el worker que lo tomó se cayó)
+    return (
+        Q(status=OutboxCommand.Status.PENDING, next_attempt_at__lte=now)
+        | Q(status=OutboxCommand.Status.SENDING, claimed_at__lt=now - SEND_TIMEOUT)
+    )
+
+
+def ready_ids(limit: int = 100):
+    """Ids de los comandos listos para enviar: vencido el backoff y primeros sin enviar de su subasta."""
+    earlier = OutboxCommand.objects.filter(
+        auction_id=OuterRef("auction_id"),
+        status__in=[OutboxCommand.Status.PENDING, OutboxCommand.Status.SENDING],
+        id__lt=OuterRef("id"),
+    )
+    return list(
+        OutboxCommand.objects
+        .filter(_claimable(timezone.now()))
+        .exclude(Exists(earlier))
+        .order_by("id")
+        .values_list("id", flat=True)[:limit]
+    )
+
+
+def send(command_id: int) -> Optional[OutboxCommand]:
+    """
+    Envía un comando. Tomarlo es un UPDATE condicional, así que dos workers no mandan el mismo;
+    None si otro worker lo tomó o ya no está pendiente.
+    """
+    claimed_at = timezone.now()
+    claimed = OutboxCommand.objects.filter(_claimable(claimed_at), pk=command_id).update(
+        status=OutboxCommand.Status.SENDING, claimed_at=claimed_at, attempts=F("attempts") + 1,
+    )
+    if not claimed:
+        return None
+    cmd = OutboxCommand.objects.get(pk=command_id)
+
+    # Sin transacción ni locks durante la llamada
+    try:
+        cmd.response = _HANDLERS[cmd.command](cmd.auction_id, idempotency_key=cmd.idempotency_key, **cmd.payload)
+    except services.WhatsAppCircuitOpen as e:
+        # No llegó a salir: no cuenta como intento, se reprograma para cuando el breaker pruebe de nuevo
+        cmd.attempts -= 1
+        cmd.last_error = str(e)
+        cmd.status = OutboxCommand.Status.PENDING
+        cmd.next_attempt_at = timezone.now() + timedelta(seconds=services.breaker.cooldown)
+    except services.WhatsAppServiceUnavailable as e:
+        # Transitorio: reintento con backoff hasta MAX_ATTEMPTS
+        cmd.last_error = str(e)
+        if cmd.attempts >= MAX_ATTEMPTS:
+            cmd.status = OutboxCommand.Status.FAILED
+            cmd.completed_at = timezone.now()
+        else:
+            cmd.status = OutboxCommand.Status.PENDING
+            cmd.next_attempt_at = timezone.now() + backoff(cmd.attempts)
+    except (services.WhatsAppServiceError, ValueError, KeyError, TypeError) as e:
+        # 4xx / comando mal armado: reintentar no lo arregla
+        cmd.last_error = str(e)
+        cmd.status = OutboxCommand.Status.FAILED
+        cmd.completed_at = timezone.now()
+    else:
+        cmd.last_error = ""
+        cmd.status = OutboxCommand.Status.DONE
+        cmd.completed_at = timezone.now()
+
+    # Solo si sigue siendo nuestro: pasado SEND_TIMEOUT otro worker pudo haberlo retomado
+    recorded = OutboxCommand.objects.filter(
+        pk=cmd.pk, status=OutboxCommand.Status.SENDING, claimed_at=claimed_at,
+    ).update(
+        attempts=cmd.attempts, response=cmd.response, last_error=cmd.last_error, status=cmd.status,
+        next_attempt_at=cmd.next_attempt_at, completed_at=cmd.completed_at,
+    )
+    if not recorded:
+        logger.warning("Outbox command %s was reclaimed while sending; result discarded", cmd.id)
+    elif cmd.status == OutboxCommand.Status.FAILED:
+        logger.error("Outbox command %s (%s auction %s) failed: %s", cmd.id, cmd.command, cmd.auction_id, cmd.last_error)
+    return cmd
+
+
+def drain(limit: int = 100) -> int:
+    """Una pasada del worker. Devuelve cuántos comandos intentó enviar."""
+    sent = 0
+    for command_id in ready_ids(limit):
+        if send(command_id) is not None:
+            sent += 1
+    return sent
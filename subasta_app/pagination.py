@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) para todos los BaseViewSet: sin COUNT(*) ni OFFSET,
+    así el costo de una página no crece con la tabla.
+    Cada viewset define su orden con `cursor_ordering` (el primer campo es el que usa el cursor).
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("-id",)
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, "cursor_ordering", self.ordering)
@@ -0,0 +1,117 @@
+"""
+Resolución wa_user_id -> Participant para las ofertas que llegan de WhatsApp.
+
+- Cache en proceso (LRU con TTL) de wa_user_id -> id: un participante que ya ofertó no cuesta
+  ninguna query. El TTL acota cuánto puede quedar viejo un id si el participante se borra desde
+  otro proceso (en este proceso se borra del cache por señal).
+- Los que no están en cache se resuelven de una: un INSERT ... ON CONFLICT (wa_user_id) con
+  RETURNING, que crea los nuevos y devuelve el id de los existentes en un solo statement y sin la
+  carrera de get_or_create sobre el unique.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+from .models import Participant
+
+CACHE_SIZE = 10000
+CACHE_TTL_SECONDS = 300
+
+
+class TTLCache:
+    """LRU acotado con vencimiento por entrada. Thread-safe (los workers pueden usar threads)."""
+
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key: str) -> Optional[int]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set_many(self, values: Dict[str, int]):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._data[key] = (value, expires)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+
+cache = TTLCache()
+
+
+def upsert(rows: Iterable[Dict[str, str]], update_fields: Iterable[str] = ("display_name",)) -> Dict[str, int]:
+    """
+    Crea o actualiza participantes por wa_user_id. rows: [{"wa_user_id", "display_name"?, "phone"?}];
+    si un wa_user_id viene repetido gana la última fila. De un participante existente solo se pisan
+    los campos de update_fields que vinieron en su fila: un statement por cada combinación de campos
+    presentes (a lo sumo cuatro). Devuelve wa_user_id -> id.
+    """
+    by_wa_id = {}
+    for row in rows:
+        by_wa_id[row["wa_user_id"]] = row
+    if not by_wa_id:
+        return {}
+    groups: Dict[Tuple[str, ...], List[Participant]] = {}
+    for wa_id, row in by_wa_id.items():
+        present = tuple(f for f in update_fields if f in row)
+        groups.setdefault(present, []).append(
+            Participant(wa_user_id=wa_id, display_name=row.get("display_name") or "", phone=row.get("phone") or None)
+        )
+    for present, objs in groups.items():
+        # update_fields vacío no es válido con update_conflicts: "actualizar" wa_user_id a sí mismo es
+        # un no-op que igual devuelve el id de las filas existentes
+        Participant.objects.bulk_create(
+            objs, update_conflicts=True, unique_fields=["wa_user_id"], update_fields=list(present) or ["wa_user_id"],
+        )
+    ids = {p.wa_user_id: p.pk for objs in groups.values() for p in objs}
+    # El cache se llena recién con la transacción confirmada (un rollback no deja ids inexistentes)
+    transaction.on_commit(lambda: cache.set_many(ids))
+    return ids
+
+
+def resolve(senders: Dict[str, str]) -> Dict[str, int]:
+    """
+    wa_user_id -> display_name (el nombre solo se usa al crear) => wa_user_id -> participant id.
+    Los que no están en cache se resuelven con un solo upsert.
+    """
+    ids: Dict[str, int] = {}
+    missing: List[Dict[str, str]] = []
+    for wa_id, name in senders.items():
+        pk = cache.get(wa_id)
+        if pk is None:
+            missing.append({"wa_user_id": wa_id, "display_name": name})
+        else:
+            ids[wa_id] = pk
+    if missing:
+        ids.update(upsert(missing, update_fields=()))
+    return ids
+
+
+def resolve_one(wa_user_id: str, display_name: str = "") -> int:
+    return resolve({wa_user_id: display_name})[wa_user_id]
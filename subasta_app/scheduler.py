@@ -0,0 +1,151 @@
+"""
+Scheduler del ciclo de vida: arranca subastas SCHEDULED en `starts_at`, vence los claims de los
+items en `claim_expires_at` (se adjudica al que va ganando) y cierra subastas RUNNING en `ends_at`.
+
+Cada tick hace una sola query (UNION de los tres tipos de vencimiento, cada uno sobre su índice)
+que trae los próximos vencimientos ordenados; los ya vencidos se procesan y el primero a futuro
+dice cuánto dormir. Cada vencimiento se procesa en su transacción con la fila bloqueada
+(select_for_update skip_locked) y volviendo a chequear la condición, así que varias réplicas
+del worker pueden correr a la vez sin procesar dos veces lo mismo.
+
+Un vencimiento que falla queda con `scheduler_retry_at` (backoff exponencial, como el outbox) y no
+vuelve a la query hasta entonces: las filas que fallan siempre no ocupan el lote de cada tick.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.db import models, transaction
+from django.db.models import F, Q, Value
+from django.utils import timezone
+
+from . import bidbook, events, lifecycle
+from .models import Auction, Item
+from .outbox import backoff
+
+logger = logging.getLogger(__name__)
+
+START = "start"
+EXPIRE = "expire"
+FINISH = "finish"
+
+
+@dataclass
+class Deadline:
+    kind: str
+    pk: int
+    at: datetime
+    failures: int = 0
+
+
+def _deadlines(qs: models.QuerySet, kind: str, field: str, now: datetime) -> models.QuerySet:
+    return qs.order_by().filter(
+        Q(scheduler_retry_at__isnull=True) | Q(scheduler_retry_at__lte=now),
+    ).annotate(
+        kind=Value(kind, output_field=models.CharField()), at=F(field),
+    ).values_list("kind", "pk", "at", "scheduler_failures")
+
+
+def upcoming(limit: int = 100, now: Optional[datetime] = None) -> List[Deadline]:
+    """Próximos vencimientos de los tres tipos, ordenados por fecha (sin los que esperan reintento). Una query."""
+    now = now or timezone.now()
+    starts = Auction.objects.filter(status=Auction.Status.SCHEDULED, starts_at__isnull=False)
+    ends = Auction.objects.filter(status=Auction.Status.RUNNING, ends_at__isnull=False)
+    claims = Item.objects.filter(
+        claim_closed_at__isnull=True, is_sold=False, claim_expires_at__isnull=False,
+        auction__status=Auction.Status.RUNNING,
+    )
+    qs = _deadlines(starts, START, "starts_at", now).union(
+        _deadlines(claims, EXPIRE, "claim_expires_at", now),
+        _deadlines(ends, FINISH, "ends_at", now),
+        all=True,
+    ).order_by("at")[:limit]
+    return [Deadline(*row) for row in qs]
+
+
+# ---- transiciones (cada una en su transacción, con la fila bloqueada) ----
+
+def start_auction(auction_id: int, now: datetime) -> bool:
+    with transaction.atomic():
+        auction = (
+            Auction.objects.select_for_update(skip_locked=True)
+            .filter(pk=auction_id, status=Auction.Status.SCHEDULED, starts_at__lte=now).first()
+        )
+        if auction is None:
+            return False  # otra réplica la tomó, o cambió desde la query
+        lifecycle.start(auction)
+    return True
+
+
+def finish_auction(auction_id: int, now: datetime) -> bool:
+    with transaction.atomic():
+        auction = (
+            Auction.objects.select_for_update(skip_locked=True)
+            .filter(pk=auction_id, status=Auction.Status.RUNNING, ends_at__lte=now).first()
+        )
+        if auction is None:
+            return False
+        lifecycle.finish(auction)
+    return True
+
+
+def expire_claim(item_id: int, now: datetime) -> bool:
+    """Cierra el claim del item: queda vendido al que va ganando (si hay ofertas válidas)."""
+    book = bidbook.get_bid_book()
+    if book:
+        book.flush_all()  # que el ganador salga también de las ofertas que siguen en Redis
+    with transaction.atomic():
+        item = (
+            Item.objects.select_for_update(skip_locked=True)
+            .filter(pk=item_id, claim_closed_at__isnull=True, is_sold=False, claim_expires_at__lte=now)
+            .first()
+        )
+        if item is None:
+            return False
+        item.claim_closed_at = now
+        fields = ["claim_closed_at"]
+        if item.leading_participant_id:
+            item.is_sold, item.sold_to_id, item.sold_at = True, item.leading_participant_id, now
+            fields += ["is_sold", "sold_to", "sold_at"]
+        item.save(update_fields=fields)
+        events.claim_expired(item)
+        if item.is_sold:
+            events.item_sold(item)
+    return True  # el item vendido llega al libro de Redis por la señal post_save (signals.py)
+
+
+_HANDLERS = {START: start_auction, EXPIRE: expire_claim, FINISH: finish_auction}
+_MODELS = {START: Auction, EXPIRE: Item, FINISH: Auction}
+
+
+def _record_failure(deadline: Deadline, now: datetime):
+    failures = deadline.failures + 1
+    _MODELS[deadline.kind].objects.filter(pk=deadline.pk).update(
+        scheduler_failures=failures, scheduler_retry_at=now + backoff(failures),
+    )
+
+
+def tick(now: Optional[datetime] = None, limit: int = 100) -> Tuple[int, Optional[datetime]]:
+    """
+    Una pasada: procesa lo vencido hasta `now`. Devuelve (cuántos procesó, próximo vencimiento
+    conocido o None).
+    """
+    now = now or timezone.now()
+    done, next_at = 0, None
+    for deadline in upcoming(limit, now):
+        if deadline.at > now:
+            next_at = deadline.at
+            break
+        try:
+            if _HANDLERS[deadline.kind](deadline.pk, now):
+                done += 1
+        except Exception:
+            # Un vencimiento que falla no frena al resto; se reintenta pasado el backoff
+            logger.exception("Scheduler could not %s %s", deadline.kind, deadline.pk)
+            _record_failure(deadline, now)
+            continue
+        if deadline.failures:
+            # Que el backoff viejo no demore el próximo vencimiento de la fila (ej. el cierre tras el arranque)
+            _MODELS[deadline.kind].objects.filter(pk=deadline.pk).update(scheduler_failures=0, scheduler_retry_at=None)
+    return done, next_at
@@ -1,5 +1,9 @@
+from decimal import Decimal
+from typing import Dict, Optional
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 
@@ -34,7 +38,8 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
-from .models import Auction, Item, Rule, MessageTemplate, Participant, WhatsAppGroup, Bid
+from . import participants, services, templating
+from .models import Auction, Item, Rule, MessageTemplate, Participant, WhatsAppGroup, Bid, OutboxCommand, ItemImport
 
 
 # ----------------------------
@@ -69,28 +74,59 @@ class AdminRegisterSerializer(serializers.ModelSerializer):
 
 # Core domain
 
-class WhatsAppGroupSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    `?fields=id,name,highest_bid` devuelve solo esos campos (solo en el serializer de primer nivel,
+    los anidados van completos). Campos desconocidos se ignoran.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None or request.method != "GET" or self.parent is not None:
+            return
+        requested = request.query_params.get("fields")
+        if not requested:
+            return
+        keep = {f.strip() for f in requested.split(",") if f.strip()}
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+
+class WhatsAppGroupSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = WhatsAppGroup
         fields = ("id", "wa_chat_id", "name")
 
 
-class RuleSerializer(serializers.ModelSerializer):
+class RuleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Rule
         fields = ("id", "key", "value")
 
 
-class MessageTemplateSerializer(serializers.ModelSerializer):
+class MessageTemplateSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MessageTemplate
         fields = ("id", "key", "template")
 
+    def validate_template(self, value):
+        try:
+            templating.parse(value)
+        except templating.TemplateSyntaxError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
 
-class ItemSerializer(serializers.ModelSerializer):
+class ItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     image = serializers.ImageField(required=False, allow_null=True)
-    highest_bid = serializers.SerializerMethodField()
-    bids_count = serializers.SerializerMethodField()
+    # Resumen denormalizado en Item (ver ItemQuerySet.apply_bid / refresh_bid_summary)
+    highest_bid = serializers.DecimalField(
+        source="highest_bid_amount", max_digits=12, decimal_places=2, read_only=True
+    )
+    # {thumb|whatsapp|full: {webp|jpeg: url}}; vacío hasta que el worker de imágenes las genera
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Item
@@ -100,6 +136,7 @@ class ItemSerializer(serializers.ModelSerializer):
             "name",
             "description",
             "image",
+            "image_variants",
             "base_price",
             "increment",
             "order",
@@ -110,9 +147,11 @@ class ItemSerializer(serializers.ModelSerializer):
             "wa_message_id",
             "wa_stanza_id",
             "claim_expires_at",
-            # métricas
+            # métricas (solo ofertas válidas: una oferta invalidada no suma a bids_count ni puede ser highest_bid)
             "highest_bid",
             "bids_count",
+            "leading_participant",
+            "last_bid_at",
         )
         read_only_fields = (
             "is_sold",
@@ -123,16 +162,22 @@ class ItemSerializer(serializers.ModelSerializer):
             "claim_expires_at",
             "highest_bid",
             "bids_count",
+            "leading_participant",
+            "last_bid_at",
         )
 
-    def get_highest_bid(self, obj):
-        b = obj.bids.order_by("-amount").only("amount").first()
-        return str(b.amount) if b else None
+    def get_image_variants(self, obj):
+        request = self.context.get("request")
+        urls = {}
+        for variant, formats in (obj.image_variants or {}).items():
+            urls[variant] = {}
+            for fmt, path in formats.items():
+                url = default_storage.url(path)
+                urls[variant][fmt] = request.build_absolute_uri(url) if request else url
+        return urls
 
-    def get_bids_count(self, obj):
-        return obj.bids.count()
 
-class AuctionSerializer(serializers.ModelSerializer):
+class AuctionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     wa_group = WhatsAppGroupSerializer(read_only=True)
     wa_group_id = serializers.PrimaryKeyRelatedField(
         queryset=WhatsAppGroup.objects.all(), source="wa_group", write_only=True, required=False
@@ -160,7 +205,35 @@ class AuctionSerializer(serializers.ModelSerializer):
         read_only_fields = ("created_at",)
 
 
-class ParticipantSerializer(serializers.ModelSerializer):
+class AuctionSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Listado de subastas (dashboard): totales anotados en la query, sin items/reglas/mensajes anidados."""
+    wa_group = WhatsAppGroupSerializer(read_only=True)
+    items_count = serializers.IntegerField(read_only=True)
+    sold_count = serializers.IntegerField(read_only=True)
+    unsold_count = serializers.IntegerField(read_only=True)
+    bids_count = serializers.IntegerField(read_only=True)
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Auction
+        fields = (
+            "id",
+            "title",
+            "status",
+            "starts_at",
+            "ends_at",
+            "wa_group",
+            "items_count",
+            "sold_count",
+            "unsold_count",
+            "bids_count",
+            "revenue",
+            "created_at",
+        )
+        read_only_fields = fields
+
+
+class ParticipantSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Participant
         fields = ("id", "display_name", "phone", "wa_user_id")
@@ -170,7 +243,7 @@ class ParticipantSerializer(serializers.ModelSerializer):
         }
 
 
-class BidSerializer(serializers.ModelSerializer):
+class BidSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     participant = ParticipantSerializer(read_only=True)
 
     class Meta:
@@ -186,3 +259,124 @@ class BidSerializer(serializers.ModelSerializer):
             "source_chat_id",
         )
         read_only_fields = ("created_at",)
+
+
+class OutboxCommandSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OutboxCommand
+        fields = (
+            "id", "auction", "command", "idempotency_key", "status", "attempts",
+            "next_attempt_at", "last_error", "response", "created_at", "completed_at",
+        )
+        read_only_fields = fields
+
+
+class PlaceBidSerializer(serializers.Serializer):
+    """Entrada de POST /api/items/{id}/bids/. El participante va por id o por wa_user_id."""
+    participant = serializers.PrimaryKeyRelatedField(queryset=Participant.objects.all(), required=False)
+    wa_user_id = serializers.CharField(max_length=64, required=False)
+    display_name = serializers.CharField(max_length=120, required=False, allow_blank=True)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal("0"))
+    source_message_id = serializers.CharField(max_length=128, required=False, allow_blank=True, default="")
+    source_chat_id = serializers.CharField(max_length=128, required=False, allow_blank=True, default="")
+
+    def validate(self, attrs):
+        if not attrs.get("participant") and not attrs.get("wa_user_id"):
+            raise serializers.ValidationError("participant or wa_user_id is required")
+        return attrs
+
+    def bid_data(self, attrs, participant_ids: Optional[Dict[str, int]] = None):
+        """
+        validated_data -> kwargs de bidding.place_bid (resuelve el participante).
+        `participant_ids`: wa_user_id -> id ya resueltos (batch); si no, se resuelve acá.
+        """
+        data = dict(attrs)
+        participant = data.pop("participant", None)
+        wa_user_id = data.pop("wa_user_id", None)
+        display_name = data.pop("display_name", "")
+        if participant is not None:
+            data["participant_id"] = participant.id
+        elif participant_ids is not None:
+            data["participant_id"] = participant_ids[wa_user_id]
+        else:
+            data["participant_id"] = participants.resolve_one(wa_user_id, display_name)
+        return data
+
+
+class BatchBidSerializer(PlaceBidSerializer):
+    """Una entrada de POST /api/bids/batch/ (igual que PlaceBidSerializer + item)."""
+    item = serializers.IntegerField()
+
+    def bid_data(self, attrs, participant_ids: Optional[Dict[str, int]] = None):
+        data = super().bid_data(attrs, participant_ids)
+        data["item_id"] = data.pop("item")
+        return data
+
+
+class ParticipantUpsertRowSerializer(serializers.Serializer):
+    wa_user_id = serializers.CharField(max_length=64)
+    display_name = serializers.CharField(max_length=120, required=False, allow_blank=True)
+    phone = serializers.CharField(max_length=32, required=False, allow_blank=True, allow_null=True)
+
+
+class ParticipantUpsertSerializer(serializers.Serializer):
+    """Entrada de POST /api/participants/upsert/."""
+    participants = ParticipantUpsertRowSerializer(many=True, allow_empty=False, max_length=1000)
+
+
+class ItemCommandSerializer(serializers.Serializer):
+    item = serializers.IntegerField()
+    type = serializers.ChoiceField(choices=sorted(services.ITEM_COMMANDS))
+    payload = serializers.DictField(required=False, default=dict)
+    idempotency_key = serializers.CharField(max_length=64, required=False, allow_blank=True, default="")
+
+
+class BatchItemCommandSerializer(serializers.Serializer):
+    """Entrada de POST /api/items/commands/."""
+    commands = ItemCommandSerializer(many=True, allow_empty=False, max_length=1000)
+
+
+class ItemImportRowSerializer(serializers.Serializer):
+    """Una fila del manifest de importación (item_import.py); `image` es el nombre del archivo en el zip."""
+    name = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+    base_price = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal("0"))
+    increment = serializers.DecimalField(
+        max_digits=12, decimal_places=2, min_value=Decimal("0"), required=False, default=Decimal("0")
+    )
+    order = serializers.IntegerField(min_value=0, required=False)
+    image = serializers.CharField(required=False, allow_blank=True, default="")
+
+
+class ItemImportSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ItemImport
+        fields = (
+            "id", "auction", "source", "status", "stage", "total_rows", "processed_rows", "progress",
+            "created_items", "errors", "created_at", "finished_at",
+        )
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        if obj.stage == ItemImport.Stage.FINISHED:
+            return 1.0
+        return round(obj.processed_rows / obj.total_rows, 3) if obj.total_rows else 0.0
+
+
+class RenderContextSerializer(serializers.Serializer):
+    item = serializers.IntegerField(required=False)
+    participant = serializers.IntegerField(required=False)
+    vars = serializers.DictField(required=False)
+
+    def validate_vars(self, value):
+        unknown = set(value) - templating.PLACEHOLDERS
+        if unknown:
+            raise serializers.ValidationError(f"Unknown placeholders: {', '.join(sorted(unknown))}")
+        return value
+
+
+class BulkRenderSerializer(serializers.Serializer):
+    """Entrada de POST /api/messages/{id}/render/."""
+    contexts = RenderContextSerializer(many=True, allow_empty=False, max_length=1000)
@@ -1,7 +1,9 @@
 import os
+import hashlib
 import json
+import uuid
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urljoin
 
 import requests
@@ -9,6 +11,8 @@ from requests import Response
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from .circuit import CircuitBreaker, CircuitOpen
+
 
 # Config y errores
 @dataclass(frozen=True)
@@ -18,6 +22,16 @@ class WAConfig:
     timeout_seconds: int = int(os.getenv("WHATSAPP_SERVICE_TIMEOUT", "10"))
     # Retries con backoff exponencial (0.5s, 1s, 2s, 4s ...)
     max_retries: int = int(os.getenv("WHATSAPP_SERVICE_MAX_RETRIES", "3"))
+    # Pool de conexiones (keep-alive), compartido por el cliente sync y el async (services_async.py)
+    max_connections: int = int(os.getenv("WHATSAPP_SERVICE_MAX_CONNECTIONS", "100"))
+    max_keepalive: int = int(os.getenv("WHATSAPP_SERVICE_MAX_KEEPALIVE", "20"))
+    keepalive_expiry: float = float(os.getenv("WHATSAPP_SERVICE_KEEPALIVE_EXPIRY", "30"))
+    # Circuit breaker (circuit.py): N fallas seguidas lo abren por `cooldown` segundos
+    breaker_failure_threshold: int = int(os.getenv("WHATSAPP_BREAKER_FAILURE_THRESHOLD", "5"))
+    breaker_cooldown: float = float(os.getenv("WHATSAPP_BREAKER_COOLDOWN", "30"))
+    breaker_window: float = float(os.getenv("WHATSAPP_BREAKER_WINDOW", "60"))
+    # Comandos por request en wa_batch
+    batch_max_commands: int = int(os.getenv("WHATSAPP_SERVICE_BATCH_MAX", "100"))
 
 
 class WhatsAppServiceError(Exception):
@@ -28,18 +42,33 @@ class WhatsAppServiceUnavailable(WhatsAppServiceError):
     """Error cuando el servicio está no disponible (5xx / conexión)."""
 
 
+class WhatsAppCircuitOpen(WhatsAppServiceUnavailable):
+    """No se llamó al servicio: el circuit breaker está abierto."""
+
+
 _cfg = WAConfig()
 
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Estado en el cache de Django (compartido entre workers solo con CACHE_REDIS_URL, ver circuit.py);
+# lo usan el cliente sync y el async
+breaker = CircuitBreaker(
+    "whatsapp",
+    failure_threshold=_cfg.breaker_failure_threshold,
+    cooldown=_cfg.breaker_cooldown,
+    window=_cfg.breaker_window,
+)
+
 # Sesión HTTP con retries
 _session = requests.Session()
 _retry = Retry(
     total=_cfg.max_retries,
     backoff_factor=0.5,
-    status_forcelist=(429, 500, 502, 503, 504),
+    status_forcelist=RETRY_STATUSES,
     allowed_methods=frozenset(["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"]),
     raise_on_status=False,
 )
-_adapter = HTTPAdapter(max_retries=_retry)
+_adapter = HTTPAdapter(max_retries=_retry, pool_maxsize=_cfg.max_keepalive)
 _session.mount("http://", _adapter)
 _session.mount("https://", _adapter)
 
@@ -53,6 +82,10 @@ def _headers(idempotency_key: Optional[str] = None) -> Dict[str, str]:
     return h
 
 
+def _url(path: str) -> str:
+    return urljoin(_cfg.base_url.rstrip("/") + "/", path.lstrip("/"))
+
+
 def _parse_json(resp: Response) -> Dict[str, Any]:
     # 204 No Content -> OK sin body
     if resp.status_code == 204 or not resp.content:
@@ -81,7 +114,30 @@ def _request(
         json_body: Optional[Dict[str, Any]] = None,
         idempotency_key: Optional[str] = None,
 ) -> Dict[str, Any]:
-    url = urljoin(_cfg.base_url.rstrip("/") + "/", path.lstrip("/"))
+    try:
+        breaker.before_call()
+    except CircuitOpen:
+        raise WhatsAppCircuitOpen("WhatsApp service circuit is open")
+    try:
+        data = _send(method, path, json_body=json_body, idempotency_key=idempotency_key)
+    except WhatsAppServiceUnavailable:
+        breaker.record_failure()
+        raise
+    except WhatsAppServiceError:
+        breaker.record_success()  # 4xx: el servicio responde
+        raise
+    breaker.record_success()
+    return data
+
+
+def _send(
+        method: str,
+        path: str,
+        *,
+        json_body: Optional[Dict[str, Any]] = None,
+        idempotency_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    url = _url(path)
     try:
         resp = _session.request(
             method=method.upper(),
@@ -94,6 +150,14 @@ def _request(
         # WhatsApp error: 5xx, connection, DNS
         raise WhatsAppServiceUnavailable(f"WhatsApp service unreachable: {e}") from e
 
+    return _check_response(resp)
+
+
+def _check_response(resp) -> Dict[str, Any]:
+    """
+    Traduce el status a la taxonomía de errores. Sirve para respuestas de requests y de aiohttp
+    (envueltas en services_async._Response).
+    """
     if 500 <= resp.status_code < 600:
         raise WhatsAppServiceUnavailable(f"Service error {resp.status_code}: {resp.text[:300]}")
     if resp.status_code == 401:
@@ -128,12 +192,109 @@ def wa_close(auction_id: int, *, idempotency_key: Optional[str] = None) -> Dict[
     return _request("POST", f"/auctions/{auction_id}/close", idempotency_key=idempotency_key)
 
 
+# Nuevo vencimiento del claim de un item (anti-snipe).
+# POST /auctions/{id}/items/{item_id}/claim  {"claim_expires_at": ISO 8601}
+def wa_extend_claim(
+        auction_id: int, *, item_id: int, claim_expires_at: str, idempotency_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    if not isinstance(auction_id, int) or auction_id <= 0:
+        raise ValueError("auction_id must be a positive integer")
+    if not isinstance(item_id, int) or item_id <= 0:
+        raise ValueError("item_id must be a positive integer")
+    return _request(
+        "POST", f"/auctions/{auction_id}/items/{item_id}/claim",
+        json_body={"claim_expires_at": claim_expires_at}, idempotency_key=idempotency_key,
+    )
+
+
+# Comandos por item, de a muchos en un request.
+# POST /commands/batch  {"commands": [{"type", "auction_id", "item_id", "payload", "idempotency_key"}]}
+ITEM_COMMANDS = frozenset({"publish", "expire", "announce_winner"})
+
+
+def _batch_chunks(commands: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Valida, completa las idempotency keys que falten y parte en lotes de batch_max_commands."""
+    prepared = []
+    for idx, c in enumerate(commands):
+        if c.get("type") not in ITEM_COMMANDS:
+            raise ValueError(f"commands[{idx}]: unknown type {c.get('type')!r}")
+        for field in ("auction_id", "item_id"):
+            if not isinstance(c.get(field), int) or c[field] <= 0:
+                raise ValueError(f"commands[{idx}]: {field} must be a positive integer")
+        prepared.append({
+            "type": c["type"],
+            "auction_id": c["auction_id"],
+            "item_id": c["item_id"],
+            "payload": c.get("payload") or {},
+            "idempotency_key": c.get("idempotency_key") or uuid.uuid4().hex,
+        })
+    size = max(_cfg.batch_max_commands, 1)
+    return [prepared[i:i + size] for i in range(0, len(prepared), size)]
+
+
+def _batch_key(chunk: List[Dict[str, Any]]) -> str:
+    # Mismo lote -> misma key, así el reintento de un lote entero tampoco duplica
+    return hashlib.sha1("|".join(c["idempotency_key"] for c in chunk).encode()).hexdigest()
+
+
+def _batch_results(chunk: List[Dict[str, Any]], data: Optional[Dict[str, Any]], error: Optional[Exception] = None):
+    """Un resultado por comando del lote, en el mismo orden, a partir de la respuesta (o el error) de Node."""
+    by_key = {r.get("idempotency_key"): r for r in (data or {}).get("results", []) if isinstance(r, dict)}
+    results = []
+    for c in chunk:
+        base = {"idempotency_key": c["idempotency_key"], "type": c["type"], "item_id": c["item_id"]}
+        if error is not None:
+            base.update(ok=False, error=str(error), retryable=isinstance(error, WhatsAppServiceUnavailable))
+        elif c["idempotency_key"] in by_key:
+            base.update(by_key[c["idempotency_key"]])
+            base.setdefault("ok", True)
+        else:
+            base.update(ok=False, error="No result for command", retryable=True)
+        results.append(base)
+    return results
+
+
+def wa_batch(commands: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Manda N comandos de item (publish / expire / announce_winner) en uno o pocos requests.
+    Devuelve un resultado por comando, en orden; un lote que falla no corta a los demás.
+    """
+    results = []
+    for chunk in _batch_chunks(commands):
+        try:
+            data = _request("POST", "/commands/batch", json_body={"commands": chunk}, idempotency_key=_batch_key(chunk))
+        except WhatsAppServiceError as e:
+            results.extend(_batch_results(chunk, None, e))
+        else:
+            results.extend(_batch_results(chunk, data))
+    return results
+
+
+def wa_item_commands(
+        auction_id: int, *, commands: List[Dict[str, Any]], idempotency_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Comandos de item encolados en el outbox (outbox.enqueue_item_commands), todos de la subasta.
+    A diferencia de wa_batch, un lote que falla corta y propaga el error: el outbox reintenta el
+    comando entero y las keys de cada comando (fijadas al encolar) evitan duplicados en Node.
+    """
+    if any(c.get("auction_id") != auction_id for c in commands):
+        raise ValueError("all commands must belong to the auction")
+    results = []
+    for chunk in _batch_chunks(commands):
+        data = _request("POST", "/commands/batch", json_body={"commands": chunk}, idempotency_key=_batch_key(chunk))
+        results.extend(_batch_results(chunk, data))
+    return {"ok": all(r["ok"] for r in results), "results": results}
+
+
 # helper -> health
 def wa_health() -> Dict[str, Any]:
-    """Chequeo rápido del servicio de WhatsApp (si existe endpoint)."""
+    """Chequeo rápido del servicio de WhatsApp (si existe endpoint), con el estado del breaker."""
     try:
-        return _request("GET", "/health")
+        data = _request("GET", "/health")
     except WhatsAppServiceUnavailable as e:
-        return {"ok": False, "error": str(e)}
+        data = {"ok": False, "error": str(e)}
     except WhatsAppServiceError as e:
-        return {"ok": False, "error": str(e)}
+        data = {"ok": False, "error": str(e)}
+    data["breaker"] = breaker.snapshot()
+    return data
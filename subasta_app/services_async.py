@@ -0,0 +1,245 @@
+"""
+Cliente asyncio del servicio de WhatsApp (aiohttp), para vistas async bajo asgi.py y workers async.
+
+Misma superficie que services.py (`wa_start` / `wa_close` / `wa_batch` / `wa_health`, mismos errores) pero
+con `await`. Usa una `aiohttp.ClientSession` por event loop con pool de conexiones keep-alive
+(límites en WAConfig), así cientos de comandos concurrentes reusan unas pocas conexiones; la sesión
+se cierra cuando se apaga su loop. `wa_start_many` / `wa_close_many` hacen fan-out con concurrencia
+acotada.
+"""
+import asyncio
+import json
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+from asgiref.sync import sync_to_async
+
+from .circuit import CircuitOpen
+from .services import (
+    RETRY_STATUSES, WhatsAppCircuitOpen, WhatsAppServiceError, WhatsAppServiceUnavailable,
+    _batch_chunks, _batch_key, _batch_results, _cfg, _check_response, _headers, _url, breaker,
+)
+
+# El estado del breaker está en el cache de Django (sync, Redis en producción): fuera del event loop.
+# Sin thread_sensitive, para no hacer cola detrás de las vistas sync en el thread principal
+_before_call = sync_to_async(breaker.before_call, thread_sensitive=False)
+_record_success = sync_to_async(breaker.record_success, thread_sensitive=False)
+_record_failure = sync_to_async(breaker.record_failure, thread_sensitive=False)
+_snapshot = sync_to_async(breaker.snapshot, thread_sensitive=False)
+
+
+class _Response:
+    """Respuesta ya leída, con la interfaz que usa services._check_response (la de requests)."""
+
+    def __init__(self, status_code: int, headers, content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _KeepaliveConnector(aiohttp.TCPConnector):
+    """
+    TCPConnector que guarda a lo sumo `max_keepalive` conexiones ociosas por host, como pool_maxsize
+    en el cliente sync: aiohttp no tiene esa opción (limit / limit_per_host cuentan también las activas).
+    """
+
+    def __init__(self, *, max_keepalive: int, **kwargs):
+        super().__init__(**kwargs)
+        self._max_keepalive = max_keepalive
+
+    def _release(self, key, protocol, *, should_close=False):
+        # API interna de aiohttp (versión fijada en requirements.txt)
+        idle = len(self._conns.get(key, ()))
+        super()._release(key, protocol, should_close=should_close or idle >= self._max_keepalive)
+
+
+class AsyncWhatsAppClient:
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._closer = None  # ver get_client
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Se crea adentro del loop (aiohttp lo exige)
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=_cfg.timeout_seconds),
+                connector=_KeepaliveConnector(
+                    limit=_cfg.max_connections,
+                    max_keepalive=_cfg.max_keepalive,
+                    keepalive_timeout=_cfg.keepalive_expiry,
+                ),
+            )
+        return self._session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def request(
+            self,
+            method: str,
+            path: str,
+            *,
+            json_body: Optional[Dict[str, Any]] = None,
+            idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        # Mismo circuit breaker que el cliente sync
+        try:
+            await _before_call()
+        except CircuitOpen:
+            raise WhatsAppCircuitOpen("WhatsApp service circuit is open")
+        try:
+            data = await self._send(method, path, json_body=json_body, idempotency_key=idempotency_key)
+        except WhatsAppServiceUnavailable:
+            await _record_failure()
+            raise
+        except WhatsAppServiceError:
+            await _record_success()
+            raise
+        await _record_success()
+        return data
+
+    async def _send(
+            self,
+            method: str,
+            path: str,
+            *,
+            json_body: Optional[Dict[str, Any]] = None,
+            idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        # Mismos retries que la sesión sync: 429/5xx/conexión con backoff 0.5s, 1s, 2s ...
+        for attempt in range(_cfg.max_retries + 1):
+            last = attempt == _cfg.max_retries
+            try:
+                async with self.session.request(
+                        method.upper(), _url(path), headers=_headers(idempotency_key), json=json_body,
+                ) as r:
+                    resp = _Response(r.status, r.headers, await r.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if last:
+                    raise WhatsAppServiceUnavailable(f"WhatsApp service unreachable: {e}") from e
+            else:
+                if last or resp.status_code not in RETRY_STATUSES:
+                    return _check_response(resp)
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def wa_start(self, auction_id: int, *, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        if not isinstance(auction_id, int) or auction_id <= 0:
+            raise ValueError("auction_id must be a positive integer")
+        return await self.request("POST", f"/auctions/{auction_id}/start", idempotency_key=idempotency_key)
+
+    async def wa_close(self, auction_id: int, *, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        if not isinstance(auction_id, int) or auction_id <= 0:
+            raise ValueError("auction_id must be a positive integer")
+        return await self.request("POST", f"/auctions/{auction_id}/close", idempotency_key=idempotency_key)
+
+    async def wa_batch(self, commands: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Los lotes salen concurrentes (services.wa_batch los manda de a uno)
+        async def send(chunk):
+            try:
+                data = await self.request(
+                    "POST", "/commands/batch", json_body={"commands": chunk}, idempotency_key=_batch_key(chunk),
+                )
+            except WhatsAppServiceError as e:
+                return _batch_results(chunk, None, e)
+            return _batch_results(chunk, data)
+
+        chunks = await asyncio.gather(*(send(chunk) for chunk in _batch_chunks(commands)))
+        return [r for chunk in chunks for r in chunk]
+
+    async def wa_health(self) -> Dict[str, Any]:
+        try:
+            data = await self.request("GET", "/health")
+        except WhatsAppServiceError as e:
+            data = {"ok": False, "error": str(e)}
+        data["breaker"] = await _snapshot()
+        return data
+
+
+# Un cliente por event loop: una ClientSession no se puede usar desde otro loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncWhatsAppClient]" = weakref.WeakKeyDictionary()
+
+
+def get_client() -> AsyncWhatsAppClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncWhatsAppClient()
+        # El generador queda vivo con el cliente; el loop lo cierra al apagarse
+        client._closer = _close_on_shutdown(client)
+        loop.create_task(client._closer.__anext__())
+    return client
+
+
+async def _close_on_shutdown(client: AsyncWhatsAppClient):
+    # asyncio.run (y uvicorn) cierran los generadores async pendientes antes de cerrar el loop
+    # (loop.shutdown_asyncgens): el finally cierra la sesión mientras el loop todavía corre
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def wa_start(auction_id: int, *, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+    return await get_client().wa_start(auction_id, idempotency_key=idempotency_key)
+
+
+async def wa_close(auction_id: int, *, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+    return await get_client().wa_close(auction_id, idempotency_key=idempotency_key)
+
+
+async def wa_batch(commands: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return await get_client().wa_batch(commands)
+
+
+async def wa_health() -> Dict[str, Any]:
+    return await get_client().wa_health()
+
+
+# ---- fan-out ----
+
+async def gather_limited(
+        calls: Iterable[Callable[[], Awaitable[Dict[str, Any]]]], concurrency: int = 50,
+) -> List[Dict[str, Any]]:
+    """
+    Corre las llamadas con a lo sumo `concurrency` en vuelo. Un error no corta al resto:
+    cada resultado es {"index", "ok", "result"} o {"index", "ok": False, "error", "retryable"}.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def run(idx, call):
+        async with sem:
+            try:
+                return {"index": idx, "ok": True, "result": await call()}
+            except (WhatsAppServiceError, ValueError) as e:
+                return {
+                    "index": idx, "ok": False, "error": str(e),
+                    "retryable": isinstance(e, WhatsAppServiceUnavailable),
+                }
+
+    return list(await asyncio.gather(*(run(idx, call) for idx, call in enumerate(calls))))
+
+
+async def wa_start_many(auction_ids: Iterable[int], concurrency: int = 50) -> List[Dict[str, Any]]:
+    client = get_client()
+    return await gather_limited([lambda a=a: client.wa_start(a) for a in auction_ids], concurrency)
+
+
+async def wa_close_many(auction_ids: Iterable[int], concurrency: int = 50) -> List[Dict[str, Any]]:
+    client = get_client()
+    return await gather_limited([lambda a=a: client.wa_close(a) for a in auction_ids], concurrency)
@@ -0,0 +1,72 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import antisnipe, auction_config, bidbook, metrics, participants, versioning
+from .models import Auction, Item, MessageTemplate, Participant, Rule, WhatsAppGroup
+
+
+@receiver([post_save, post_delete], sender=Rule)
+@receiver([post_save, post_delete], sender=MessageTemplate)
+def invalidate_auction_config(sender, instance, **kwargs):
+    # on_commit: si alguien reconstruye el bundle antes del commit, lo borramos igual después
+    auction_id = instance.auction_id
+    transaction.on_commit(lambda: auction_config.invalidate(auction_id))
+
+
+@receiver([post_save, post_delete], sender=Rule)
+def sync_bid_book_increment(sender, instance, **kwargs):
+    # El paso mínimo y la ventana anti-snipe de los items cargados en Redis salen de estas reglas
+    book = bidbook.get_bid_book()
+    if book is None or instance.key not in ("min_increment", antisnipe.RULE):
+        return
+    auction_id = instance.auction_id
+    transaction.on_commit(lambda: book.sync_auction_items(auction_id))
+
+
+@receiver([post_save, post_delete], sender=Item)
+def sync_bid_book_item(sender, instance, **kwargs):
+    # Precio base, incremento o vencimiento editados (API, admin): el hash en Redis los copia
+    book = bidbook.get_bid_book()
+    if book is None:
+        return
+    if kwargs["signal"] is post_delete:
+        item_id = instance.pk
+        transaction.on_commit(lambda: book.discard(item_id))
+    else:
+        transaction.on_commit(lambda: book.sync_item(instance))
+
+
+@receiver([post_save, post_delete], sender=Auction)
+def touch_auction(sender, instance, **kwargs):
+    versioning.touch(auction_ids=[instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Item)
+@receiver([post_save, post_delete], sender=Rule)
+@receiver([post_save, post_delete], sender=MessageTemplate)
+def touch_auction_of(sender, instance, **kwargs):
+    # Las ofertas cambian la subasta a través del resumen del item (ItemQuerySet)
+    versioning.touch(auction_ids=[instance.auction_id])
+
+
+@receiver([post_save, pre_delete], sender=WhatsAppGroup)
+def touch_group_auctions(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    # pre_delete: después del borrado las subastas ya no apuntan al grupo (SET_NULL)
+    versioning.touch(auction_ids=list(instance.auctions.values_list("pk", flat=True)))
+
+
+@receiver(post_delete, sender=Participant)
+def forget_participant(sender, instance, **kwargs):
+    # Que el cache de resolución no devuelva el id de un participante borrado
+    if instance.wa_user_id:
+        participants.cache.discard(instance.wa_user_id)
+
+
+# Conteo de queries / tiempo de base por request (metrics.py)
+connection_created.connect(metrics.install_db_wrapper, dispatch_uid="subasta_metrics_db_wrapper")
+# Las ofertas que inserta Django suben Auction.version al confirmar, no desde el trigger (versioning.py)
+connection_created.connect(versioning.mark_connection, dispatch_uid="subasta_versioning_writer")
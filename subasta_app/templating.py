@@ -0,0 +1,134 @@
+"""
+Render de MessageTemplate: `Hola {participant_name}, te superaron en {item_name} ({highest_bid})`.
+
+Cada template se compila una vez (lista de literales + placeholders) y queda cacheado por
+(id, versión); la versión es un hash del texto, así que editar el template genera otra entrada.
+"""
+import hashlib
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import auction_config
+from .bidding import minimum_bid
+from .models import Item, MessageTemplate, Participant
+
+PLACEHOLDERS = frozenset({
+    "auction_title",
+    "item_name",
+    "item_description",
+    "base_price",
+    "increment",
+    "highest_bid",
+    "min_next_bid",
+    "claim_expires_at",
+    "participant_name",
+    "participant_phone",
+    "claim_keyword",
+    "min_increment",
+    "anti_snipe_sec",
+    "amount",
+})
+
+Compiled = Tuple[Tuple[str, Optional[str]], ...]
+
+
+class TemplateSyntaxError(ValueError):
+    """Template con llaves mal cerradas o placeholders desconocidos."""
+
+
+def template_version(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def parse(text: str) -> Compiled:
+    try:
+        parts = list(Formatter().parse(text))
+    except ValueError as e:
+        raise TemplateSyntaxError(str(e)) from e
+    segments = []
+    unknown = []
+    for literal, field, spec, conversion in parts:
+        if field is not None and (spec or conversion):
+            raise TemplateSyntaxError(f"Format specs are not supported: {{{field}}}")
+        if field is not None and field not in PLACEHOLDERS:
+            unknown.append(field or "{}")
+        segments.append((literal, field))
+    if unknown:
+        raise TemplateSyntaxError(f"Unknown placeholders: {', '.join(sorted(set(unknown)))}")
+    return tuple(segments)
+
+
+@lru_cache(maxsize=1024)
+def compile_template(template_id: int, version: str, text: str) -> Compiled:
+    return parse(text)
+
+
+def render(compiled: Compiled, context: Dict[str, Any]) -> str:
+    out = []
+    for literal, field in compiled:
+        out.append(literal)
+        if field is not None:
+            value = context.get(field)
+            out.append("" if value is None else str(value))
+    return "".join(out)
+
+
+def compiled_for(template: MessageTemplate) -> Compiled:
+    return compile_template(template.id, template_version(template.template), template.template)
+
+
+def _decimal_or_none(value) -> Optional[Decimal]:
+    if value is None:
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def _item_context(item: Item, min_increment: Optional[Decimal]) -> Dict[str, Any]:
+    return {
+        "auction_title": item.auction.title,
+        "item_name": item.name,
+        "item_description": item.description,
+        "base_price": item.base_price,
+        "increment": item.increment,
+        "highest_bid": item.highest_bid_amount,
+        "min_next_bid": minimum_bid(item, min_increment),
+        "claim_expires_at": item.claim_expires_at,
+    }
+
+
+def render_many(template: MessageTemplate, contexts: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Renderiza un template contra muchos contextos. Cada contexto puede traer `item` y/o
+    `participant` (ids) y `vars` (valores extra, pisan a los calculados).
+    Items y participantes se cargan con una query cada uno para todo el lote.
+    """
+    contexts = list(contexts)
+    compiled = compiled_for(template)
+    rules = (auction_config.get_bundle(template.auction_id) or {}).get("rules", {})
+    items = Item.objects.select_related("auction").in_bulk({c["item"] for c in contexts if c.get("item")})
+    participants = Participant.objects.in_bulk({c["participant"] for c in contexts if c.get("participant")})
+    min_increment = _decimal_or_none(rules.get("min_increment"))
+
+    results = []
+    for idx, c in enumerate(contexts):
+        ctx = {k: rules.get(k) for k in ("claim_keyword", "min_increment", "anti_snipe_sec")}
+        if c.get("item"):
+            item = items.get(c["item"])
+            if item is None:
+                results.append({"index": idx, "ok": False, "error": "item not found"})
+                continue
+            ctx.update(_item_context(item, min_increment))
+        if c.get("participant"):
+            p = participants.get(c["participant"])
+            if p is None:
+                results.append({"index": idx, "ok": False, "error": "participant not found"})
+                continue
+            ctx.update({"participant_name": p.display_name, "participant_phone": p.phone})
+        ctx.update(c.get("vars") or {})
+        results.append({"index": idx, "ok": True, "text": render(compiled, ctx)})
+    return results
@@ -1,3 +1,1907 @@
-from django.test import TestCase
+import asyncio
+import csv
+import dataclasses
+import gc
+import gzip
+import importlib
+import io
+import json
+import os
+import runpy
+import shutil
+import tempfile
+import threading
+import time
+import warnings
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+from xml.etree import ElementTree
 
-# Create your tests here.
+import fakeredis
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework import viewsets
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import (
+    antisnipe, auction_config, bidbook, bidding, checks, circuit, events, images, item_commands, metrics, outbox,
+    participants, scheduler, services, services_async, settlement, templating, versioning, views, wa_stub,
+)
+from .models import Auction, Item, ItemImport, Participant, Bid, Rule, MessageTemplate, OutboxCommand
+from .serializers import AuctionSerializer
+
+
+class ApiTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="admin", password="x", is_staff=True)
+        self.client.force_authenticate(self.user)
+        participants.cache.clear()  # ids de participantes de otros tests (rollback) no sirven
+
+    def make_auction(self, n_items, bids_per_item=3):
+        auction = Auction.objects.create(title="Subasta")
+        Rule.objects.create(auction=auction, key="min_increment", value="10")
+        MessageTemplate.objects.create(auction=auction, key="welcome", template="Hola")
+        p = Participant.objects.create(display_name="Ana", wa_user_id=f"ana-{auction.id}@whatsapp")
+        for i in range(n_items):
+            item = Item.objects.create(auction=auction, name=f"Lote {i}", base_price=Decimal("100"), order=i)
+            for j in range(bids_per_item):
+                Bid.objects.create(item=item, participant=p, amount=Decimal("100") + 10 * j)
+        return auction
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+
+class BidStatsQueryCountTests(ApiTestCase):
+    def test_item_list_is_constant(self):
+        self.make_auction(2)
+        small = self.count_queries("/api/items/")
+        self.make_auction(10)
+        self.assertEqual(self.count_queries("/api/items/"), small)
+
+    def test_auction_list_is_constant(self):
+        self.make_auction(2)
+        small = self.count_queries("/api/auctions/")
+        self.make_auction(10)
+        self.make_auction(5)
+        self.assertEqual(self.count_queries("/api/auctions/"), small)
+
+    def test_auction_detail_is_constant(self):
+        a = self.make_auction(2)
+        b = self.make_auction(20)
+        self.assertEqual(
+            self.count_queries(f"/api/auctions/{a.id}/"),
+            self.count_queries(f"/api/auctions/{b.id}/"),
+        )
+
+    def test_item_stats_values(self):
+        auction = self.make_auction(1)
+        item = auction.items.get()
+        Item.objects.create(auction=auction, name="Sin ofertas", base_price=Decimal("50"), order=1)
+
+        resp = self.client.get(f"/api/items/{item.id}/")
+        self.assertEqual(resp.data["highest_bid"], "120.00")
+        self.assertEqual(resp.data["bids_count"], 3)
+
+        resp = self.client.get(f"/api/auctions/{auction.id}/")
+        items = resp.data["items"]
+        self.assertEqual([i["bids_count"] for i in items], [3, 0])
+        self.assertEqual([i["highest_bid"] for i in items], ["120.00", None])
+
+
+class BidSummaryTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.auction = Auction.objects.create(title="Subasta")
+        self.item = Item.objects.create(auction=self.auction, name="Lote", base_price=Decimal("100"))
+        self.ana = Participant.objects.create(display_name="Ana", wa_user_id="ana@whatsapp")
+        self.beto = Participant.objects.create(display_name="Beto", wa_user_id="beto@whatsapp")
+
+    def bid(self, participant, amount, **kwargs):
+        return Bid.objects.create(item=self.item, participant=participant, amount=Decimal(amount), **kwargs)
+
+    def assertSummary(self, amount, leader, count):
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.highest_bid_amount, Decimal(amount) if amount else None)
+        self.assertEqual(self.item.leading_participant, leader)
+        self.assertEqual(self.item.bids_count, count)
+
+    def test_create_updates_summary(self):
+        self.bid(self.ana, "110")
+        self.bid(self.beto, "130")
+        self.bid(self.ana, "130")  # empate: sigue ganando el primero
+        self.bid(self.ana, "120")
+        self.assertSummary("130", self.beto, 4)
+        self.assertEqual(self.item.last_bid_at, Bid.objects.latest("created_at").created_at)
+
+    def test_invalid_bid_is_not_counted(self):
+        self.bid(self.ana, "110")
+        self.bid(self.beto, "500", is_valid=False)
+        self.assertSummary("110", self.ana, 1)
+
+    def test_invalidate_action(self):
+        self.bid(self.ana, "110")
+        top = self.bid(self.beto, "150")
+        resp = self.client.post(f"/api/bids/{top.id}/invalidate/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertSummary("110", self.ana, 1)
+
+    def test_delete_through_viewset(self):
+        first = self.bid(self.ana, "110")
+        resp = self.client.delete(f"/api/bids/{first.id}/")
+        self.assertEqual(resp.status_code, 204)
+        self.assertSummary(None, None, 0)
+        self.assertIsNone(self.item.last_bid_at)
+
+    def test_bids_cannot_be_created_through_viewset(self):
+        resp = self.client.post("/api/bids/", {"item": self.item.id, "amount": "10"})
+        self.assertEqual(resp.status_code, 405)
+
+    def test_rebuild_command(self):
+        now = timezone.now()
+        self.bid(self.ana, "110")
+        # Inserts directos de Node (sin pasar por Bid.save) y el resumen como quedaría sin el trigger
+        Bid.objects.bulk_create([
+            Bid(item=self.item, participant=self.beto, amount=Decimal("200"), created_at=now + timedelta(seconds=5)),
+            Bid(item=self.item, participant=self.ana, amount=Decimal("300"), is_valid=False),
+        ])
+        Item.objects.filter(pk=self.item.pk).update(
+            highest_bid_amount=Decimal("110"), leading_participant=self.ana, bids_count=1,
+        )
+
+        call_command("rebuild_bid_summaries", stdout=StringIO())
+        self.assertSummary("200", self.beto, 2)
+        self.assertEqual(self.item.last_bid_at, now + timedelta(seconds=5))
+
+    def test_migration_backfills_existing_items(self):
+        from django.apps import apps
+
+        backfill = importlib.import_module("subasta_app.migrations.0014_bid_summary_backfill_trigger").backfill
+        self.bid(self.ana, "110")
+        self.bid(self.beto, "150")
+        self.bid(self.ana, "900", is_valid=False)
+        # Como quedaban los items creados antes de 0003
+        Item.objects.update(highest_bid_amount=None, leading_participant=None, bids_count=0, last_bid_at=None)
+        backfill(apps, None)
+        self.assertSummary("150", self.beto, 2)
+
+
+class PlaceBidTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.auction = Auction.objects.create(title="Subasta", status=Auction.Status.RUNNING)
+        self.item = Item.objects.create(
+            auction=self.auction, name="Lote", base_price=Decimal("100"), increment=Decimal("5")
+        )
+        self.ana = Participant.objects.create(display_name="Ana", wa_user_id="ana@whatsapp")
+        self.url = f"/api/items/{self.item.id}/bids/"
+
+    def post(self, amount, **extra):
+        return self.client.post(self.url, {"participant": self.ana.id, "amount": amount, **extra}, format="json")
+
+    def test_accepts_and_enforces_increment(self):
+        self.assertEqual(self.post("90").data["code"], "amount_too_low")
+        self.assertEqual(self.post("100").status_code, 201)
+        self.assertEqual(self.post("104").status_code, 409)
+        self.assertEqual(self.post("105").status_code, 201)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.highest_bid_amount, Decimal("105"))
+        self.assertEqual(self.item.bids_count, 2)
+
+    def test_equal_amount_does_not_take_the_lead_without_increment(self):
+        Item.objects.filter(pk=self.item.pk).update(increment=0)
+        self.assertEqual(self.post("100").status_code, 201)
+        other = Participant.objects.create(display_name="Beto", wa_user_id="beto@whatsapp")
+        resp = self.client.post(self.url, {"participant": other.id, "amount": "100"}, format="json")
+        self.assertEqual((resp.status_code, resp.data["code"]), (409, "amount_too_low"))
+        self.assertEqual(self.post("100.01").status_code, 201)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.leading_participant, self.ana)
+
+    def test_malformed_requests(self):
+        resp = self.client.post("/api/items/abc/bids/", {"participant": self.ana.id, "amount": "100"}, format="json")
+        self.assertEqual(resp.status_code, 404)
+        resp = self.client.post("/api/bids/batch/", [{"item": self.item.id, "amount": "100"}], format="json")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_min_increment_rule(self):
+        Rule.objects.create(auction=self.auction, key="min_increment", value="20")
+        self.post("100")
+        self.assertEqual(self.post("110").status_code, 409)
+        self.assertEqual(self.post("120").status_code, 201)
+
+    def test_rejects_after_claim_expired(self):
+        self.item.claim_expires_at = timezone.now() - timedelta(seconds=1)
+        self.item.save()
+        resp = self.post("100")
+        self.assertEqual((resp.status_code, resp.data["code"]), (409, "claim_expired"))
+
+    def test_rejects_when_auction_not_running(self):
+        self.auction.status = Auction.Status.PAUSED
+        self.auction.save()
+        self.assertEqual(self.post("100").data["code"], "auction_not_running")
+
+    def test_idempotent_by_source_message_id(self):
+        first = self.post("100", source_message_id="wamid.1")
+        again = self.post("100", source_message_id="wamid.1")
+        self.assertEqual((first.status_code, again.status_code), (201, 200))
+        self.assertEqual(first.data["bid"]["id"], again.data["bid"]["id"])
+        self.assertEqual(Bid.objects.count(), 1)
+
+    def test_resolves_participant_by_wa_user_id(self):
+        resp = self.client.post(self.url, {"wa_user_id": "nuevo@whatsapp", "amount": "100"}, format="json")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data["bid"]["participant"]["wa_user_id"], "nuevo@whatsapp")
+
+    def test_batch(self):
+        other = Item.objects.create(auction=self.auction, name="Otro", base_price=Decimal("10"))
+        resp = self.client.post("/api/bids/batch/", {"bids": [
+            {"item": self.item.id, "participant": self.ana.id, "amount": "100", "source_message_id": "m1"},
+            {"item": self.item.id, "participant": self.ana.id, "amount": "101", "source_message_id": "m2"},
+            {"item": self.item.id, "participant": self.ana.id, "amount": "110", "source_message_id": "m3"},
+            {"item": other.id, "participant": self.ana.id, "amount": "10", "source_message_id": "m4"},
+            {"item": self.item.id, "participant": self.ana.id, "amount": "100", "source_message_id": "m1"},
+            {"item": 999999, "participant": self.ana.id, "amount": "10"},
+        ]}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        results = resp.data["results"]
+        self.assertEqual([r["ok"] for r in results], [True, False, True, True, True, False])
+        self.assertEqual(results[1]["code"], "amount_too_low")
+        self.assertFalse(results[4]["created"])
+        self.assertEqual(results[5]["code"], "item_not_found")
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.highest_bid_amount, self.item.bids_count), (Decimal("110"), 2))
+
+
+class BidBookTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.book = bidbook.BidBook(fakeredis.FakeRedis())
+        patcher = mock.patch("subasta_app.bidbook.get_bid_book", return_value=self.book)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.auction = Auction.objects.create(title="Subasta", status=Auction.Status.RUNNING)
+        Rule.objects.create(auction=self.auction, key="min_increment", value="10")
+        self.item = Item.objects.create(auction=self.auction, name="Lote", base_price=Decimal("100"))
+        self.ana = Participant.objects.create(display_name="Ana", wa_user_id="ana@whatsapp")
+        self.url = f"/api/items/{self.item.id}/bids/"
+
+    def post(self, amount, **extra):
+        return self.client.post(self.url, {"participant": self.ana.id, "amount": amount, **extra}, format="json")
+
+    def test_accepts_in_redis_and_flushes_later(self):
+        self.assertEqual(self.post("100", source_message_id="m1").status_code, 202)
+        resp = self.post("105")
+        self.assertEqual((resp.status_code, resp.data["code"], resp.data["amount"]), (409, "amount_too_low", "110"))
+        self.assertEqual(self.post("110", source_message_id="m2").status_code, 202)
+        self.assertEqual(self.post("110", source_message_id="m2").status_code, 200)  # duplicado
+        self.assertEqual(Bid.objects.count(), 0)
+
+        self.assertEqual(self.book.flush_all(), 2)
+        self.assertEqual(self.book.pending(), 0)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.highest_bid_amount, self.item.bids_count), (Decimal("110"), 2))
+
+    def test_flush_is_idempotent(self):
+        self.post("100", source_message_id="m1")
+        raw = self.book.r.lrange(bidbook.PENDING_KEY, 0, -1)
+        self.book.flush_all()
+        self.book.r.rpush(bidbook.PENDING_KEY, *raw)  # simula caída antes del LTRIM
+        self.book.flush_all()
+        self.assertEqual(Bid.objects.count(), 1)
+
+    def test_rejects_expired_and_paused(self):
+        self.item.claim_expires_at = timezone.now() - timedelta(seconds=1)
+        self.item.save()
+        self.assertEqual(self.post("100").data["code"], "claim_expired")
+
+        other = Item.objects.create(auction=self.auction, name="Otro", base_price=Decimal("1"))
+        self.client.post(f"/api/auctions/{self.auction.id}/pause/")
+        resp = self.client.post(f"/api/items/{other.id}/bids/", {"participant": self.ana.id, "amount": "5"})
+        self.assertEqual(resp.data["code"], "auction_not_running")
+
+    def test_reconcile_rebuilds_from_database(self):
+        self.post("100", source_message_id="m1")
+        self.post("150", source_message_id="m2")
+        self.book.r.flushall()  # simula reinicio de Redis (la cola se perdió)
+        Bid.objects.create(item=self.item, participant=self.ana, amount=Decimal("200"), source_message_id="m3")
+
+        self.assertEqual(self.book.reconcile(), 1)
+        self.assertEqual(self.post("205").data["code"], "amount_too_low")
+        self.assertEqual(self.post("200", source_message_id="m3").status_code, 200)
+        self.assertEqual(self.post("210").status_code, 202)
+
+    def test_equal_amount_rejected_without_increment(self):
+        Rule.objects.filter(auction=self.auction).delete()
+        self.post("100")
+        resp = self.post("100")
+        self.assertEqual((resp.status_code, resp.data["code"], resp.data["amount"]), (409, "amount_too_low", "100.01"))
+        self.assertEqual(self.post("100.01").status_code, 202)
+
+    def test_redelivered_message_after_restart_is_duplicate(self):
+        Bid.objects.create(item=self.item, participant=self.ana, amount=Decimal("100"), source_message_id="m1")
+        self.book.r.flushall()  # Redis reinició y el item se carga perezosamente en la próxima oferta
+        self.assertEqual(self.post("150", source_message_id="m1").status_code, 200)
+        self.assertEqual(self.book.pending(), 0)
+
+    def test_item_edits_reach_the_loaded_book(self):
+        self.assertEqual(self.post("100").status_code, 202)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.increment = Decimal("50")
+            self.item.save()
+        self.assertEqual(self.post("120").data["amount"], "150")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.claim_expires_at = timezone.now() - timedelta(seconds=1)
+            self.item.save()
+        self.assertEqual(self.post("200").data["code"], "claim_expired")
+        self.assertEqual(self.book.r.hget(bidbook._item_key(self.item.id), "highest"), b"10000")
+
+    def test_reconcile_config_only_keeps_bids(self):
+        self.post("100")
+        Item.objects.filter(pk=self.item.pk).update(base_price=Decimal("500"), increment=Decimal("50"))  # como Node
+        with mock.patch("subasta_app.management.commands.reconcile_bid_book.get_bid_book", return_value=self.book):
+            call_command("reconcile_bid_book", "--config-only", stdout=StringIO())
+        self.assertEqual(self.post("120").data["amount"], "150")
+        self.assertEqual(self.book.pending(), 1)
+
+    def test_flush_drops_bids_of_deleted_items(self):
+        other = Item.objects.create(auction=self.auction, name="Otro", base_price=Decimal("1"))
+        self.post("100", source_message_id="m1")
+        self.client.post(f"/api/items/{other.id}/bids/", {"participant": self.ana.id, "amount": "5"}, format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertFalse(self.book.r.exists(bidbook._item_key(other.id)))
+
+        with self.assertLogs("subasta_app.bidbook", "WARNING"):
+            self.assertEqual(self.book.flush_all(), 2)
+        self.assertEqual(self.book.pending(), 0)
+        self.assertEqual(list(Bid.objects.values_list("item_id", flat=True)), [self.item.id])
+
+    def test_batch(self):
+        resp = self.client.post("/api/bids/batch/", {"bids": [
+            {"item": self.item.id, "participant": self.ana.id, "amount": "100"},
+            {"item": self.item.id, "participant": self.ana.id, "amount": "101"},
+            {"item": 999999, "participant": self.ana.id, "amount": "1"},
+        ]}, format="json")
+        self.assertEqual([r["code"] for r in resp.data["results"]], ["accepted", "amount_too_low", "item_not_found"])
+
+
+class LiveEventsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        server = fakeredis.FakeServer()
+        self.bus = events.EventBus(
+            fakeredis.FakeRedis(server=server), lambda: fakeredis.aioredis.FakeRedis(server=server),
+        )
+        patcher = mock.patch("subasta_app.events.get_event_bus", return_value=self.bus)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.auction = Auction.objects.create(title="Subasta")
+        self.item = Item.objects.create(auction=self.auction, name="Lote", base_price=Decimal("100"))
+        self.ana = Participant.objects.create(display_name="Ana", wa_user_id="ana@whatsapp")
+        self.token = str(AccessToken.for_user(self.user))
+        self.url = f"/api/auctions/{self.auction.id}/events/"
+
+    def produce_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/auctions/{self.auction.id}/start/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/items/{self.item.id}/bids/", {"participant": self.ana.id, "amount": "100"})
+
+    async def read_events(self, n, data=None, headers=None):
+        # Llamamos la vista directo: el stream es infinito y el middleware sync (WhiteNoise)
+        # lo consumiría en otro event loop
+        request = AsyncRequestFactory().get(self.url, data, headers=headers)
+        resp = await views.auction_events(request, self.auction.id)
+        self.assertEqual(resp.status_code, 200)
+        chunks = []
+        async for chunk in resp.streaming_content:
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk.startswith("id:"):
+                chunks.append(chunk)
+            if len(chunks) == n:
+                break
+        return chunks
+
+    async def test_stream_from_beginning(self):
+        await sync_to_async(self.produce_events)()
+        chunks = await self.read_events(2, {"token": self.token}, {"Last-Event-ID": "0-0"})
+        self.assertIn("event: auction-status", chunks[0])
+        self.assertIn('"status": "RUNNING"', chunks[0])
+        self.assertIn("event: bid-accepted", chunks[1])
+        self.assertIn('"amount": "100.00"', chunks[1])
+
+    async def test_resume_from_last_event_id(self):
+        await sync_to_async(self.produce_events)()
+        first = (await self.bus.ar.xrange(f"livefeed:auction:{self.auction.id}"))[0][0].decode()
+        chunks = await self.read_events(1, headers={"Authorization": f"Bearer {self.token}", "Last-Event-ID": first})
+        self.assertIn("event: bid-accepted", chunks[0])
+
+    async def test_invalid_last_event_id_starts_from_now(self):
+        await sync_to_async(self.produce_events)()
+        reader = asyncio.create_task(self.read_events(1, {"token": self.token}, {"Last-Event-ID": "abc"}))
+        await asyncio.sleep(0.1)  # ya está escuchando: los eventos anteriores no llegan
+        await sync_to_async(self.bus.publish)(self.auction.id, events.ITEM_SOLD, {"item_id": self.item.id})
+        chunks = await asyncio.wait_for(reader, 5)
+        self.assertIn("event: item-sold", chunks[0])
+
+    async def test_async_client_per_event_loop(self):
+        client = self.bus.ar
+        self.assertIs(self.bus.ar, client)
+        other = await sync_to_async(lambda: asyncio.run(self._bus_client()), thread_sensitive=False)()
+        self.assertIsNot(other, client)
+
+    async def _bus_client(self):
+        return self.bus.ar
+
+    async def test_refused_under_wsgi(self):
+        request = RequestFactory().get(self.url, {"token": self.token})  # WSGIRequest
+        resp = await views.auction_events(request, self.auction.id)
+        self.assertEqual(resp.status_code, 503)
+
+    async def test_requires_token(self):
+        resp = await self.async_client.get(self.url)
+        self.assertEqual(resp.status_code, 401)
+
+
+class ListEndpointsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.auction = self.make_auction(3, bids_per_item=4)
+        self.other = self.make_auction(2, bids_per_item=1)
+
+    def test_cursor_pagination_walks_all_pages(self):
+        url, seen = "/api/bids/?page_size=5", []
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            self.assertLessEqual(len(resp.data["results"]), 5)
+            seen += [b["id"] for b in resp.data["results"]]
+            url = resp.data["next"]
+        self.assertEqual(sorted(seen), sorted(Bid.objects.values_list("id", flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_page_size_is_capped(self):
+        resp = self.client.get("/api/bids/?page_size=100000")
+        self.assertEqual(len(resp.data["results"]), 14)
+
+    def test_sparse_fields(self):
+        resp = self.client.get("/api/items/?fields=id,name,highest_bid")
+        self.assertEqual(set(resp.data["results"][0]), {"id", "name", "highest_bid"})
+
+    def test_sparse_fields_skip_unrequested_prefetch(self):
+        url = f"/api/auctions/{self.auction.id}/"
+        full = self.count_queries(url)
+        sparse = self.count_queries(url + "?fields=id,title,status")
+        self.assertLess(sparse, full)
+        resp = self.client.get(url + "?fields=id,rules")
+        self.assertEqual(set(resp.data), {"id", "rules"})
+
+    def test_bid_filters(self):
+        item = self.auction.items.first()
+        resp = self.client.get(f"/api/bids/?item={item.id}")
+        self.assertEqual({b["item"] for b in resp.data["results"]}, {item.id})
+        self.assertEqual(len(resp.data["results"]), 4)
+
+        Bid.objects.filter(pk=resp.data["results"][0]["id"]).update(created_at=timezone.now() + timedelta(days=1))
+        since = (timezone.now() + timedelta(hours=1)).isoformat()
+        resp = self.client.get("/api/bids/", {"since": since})
+        self.assertEqual(len(resp.data["results"]), 1)
+
+    def test_item_filters(self):
+        Item.objects.filter(auction=self.auction).update(is_sold=True)
+        resp = self.client.get(f"/api/items/?auction={self.auction.id}&is_sold=false")
+        self.assertEqual(resp.data["results"], [])
+        resp = self.client.get(f"/api/items/?auction={self.other.id}&is_sold=false")
+        self.assertEqual(len(resp.data["results"]), 2)
+
+    def test_invalid_filter_value(self):
+        resp = self.client.get("/api/bids/?item=abc")
+        self.assertEqual(resp.status_code, 400)
+
+
+class AuctionSummaryTests(ApiTestCase):
+    def test_list_uses_summary_with_totals(self):
+        auction = self.make_auction(3, bids_per_item=2)  # cada item termina en 110
+        Item.objects.filter(pk=auction.items.first().pk).update(is_sold=True)
+        Item.objects.create(auction=auction, name="Sin ofertas", base_price=Decimal("1"))
+
+        resp = self.client.get("/api/auctions/")
+        row = resp.data["results"][0]
+        self.assertNotIn("items", row)
+        self.assertEqual(
+            (row["items_count"], row["sold_count"], row["unsold_count"], row["bids_count"], row["revenue"]),
+            (4, 1, 3, 6, "110.00"),
+        )
+
+    def test_list_is_one_query(self):
+        for n in (1, 5, 10):
+            self.make_auction(n)
+        with self.assertNumQueries(1):
+            resp = self.client.get("/api/auctions/")
+        self.assertEqual(len(resp.data["results"]), 3)
+
+    def test_detail_keeps_nested_form(self):
+        auction = self.make_auction(2)
+        resp = self.client.get(f"/api/auctions/{auction.id}/")
+        self.assertEqual(len(resp.data["items"]), 2)
+        self.assertEqual(resp.data["rules"][0]["key"], "min_increment")
+        self.assertEqual(resp.data["messages"][0]["key"], "welcome")
+
+
+class AuctionConfigTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.auction = Auction.objects.create(title="Subasta")
+        Rule.objects.create(auction=self.auction, key="claim_keyword", value="mio")
+        Rule.objects.create(auction=self.auction, key="min_increment", value="50.5")
+        Rule.objects.create(auction=self.auction, key="anti_snipe_sec", value="30")
+        Rule.objects.create(auction=self.auction, key="max_items", value="12")
+        MessageTemplate.objects.create(auction=self.auction, key="welcome", template="Hola {name}")
+        self.url = f"/api/auctions/{self.auction.id}/config/"
+
+    def test_bundle_has_typed_rules_and_templates(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["rules"], {
+            "claim_keyword": "mio", "min_increment": "50.5", "anti_snipe_sec": 30, "max_items": 12,
+        })
+        self.assertEqual(resp.data["templates"], {"welcome": "Hola {name}"})
+        self.assertEqual(resp["ETag"], f'"{resp.data["version"]}"')
+
+    def test_served_from_cache_and_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertFalse([q for q in ctx.captured_queries if "subasta_app_" in q["sql"]])
+
+    def test_invalidated_on_rule_and_template_changes(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Rule.objects.filter(key="anti_snipe_sec").get().delete()
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("anti_snipe_sec", resp.data["rules"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MessageTemplate.objects.create(auction=self.auction, key="outbid", template="Te superaron")
+        self.assertEqual(self.client.get(self.url).data["templates"]["outbid"], "Te superaron")
+
+    def test_unknown_auction(self):
+        self.assertEqual(self.client.get("/api/auctions/999999/config/").status_code, 404)
+
+    def test_short_ttl_without_shared_cache(self):
+        with mock.patch.object(cache, "set", wraps=cache.set) as cache_set:
+            self.client.get(self.url)
+        self.assertEqual(cache_set.call_args.args[2], auction_config.LOCAL_CACHE_TIMEOUT)
+        self.assertEqual([w.id for w in checks.shared_cache_check(None)], ["subasta_app.W001"])
+
+        redis_cache = {"default": {"BACKEND": "django_redis.cache.RedisCache", "LOCATION": "redis://cache:6379/0"}}
+        with override_settings(CACHES=redis_cache):
+            self.assertEqual(auction_config.cache_timeout(), auction_config.CACHE_TIMEOUT)
+            self.assertEqual(checks.shared_cache_check(None), [])
+
+
+class TemplateRenderTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.auction = self.make_auction(2, bids_per_item=2)  # min_increment=10, items en 110
+        self.template = MessageTemplate.objects.create(
+            auction=self.auction, key="outbid",
+            template="{participant_name}: te superaron en {item_name}. Mínimo {min_next_bid} ({amount})",
+        )
+        self.people = [
+            Participant.objects.create(display_name=f"P{i}", wa_user_id=f"p{i}@whatsapp") for i in range(3)
+        ]
+
+    def test_bulk_render_uses_constant_queries(self):
+        item = self.auction.items.first()
+        url = f"/api/messages/{self.template.id}/render/"
+
+        def payload(n):
+            return {"contexts": [
+                {"item": item.id, "participant": self.people[i % 3].id, "vars": {"amount": "120"}} for i in range(n)
+            ]}
+
+        self.client.post(url, payload(1), format="json")  # calienta el cache del bundle
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(url, payload(2), format="json")
+        with CaptureQueriesContext(connection) as big:
+            resp = self.client.post(url, payload(200), format="json")
+        self.assertEqual(len(small.captured_queries), len(big.captured_queries))
+        self.assertEqual(len(resp.data["results"]), 200)
+        self.assertEqual(resp.data["results"][1]["text"], "P1: te superaron en Lote 0. Mínimo 120.00 (120)")
+
+    def test_missing_references(self):
+        resp = self.client.post(f"/api/messages/{self.template.id}/render/", {"contexts": [
+            {"item": 999999}, {"participant": 999999}, {"vars": {"amount": "1"}},
+        ]}, format="json")
+        self.assertEqual([r["ok"] for r in resp.data["results"]], [False, False, True])
+        self.assertEqual(resp.data["results"][2]["text"], ": te superaron en . Mínimo  (1)")
+
+    def test_rejects_unknown_vars(self):
+        resp = self.client.post(f"/api/messages/{self.template.id}/render/", {"contexts": [
+            {"vars": {"nope": "1"}},
+        ]}, format="json")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_placeholders_validated_on_save(self):
+        url = f"/api/messages/{self.template.id}/"
+        resp = self.client.patch(url, {"template": "Hola {desconocido}"}, format="json")
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.patch(url, {"template": "Hola {participant_name"}, format="json")
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.patch(url, {"template": "Ganaste {item_name} por {highest_bid}"}, format="json")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_compiled_once_per_version(self):
+        templating.compile_template.cache_clear()
+        templating.compiled_for(self.template)
+        templating.compiled_for(self.template)
+        self.assertEqual(templating.compile_template.cache_info().misses, 1)
+        self.template.template = "Otro {item_name}"
+        templating.compiled_for(self.template)
+        self.assertEqual(templating.compile_template.cache_info().misses, 2)
+
+
+class OutboxTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.auction = Auction.objects.create(title="Subasta")
+
+    def test_start_enqueues_command_without_calling_service(self):
+        with mock.patch("subasta_app.services._request") as req:
+            resp = self.client.post(f"/api/auctions/{self.auction.id}/start/")
+        req.assert_not_called()
+        self.assertEqual(resp.status_code, 202)
+        cmd = OutboxCommand.objects.get(pk=resp.data["command"]["id"])
+        self.assertEqual((cmd.command, cmd.status), ("start", "PENDING"))
+
+        resp = self.client.get(f"/api/outbox/{cmd.id}/")
+        self.assertEqual(resp.data["status"], "PENDING")
+
+    def test_drain_sends_in_order_with_idempotency_key(self):
+        self.client.post(f"/api/auctions/{self.auction.id}/start/")
+        self.client.post(f"/api/auctions/{self.auction.id}/finish/")
+        with mock.patch("subasta_app.services._request", return_value={"ok": True}) as req:
+            self.assertEqual(outbox.drain(), 1)  # el close espera a que salga el start
+            self.assertEqual(outbox.drain(), 1)
+        paths = [c.args[1] for c in req.call_args_list]
+        self.assertEqual(paths, [f"/auctions/{self.auction.id}/start", f"/auctions/{self.auction.id}/close"])
+        keys = [c.kwargs["idempotency_key"] for c in req.call_args_list]
+        self.assertEqual(keys, list(OutboxCommand.objects.values_list("idempotency_key", flat=True)))
+        self.assertFalse(OutboxCommand.objects.exclude(status="DONE").exists())
+
+    def test_unavailable_retries_with_backoff(self):
+        cmd = outbox.enqueue(self.auction, OutboxCommand.Command.START)
+        with mock.patch("subasta_app.services._request", side_effect=services.WhatsAppServiceUnavailable("down")):
+            outbox.drain()
+            self.assertEqual(outbox.drain(), 0)  # esperando el backoff
+        cmd.refresh_from_db()
+        self.assertEqual((cmd.status, cmd.attempts, cmd.last_error), ("PENDING", 1, "down"))
+        self.assertGreater(cmd.next_attempt_at, timezone.now())
+
+        OutboxCommand.objects.filter(pk=cmd.pk).update(next_attempt_at=timezone.now())
+        with mock.patch("subasta_app.services._request", return_value={"ok": True}):
+            call_command("drain_outbox", "--once", stdout=StringIO())
+        cmd.refresh_from_db()
+        self.assertEqual((cmd.status, cmd.attempts, cmd.last_error), ("DONE", 2, ""))
+
+    def test_in_flight_command_is_not_taken_twice_and_stale_ones_are_reclaimed(self):
+        cmd = outbox.enqueue(self.auction, OutboxCommand.Command.START)
+
+        def call(*args, **kwargs):
+            # Durante la llamada el comando figura en vuelo y otro worker no lo toma
+            self.assertEqual(OutboxCommand.objects.get(pk=cmd.pk).status, "SENDING")
+            self.assertIsNone(outbox.send(cmd.pk))
+            return {"ok": True}
+
+        with mock.patch("subasta_app.services._request", side_effect=call) as req:
+            outbox.drain()
+        cmd.refresh_from_db()
+        self.assertEqual((req.call_count, cmd.status, cmd.attempts), (1, "DONE", 1))
+
+        stale = outbox.enqueue(self.auction, OutboxCommand.Command.CLOSE)
+        claimed_at = timezone.now() - outbox.SEND_TIMEOUT - timedelta(seconds=1)
+        OutboxCommand.objects.filter(pk=stale.pk).update(status="SENDING", claimed_at=claimed_at, attempts=1)
+        with mock.patch("subasta_app.services._request", return_value={"ok": True}):
+            self.assertEqual(outbox.drain(), 1)
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.attempts), ("DONE", 2))
+
+    def test_client_error_fails_without_retry(self):
+        cmd = outbox.enqueue(self.auction, OutboxCommand.Command.CLOSE)
+        with mock.patch("subasta_app.services._request", side_effect=services.WhatsAppServiceError("Not Found")):
+            outbox.drain()
+        cmd.refresh_from_db()
+        self.assertEqual((cmd.status, cmd.attempts), ("FAILED", 1))
+
+    def test_rollback_drops_command(self):
+        try:
+            with transaction.atomic():
+                outbox.enqueue(self.auction, OutboxCommand.Command.START)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(OutboxCommand.objects.exists())
+
+
+class AsyncWhatsAppClientTests(SimpleTestCase):
+    def setUp(self):
+        services.breaker.reset()
+        self.addCleanup(services.breaker.reset)
+        self.server, _ = wa_stub.serve_in_background(port=0)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        host, port = self.server.server_address
+        cfg = dataclasses.replace(services._cfg, base_url=f"http://{host}:{port}", max_retries=0)
+        for target in ("subasta_app.services._cfg", "subasta_app.services_async._cfg"):
+            patcher = mock.patch(target, cfg)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_same_surface_as_sync_client(self):
+        async with services_async.AsyncWhatsAppClient() as client:
+            resp = await client.wa_start(7, idempotency_key="k-1")
+            self.assertEqual((resp["ok"], resp["auction_id"], resp["idempotency_key"]), (True, 7, "k-1"))
+            self.assertTrue((await client.wa_health())["ok"])
+            with self.assertRaises(services.WhatsAppServiceError):
+                await client.request("POST", "/nope")
+            with self.assertRaises(ValueError):
+                await client.wa_close(0)
+        self.assertEqual(services.wa_close(7)["command"], "close")
+
+    async def test_breaker_cache_is_used_off_the_event_loop(self):
+        threads = []
+        with mock.patch("subasta_app.circuit.cache") as breaker_cache:
+            breaker_cache.get.side_effect = lambda *args, **kwargs: threads.append(threading.get_ident())
+            breaker_cache.get_many.return_value = {}
+            async with services_async.AsyncWhatsAppClient() as client:
+                await client.wa_start(7)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    async def test_fan_out(self):
+        results = await services_async.wa_close_many(range(1, 21), concurrency=5)
+        await services_async.get_client().aclose()
+        self.assertEqual([r["index"] for r in results], list(range(20)))
+        self.assertTrue(all(r["ok"] and r["result"]["command"] == "close" for r in results))
+
+    async def test_idle_connections_capped_by_max_keepalive(self):
+        cfg = dataclasses.replace(services_async._cfg, max_keepalive=2)
+        with mock.patch("subasta_app.services_async._cfg", cfg):
+            async with services_async.AsyncWhatsAppClient() as client:
+                results = await services_async.gather_limited([lambda a=a: client.wa_start(a) for a in range(1, 11)])
+                self.assertTrue(all(r["ok"] for r in results))
+                idle = sum(len(conns) for conns in client.session.connector._conns.values())
+                self.assertEqual(idle, 2)
+
+    def test_session_closed_with_its_loop(self):
+        async def use():
+            client = services_async.get_client()
+            await client.wa_start(1)
+            return client
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            client = asyncio.run(use())
+            gc.collect()
+        self.assertTrue(client._session.closed)
+        self.assertFalse([w for w in caught if "Unclosed" in str(w.message)])
+
+    async def test_unreachable_is_unavailable(self):
+        self.server.shutdown()
+        self.server.server_close()
+        async with services_async.AsyncWhatsAppClient() as client:
+            with self.assertRaises(services.WhatsAppServiceUnavailable):
+                await client.wa_start(1)
+            results = await services_async.gather_limited([lambda: client.wa_start(1)])
+        self.assertEqual((results[0]["ok"], results[0]["retryable"]), (False, True))
+
+
+class CircuitBreakerTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        services.breaker.reset()
+        self.addCleanup(services.breaker.reset)
+
+    def fail_until_open(self):
+        with mock.patch("subasta_app.services._send", side_effect=services.WhatsAppServiceUnavailable("down")):
+            for _ in range(services.breaker.failure_threshold):
+                with self.assertRaises(services.WhatsAppServiceUnavailable):
+                    services.wa_start(1)
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        self.fail_until_open()
+        with mock.patch("subasta_app.services._send") as send:
+            with self.assertRaises(services.WhatsAppCircuitOpen):
+                services.wa_start(1)
+            health = services.wa_health()
+        send.assert_not_called()
+        self.assertEqual((health["ok"], health["breaker"]["state"]), (False, "open"))
+        resp = self.client.get("/keep-alive/")
+        self.assertEqual(resp.json()["whatsapp_breaker"]["state"], "open")
+
+    def test_client_errors_do_not_count(self):
+        with mock.patch("subasta_app.services._send", side_effect=services.WhatsAppServiceError("Not Found")):
+            for _ in range(services.breaker.failure_threshold + 1):
+                with self.assertRaises(services.WhatsAppServiceError):
+                    services.wa_start(1)
+        self.assertEqual(services.breaker.state(), "closed")
+
+    def expire_cooldown(self):
+        cache.set("circuit:whatsapp:opened_at", time.time() - services.breaker.cooldown - 1)
+        services.breaker._open_until = 0.0  # como otro worker que no vio la apertura
+
+    def test_half_open_lets_one_probe_through(self):
+        self.fail_until_open()
+        self.expire_cooldown()
+        self.assertEqual(services.breaker.state(), "half_open")
+        services.breaker.before_call()  # la prueba
+        with self.assertRaises(circuit.CircuitOpen):
+            services.breaker.before_call()  # el resto sigue fallando rápido
+        services.breaker.record_success()
+        self.assertEqual(services.breaker.state(), "closed")
+
+    def test_failed_probe_reopens(self):
+        self.fail_until_open()
+        self.expire_cooldown()
+        with mock.patch("subasta_app.services._send", side_effect=services.WhatsAppServiceUnavailable("down")):
+            with self.assertRaises(services.WhatsAppServiceUnavailable):
+                services.wa_start(1)
+        self.assertEqual(services.breaker.state(), "open")
+
+    def test_outbox_does_not_burn_attempts_while_open(self):
+        self.fail_until_open()
+        cmd = outbox.enqueue(Auction.objects.create(title="Subasta"), OutboxCommand.Command.START)
+        outbox.drain()
+        cmd.refresh_from_db()
+        self.assertEqual((cmd.status, cmd.attempts), ("PENDING", 0))
+        self.assertGreater(cmd.next_attempt_at, timezone.now())
+
+
+class ItemCommandsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        services.breaker.reset()
+        self.addCleanup(services.breaker.reset)
+        self.server, _ = wa_stub.serve_in_background(port=0)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        host, port = self.server.server_address
+        patcher = mock.patch("subasta_app.services._cfg", dataclasses.replace(
+            services._cfg, base_url=f"http://{host}:{port}", batch_max_commands=2,
+        ))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.auction = self.make_auction(3)
+
+    def test_batch_endpoint_queues_in_outbox(self):
+        items = list(self.auction.items.order_by("id"))
+        commands = [
+            {"item": items[0].id, "type": "publish", "idempotency_key": "pub-1"},
+            {"item": 999999, "type": "expire"},
+            {"item": items[1].id, "type": "expire", "payload": {"claim_expires_at": "2030-01-01T00:00:00Z"}},
+            {"item": items[2].id, "type": "announce_winner", "idempotency_key": "pub-1"},
+        ]
+        with mock.patch("subasta_app.services._send", wraps=services._send) as send:
+            resp = self.client.post("/api/items/commands/", {"commands": commands}, format="json")
+            send.assert_not_called()  # el request no llama a Node
+            self.assertEqual(resp.status_code, 202)
+            self.assertFalse(resp.data["ok"])
+            self.assertEqual(
+                [(r["index"], r["status"]) for r in resp.data["results"]],
+                [(0, "queued"), (1, "rejected"), (2, "queued"), (3, "queued")],
+            )
+            self.assertEqual(resp.data["results"][1]["error"], "Item not found")
+            self.assertEqual(len(resp.data["commands"]), 1)  # uno por subasta
+            queued = [r for r in resp.data["results"] if r["ok"]]
+            self.assertEqual({r["outbox_id"] for r in queued}, {resp.data["commands"][0]["id"]})
+            self.assertEqual((queued[0]["idempotency_key"], queued[2]["idempotency_key"]), ("pub-1", "pub-1"))
+            self.assertTrue(queued[1]["idempotency_key"])  # generada al encolar
+
+            self.assertEqual(outbox.drain(), 1)
+        self.assertEqual(send.call_count, 2)  # 3 comandos válidos, de a 2 por request
+        sent = [c for call in send.call_args_list for c in call.kwargs["json_body"]["commands"]]
+        self.assertEqual(sent[0]["payload"]["name"], items[0].name)
+        self.assertEqual(sent[1]["payload"]["claim_expires_at"], "2030-01-01T00:00:00Z")
+        self.assertEqual(sent[2]["payload"]["amount"], "120.00")
+
+        # Contrato de consulta: el resultado de cada comando, por su key, en el outbox
+        cmd = self.client.get(f"/api/outbox/{queued[1]['outbox_id']}/").data
+        results = cmd["response"]["results"]
+        self.assertEqual((cmd["status"], [r["item_id"] for r in results]), ("DONE", [i.id for i in items]))
+        self.assertEqual(results[1]["idempotency_key"], queued[1]["idempotency_key"])
+        self.assertTrue(results[0]["ok"] and results[1]["ok"])
+        self.assertTrue(results[2]["duplicate"])  # misma idempotency key que el primero
+
+    def test_unavailable_item_commands_are_retried_with_the_same_keys(self):
+        item = self.auction.items.first()
+        self.client.post("/api/items/commands/", {"commands": [{"item": item.id, "type": "expire"}]}, format="json")
+        cmd = OutboxCommand.objects.get()
+        with mock.patch("subasta_app.services._send", side_effect=services.WhatsAppServiceUnavailable("down")):
+            outbox.drain()
+        cmd.refresh_from_db()
+        self.assertEqual((cmd.status, cmd.attempts), ("PENDING", 1))
+
+        OutboxCommand.objects.filter(pk=cmd.pk).update(next_attempt_at=timezone.now())
+        with mock.patch("subasta_app.services._send", wraps=services._send) as send:
+            outbox.drain()
+        cmd.refresh_from_db()
+        self.assertEqual(cmd.status, "DONE")
+        sent = send.call_args.kwargs["json_body"]["commands"][0]
+        self.assertEqual(sent["idempotency_key"], cmd.payload["commands"][0]["idempotency_key"])
+
+    def test_publish_sends_whatsapp_variant(self):
+        item = self.auction.items.first()
+        item.image = "products/lote.png"
+        item.save(update_fields=["image"])
+        payload = item_commands.build([{"item": item.id, "type": "publish"}])[0][0]["payload"]
+        self.assertEqual((payload["image"], payload["image_webp"]), (item.image.url, None))
+
+        variant = "products/variants/ab/abc/whatsapp"
+        Item.objects.filter(pk=item.pk).update(
+            image_variants={"whatsapp": {"webp": f"{variant}.webp", "jpeg": f"{variant}.jpg"}},
+        )
+        payload = item_commands.build([{"item": item.id, "type": "publish"}])[0][0]["payload"]
+        self.assertEqual((payload["image"], payload["image_webp"]), (f"/media/{variant}.jpg", f"/media/{variant}.webp"))
+
+    def test_unavailable_chunk_marks_its_commands_retryable(self):
+        item = self.auction.items.first()
+        with mock.patch("subasta_app.services._send", side_effect=services.WhatsAppServiceUnavailable("down")):
+            results = services.wa_batch([
+                {"type": "publish", "auction_id": self.auction.id, "item_id": item.id, "idempotency_key": "a"},
+            ])
+        self.assertEqual(results, [{
+            "idempotency_key": "a", "type": "publish", "item_id": item.id,
+            "ok": False, "error": "down", "retryable": True,
+        }])
+
+    def test_rejects_unknown_type(self):
+        resp = self.client.post("/api/items/commands/", {"commands": [{"item": 1, "type": "nope"}]}, format="json")
+        self.assertEqual(resp.status_code, 400)
+
+
+def png_bytes(color="red"):
+    buf = io.BytesIO()
+    Image.new("RGB", (4, 4), color).save(buf, "PNG")
+    return buf.getvalue()
+
+
+class ItemImportTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_patch = override_settings(MEDIA_ROOT=media)
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+        self.auction = Auction.objects.create(title="Subasta")
+        self.url = f"/api/auctions/{self.auction.id}/import/"
+
+    def images_zip(self, **files):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zf:
+            for name, data in files.items():
+                zf.writestr(f"fotos/{name}", data)
+        return SimpleUploadedFile("images.zip", buf.getvalue(), content_type="application/zip")
+
+    def test_csv_manifest_with_images(self):
+        manifest = (
+            "name,base_price,increment,description,image\n"
+            "Silla,100,10,De roble,a.png\n"
+            "Mesa,250.50,,,b.png\n"
+            "Otra silla,100,10,,a.png\n"
+        )
+        resp = self.client.post(self.url, {
+            "manifest": SimpleUploadedFile("lotes.csv", manifest.encode()),
+            "images": self.images_zip(**{"a.png": png_bytes(), "b.png": png_bytes("blue")}),
+        }, format="multipart")
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertEqual(resp.data["import"]["created_items"], 3)
+        self.assertEqual(resp.data["import"]["progress"], 1.0)
+
+        items = list(self.auction.items.order_by("order"))
+        self.assertEqual([i.name for i in items], ["Silla", "Mesa", "Otra silla"])
+        self.assertEqual(items[1].base_price, Decimal("250.50"))
+        self.assertEqual(items[1].increment, Decimal("0"))
+        self.assertEqual(items[0].image.name, items[2].image.name)  # misma imagen, un solo archivo
+        self.assertTrue(items[1].image.storage.exists(items[1].image.name))
+
+        job = self.client.get(f"/api/imports/{resp.data['import']['id']}/")
+        self.assertEqual((job.data["status"], job.data["stage"]), ("DONE", "finished"))
+
+    def test_json_rows_validated_before_any_write(self):
+        rows = [
+            {"name": "Ok", "base_price": "10"},
+            {"name": "", "base_price": "10"},
+            {"name": "Sin precio"},
+            {"name": "Foto", "base_price": "5", "image": "missing.png"},
+        ]
+        resp = self.client.post(self.url, {"items": rows}, format="json")
+        self.assertEqual(resp.status_code, 400)
+        errors = resp.data["import"]["errors"]
+        self.assertEqual([e["index"] for e in errors], [1, 2, 3])
+        self.assertIn("base_price", errors[1]["errors"])
+        self.assertFalse(self.auction.items.exists())
+
+    def test_bulk_insert_query_count(self):
+        rows = json.dumps([{"name": f"Lote {i}", "base_price": "100"} for i in range(1200)]).encode()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(self.url, {"manifest": SimpleUploadedFile("lotes.json", rows)}, format="multipart")
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(self.auction.items.count(), 1200)
+        # SQLite parte el bulk_create en lotes chicos (límite de variables); igual lejos de 1 por fila
+        self.assertLess(len(ctx.captured_queries), 40)
+
+    def test_legacy_form_endpoint(self):
+        resp = self.client.post("/api/subastas/crear/", {
+            "auction_id": self.auction.id,
+            "productos[0][title]": "Silla",
+            "productos[0][price]": "100",
+            "productos[0][image]": SimpleUploadedFile("silla.png", png_bytes(), content_type="image/png"),
+            "productos[1][title]": "Mesa",
+            "productos[1][price]": "200",
+            "productos[1][increment]": "5",
+        }, format="multipart")
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertEqual(resp.data["created"], 2)
+        silla, mesa = self.auction.items.order_by("order")
+        self.assertTrue(silla.image.name.endswith(".png"))
+        self.assertEqual((mesa.order, mesa.increment), (1, Decimal("5")))
+
+        resp = self.client.post("/api/subastas/crear/", {
+            "auction_id": self.auction.id,
+            "productos[0][title]": "Roto",
+            "productos[0][price]": "abc",
+        }, format="multipart")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data["errors"][0]["index"], 0)
+        self.assertEqual(self.auction.items.count(), 2)
+
+    def test_import_command(self):
+        path = tempfile.mktemp(suffix=".csv")
+        with open(path, "w") as f:
+            f.write("title,price\nSilla,100\nMesa,200\n")
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command("import_items", str(self.auction.id), path, stdout=out)
+        self.assertIn("2 items", out.getvalue())
+        self.assertEqual(ItemImport.objects.get().created_items, 2)
+
+    def test_import_command_closes_images_zip(self):
+        manifest, images = tempfile.mktemp(suffix=".csv"), tempfile.mktemp(suffix=".zip")
+        with open(manifest, "w") as f:
+            f.write("name,base_price,image\nSilla,100,a.png\n")
+        with open(images, "wb") as f:
+            f.write(self.images_zip(**{"a.png": png_bytes()}).read())
+        self.addCleanup(os.remove, manifest)
+        self.addCleanup(os.remove, images)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            call_command("import_items", str(self.auction.id), manifest, "--images", images, stdout=StringIO())
+            gc.collect()
+        self.assertTrue(self.auction.items.get().image)
+        self.assertFalse([w for w in caught if issubclass(w.category, ResourceWarning)])
+
+    def test_duplicate_image_names_in_zip_rejected(self):
+        resp = self.client.post(self.url, {
+            "manifest": SimpleUploadedFile("lotes.csv", b"name,base_price,image\nSilla,100,foto.png\n"),
+            "images": self.images_zip(**{"a/foto.png": png_bytes(), "b/foto.png": png_bytes("blue")}),
+        }, format="multipart")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("foto.png (fotos/a/foto.png, fotos/b/foto.png)", resp.data["message"])
+        self.assertFalse(self.auction.items.exists())
+
+
+class ItemImageTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings_patch = override_settings(MEDIA_ROOT=media)
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+        self.media = media
+        self.auction = Auction.objects.create(title="Subasta")
+
+    def jpeg(self, size=(3000, 2000)):
+        buf = io.BytesIO()
+        Image.new("RGB", size, "green").save(buf, "JPEG")
+        return SimpleUploadedFile("foto.JPG", buf.getvalue(), content_type="image/jpeg")
+
+    def upload(self, upload):
+        return self.client.post("/api/items/", {
+            "auction": self.auction.id, "name": "Lote", "base_price": "10", "image": upload,
+        }, format="multipart")
+
+    def test_identical_uploads_share_one_file(self):
+        data = self.jpeg().read()
+        a = self.upload(SimpleUploadedFile("a.jpg", data, content_type="image/jpeg"))
+        b = self.upload(SimpleUploadedFile("b.jpg", data, content_type="image/jpeg"))
+        self.assertEqual((a.status_code, b.status_code), (201, 201))
+        item_a, item_b = Item.objects.order_by("id")
+        self.assertEqual(item_a.image.name, item_b.image.name)
+        self.assertEqual(item_a.image.name, f"products/{item_a.image_hash[:2]}/{item_a.image_hash}.jpg")
+        self.assertEqual(len(os.listdir(os.path.join(self.media, "products", item_a.image_hash[:2]))), 1)
+        self.assertEqual(a.data["image_variants"], {})  # pendiente, no se genera en el request
+
+    def test_worker_builds_variants_once_per_file(self):
+        self.upload(self.jpeg())
+        data = Item.objects.get().image.open("rb").read()
+        self.upload(SimpleUploadedFile("otra.jpg", data, content_type="image/jpeg"))
+        with mock.patch("subasta_app.images._encode", wraps=images._encode) as encode:
+            call_command("process_images", "--once", stdout=StringIO())
+        self.assertEqual(encode.call_count, len(images.VARIANTS) * len(images.FORMATS))
+        self.assertFalse(images.pending().exists())
+
+        item = Item.objects.first()
+        thumb = Image.open(item.image.storage.open(item.image_variants["thumb"]["webp"]))
+        self.assertEqual((thumb.format, max(thumb.size)), ("WEBP", 320))
+        full = Image.open(item.image.storage.open(item.image_variants["full"]["jpeg"]))
+        self.assertEqual((full.format, full.size), ("JPEG", (2048, 1365)))
+
+        resp = self.client.get(f"/api/items/{item.id}/")
+        self.assertTrue(resp.data["image_variants"]["whatsapp"]["jpeg"].startswith("http://testserver/media/"))
+
+    def test_backfill_moves_legacy_images(self):
+        legacy = [
+            Item.objects.create(auction=self.auction, name=f"Lote {i}", base_price=Decimal("10"))
+            for i in range(2)
+        ]
+        path = default_storage.save("products/2024/01/01/vieja.jpg", self.jpeg((100, 80)))
+        Item.objects.filter(pk__in=[i.pk for i in legacy]).update(image=path)
+
+        out = StringIO()
+        call_command("backfill_images", stdout=out)
+        self.assertIn("1 originals moved, 1 processed", out.getvalue())
+        a, b = Item.objects.order_by("id")
+        self.assertEqual(a.image.name, b.image.name)
+        self.assertTrue(a.image.name.startswith(f"products/{a.image_hash[:2]}/"))
+        self.assertEqual(a.image_variants, b.image_variants)
+        self.assertFalse(default_storage.exists(path))
+
+
+class ExportTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.auction = self.make_auction(2)
+        self.other = self.make_auction(1)
+        item = self.auction.items.order_by("id").first()
+        Item.objects.filter(pk=item.pk).update(is_sold=True, sold_to=self.ana, sold_at=timezone.now())
+
+    @property
+    def ana(self):
+        return Participant.objects.get(wa_user_id=f"ana-{self.auction.id}@whatsapp")
+
+    def read(self, resp):
+        body = b"".join(resp.streaming_content)
+        if resp.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def test_results_csv_per_auction(self):
+        resp = self.client.get(f"/api/exports/results.csv?auction={self.auction.id}")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        self.assertIn(f'filename="results-{self.auction.id}.csv"', resp["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(self.read(resp).decode())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual((rows[0]["sold"], rows[0]["winner"], rows[0]["final_price"]), ("True", "Ana", "120.00"))
+        self.assertEqual(rows[1]["winner"], "")
+
+    def test_bids_gzip_and_date_range(self):
+        Bid.objects.filter(item__auction=self.auction).update(created_at=timezone.now() - timedelta(days=10))
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(
+                "/api/exports/bids.csv", {"since": (timezone.now() - timedelta(days=1)).date().isoformat()},
+                HTTP_ACCEPT_ENCODING="gzip, deflate",
+            )
+            body = self.read(resp)
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual({r["auction_id"] for r in rows}, {str(self.other.id)})
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(len(ctx.captured_queries), 1)  # un solo SELECT con joins, leído por chunks
+
+    def test_bids_xlsx(self):
+        resp = self.client.get(f"/api/exports/bids.xlsx?auction={self.auction.id},{self.other.id}")
+        self.assertEqual(resp.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(self.read(resp))) as zf:
+            self.assertIn("xl/workbook.xml", zf.namelist())
+            sheet = ElementTree.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+        ns = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+        rows = sheet.findall(".//x:row", ns)
+        self.assertEqual(len(rows), 1 + 9)
+        header = [c.find(".//x:t", ns).text for c in rows[0]]
+        self.assertEqual(header[:3], ["bid_id", "auction_id", "item_id"])
+
+    def test_invalid_filters(self):
+        self.assertEqual(self.client.get("/api/exports/bids.csv?since=ayer").status_code, 400)
+        self.assertEqual(self.client.get("/api/exports/bids.csv?auction=x").status_code, 400)
+        self.assertEqual(self.client.get("/api/exports/nope.csv").status_code, 404)
+
+
+class SettlementTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.auction = self.make_auction(3)
+        self.items = list(self.auction.items.order_by("id"))
+        self.ana = Participant.objects.get(wa_user_id=f"ana-{self.auction.id}@whatsapp")
+        self.beto = Participant.objects.create(display_name="Beto", wa_user_id="beto@whatsapp")
+        # Empate en el lote 0: gana la oferta más vieja (Ana, 120); el lote 2 no tiene ofertas válidas
+        Bid.objects.create(item=self.items[0], participant=self.beto, amount=Decimal("120"))
+        Bid.objects.create(item=self.items[1], participant=self.beto, amount=Decimal("500"), is_valid=False)
+        Bid.objects.filter(item=self.items[2]).update(is_valid=False)
+
+    def test_finish_assigns_winners(self):
+        with mock.patch.object(events, "item_sold") as sold_event:
+            resp = self.client.post(f"/api/auctions/{self.auction.id}/finish/")
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.data["settlement"], {"auction_id": self.auction.id, "sold": 2, "unsold": 1,
+                                                   "already_sold": 0})
+        self.assertEqual(sold_event.call_count, 2)
+        rows = list(self.auction.items.order_by("id").values_list("is_sold", "sold_to", "highest_bid_amount"))
+        published = [
+            (c.args[0].is_sold, c.args[0].sold_to_id, c.args[0].highest_bid_amount) for c in sold_event.call_args_list
+        ]
+        self.assertEqual(published, rows[:2])  # el evento lleva lo que quedó escrito
+        self.assertEqual(rows[0], (True, self.ana.id, Decimal("120")))
+        self.assertEqual(rows[1], (True, self.ana.id, Decimal("120")))
+        self.assertEqual(rows[2][:2], (False, None))
+        self.assertFalse(Item.objects.filter(is_sold=True, sold_at__isnull=True).exists())
+
+    def test_rerun_is_idempotent(self):
+        self.client.post(f"/api/auctions/{self.auction.id}/finish/")
+        before = list(Item.objects.order_by("id").values_list("sold_to", "sold_at"))
+        resp = self.client.post(f"/api/auctions/{self.auction.id}/settle/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((resp.data["settlement"]["sold"], resp.data["settlement"]["already_sold"]), (0, 2))
+        self.assertEqual(list(Item.objects.order_by("id").values_list("sold_to", "sold_at")), before)
+
+    def test_requires_finished_auction(self):
+        resp = self.client.post(f"/api/auctions/{self.auction.id}/settle/")
+        self.assertEqual(resp.status_code, 409)
+        self.assertFalse(Item.objects.filter(is_sold=True).exists())
+
+    def test_query_count_does_not_grow_with_items(self):
+        def queries(auction):
+            Auction.objects.filter(pk=auction.pk).update(status=Auction.Status.FINISHED)
+            auction.refresh_from_db()
+            with CaptureQueriesContext(connection) as ctx:
+                settlement.settle(auction)
+            return len(ctx.captured_queries)
+
+        small = queries(self.make_auction(2, bids_per_item=2))
+        self.assertEqual(queries(self.make_auction(40, bids_per_item=2)), small)
+
+    def test_large_auction(self):
+        auction = Auction.objects.create(title="Grande", status=Auction.Status.FINISHED)
+        items = Item.objects.bulk_create(
+            Item(auction=auction, name=f"Lote {i}", base_price=Decimal("100")) for i in range(5000)
+        )
+        # Beto gana los pares; los múltiplos de 5 solo tienen ofertas invalidadas
+        Bid.objects.bulk_create(
+            [Bid(item=item, participant=self.ana, amount=Decimal("150"), is_valid=i % 5 != 0)
+             for i, item in enumerate(items)]
+            + [Bid(item=item, participant=self.beto, amount=Decimal("200"), is_valid=i % 5 != 0)
+               for i, item in enumerate(items) if i % 2 == 0],
+            batch_size=1000,
+        )
+        result = settlement.settle(auction)
+        self.assertEqual((result.sold, result.unsold), (4000, 1000))
+        winners = Counter(Item.objects.filter(auction=auction, is_sold=True).values_list("sold_to", flat=True))
+        self.assertEqual(winners, {self.ana.id: 2000, self.beto.id: 2000})
+        self.assertEqual(Item.objects.get(pk=items[2].pk).highest_bid_amount, Decimal("200"))
+
+    def test_command_settles_pending_auctions(self):
+        Auction.objects.filter(pk=self.auction.pk).update(status=Auction.Status.FINISHED)
+        out = StringIO()
+        call_command("settle_auctions", stdout=out)
+        self.assertIn("2 items sold", out.getvalue())
+        out = StringIO()
+        call_command("settle_auctions", stdout=out)
+        self.assertIn("0 items sold", out.getvalue())
+
+
+class SchedulerTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+
+    def test_starts_due_auctions_only(self):
+        due = Auction.objects.create(title="a", status=Auction.Status.SCHEDULED, starts_at=self.now)
+        later = Auction.objects.create(title="b", status=Auction.Status.SCHEDULED,
+                                       starts_at=self.now + timedelta(minutes=5))
+        Auction.objects.create(title="draft", starts_at=self.now - timedelta(minutes=5))  # DRAFT: no se toca
+        done, next_at = scheduler.tick(self.now)
+        self.assertEqual((done, next_at), (1, later.starts_at))
+        due.refresh_from_db()
+        self.assertEqual(due.status, Auction.Status.RUNNING)
+        self.assertTrue(OutboxCommand.objects.filter(auction=due, command="start").exists())
+        self.assertEqual(scheduler.tick(self.now)[0], 0)
+
+    def test_expired_claim_goes_to_leader(self):
+        auction = self.make_auction(2)
+        Auction.objects.filter(pk=auction.pk).update(status=Auction.Status.RUNNING)
+        sold, empty = auction.items.order_by("id")
+        Bid.objects.filter(item=empty).delete()
+        Item.objects.filter(pk=empty.pk).refresh_bid_summary()
+        Item.objects.filter(pk__in=[sold.pk, empty.pk]).update(claim_expires_at=self.now - timedelta(seconds=1))
+
+        with mock.patch.object(events, "claim_expired") as expired:
+            self.assertEqual(scheduler.tick(self.now)[0], 2)
+        self.assertEqual(expired.call_count, 2)
+        sold.refresh_from_db()
+        empty.refresh_from_db()
+        self.assertEqual((sold.is_sold, sold.sold_to_id, sold.sold_at), (True, sold.leading_participant_id, self.now))
+        self.assertEqual((empty.is_sold, empty.claim_closed_at), (False, self.now))
+        self.assertEqual(scheduler.tick(self.now)[0], 0)
+
+    def test_finishes_and_settles_on_time(self):
+        auction = self.make_auction(1)
+        Auction.objects.filter(pk=auction.pk).update(status=Auction.Status.RUNNING, ends_at=self.now)
+        scheduler.tick(self.now)
+        auction.refresh_from_db()
+        self.assertEqual(auction.status, Auction.Status.FINISHED)
+        self.assertTrue(auction.items.get().is_sold)
+        self.assertTrue(OutboxCommand.objects.filter(auction=auction, command="close").exists())
+
+    def test_one_query_for_all_deadlines(self):
+        for i in range(5):
+            Auction.objects.create(title="a", status=Auction.Status.SCHEDULED, starts_at=self.now + timedelta(hours=i))
+            running = Auction.objects.create(title="r", status=Auction.Status.RUNNING,
+                                             ends_at=self.now + timedelta(hours=i))
+            Item.objects.create(auction=running, name="x", base_price=1, claim_expires_at=self.now)
+        with self.assertNumQueries(1):
+            deadlines = scheduler.upcoming()
+        self.assertEqual(len(deadlines), 15)
+        self.assertEqual([d.at for d in deadlines], sorted(d.at for d in deadlines))
+
+    def test_failing_deadline_backs_off(self):
+        broken = Auction.objects.create(title="a", status=Auction.Status.SCHEDULED, starts_at=self.now)
+        with mock.patch("subasta_app.lifecycle.start", side_effect=RuntimeError("boom")):
+            self.assertEqual(scheduler.tick(self.now)[0], 0)
+        broken.refresh_from_db()
+        self.assertEqual((broken.scheduler_failures, broken.scheduler_retry_at), (1, self.now + outbox.backoff(1)))
+
+        # Mientras espera el reintento no ocupa el lote: el siguiente vencimiento entra aunque limit=1
+        other = Auction.objects.create(title="b", status=Auction.Status.SCHEDULED, starts_at=self.now)
+        self.assertEqual(scheduler.tick(self.now, limit=1)[0], 1)
+        other.refresh_from_db()
+        self.assertEqual(other.status, Auction.Status.RUNNING)
+
+        later = broken.scheduler_retry_at
+        self.assertEqual(scheduler.tick(later)[0], 1)
+        broken.refresh_from_db()
+        self.assertEqual((broken.status, broken.scheduler_failures, broken.scheduler_retry_at), ("RUNNING", 0, None))
+
+    def test_transition_rechecks_under_lock(self):
+        auction = Auction.objects.create(title="a", status=Auction.Status.SCHEDULED, starts_at=self.now)
+        # Otra réplica ya la arrancó entre la query y el lock
+        Auction.objects.filter(pk=auction.pk).update(status=Auction.Status.RUNNING)
+        self.assertFalse(scheduler.start_auction(auction.pk, self.now))
+        self.assertFalse(OutboxCommand.objects.exists())
+
+    def test_command_once(self):
+        Auction.objects.create(title="a", status=Auction.Status.SCHEDULED, starts_at=self.now)
+        out = StringIO()
+        call_command("run_scheduler", "--once", stdout=out)
+        self.assertIn("1 transitions", out.getvalue())
+
+
+class AntiSnipeTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.auction = Auction.objects.create(title="Subasta", status=Auction.Status.RUNNING)
+        Rule.objects.create(auction=self.auction, key="anti_snipe_sec", value="30")
+        self.deadline = timezone.now() + timedelta(seconds=10)
+        self.item = Item.objects.create(auction=self.auction, name="Lote", base_price=Decimal("100"),
+                                        claim_expires_at=self.deadline)
+        self.ana = Participant.objects.create(display_name="Ana", wa_user_id="ana@whatsapp")
+
+    def bid(self, amount, **extra):
+        return self.client.post(f"/api/items/{self.item.id}/bids/",
+                                {"participant": self.ana.id, "amount": amount, **extra}, format="json")
+
+    def test_bid_in_window_extends_claim(self):
+        with mock.patch.object(events, "claim_extended") as extended:
+            self.assertEqual(self.bid("100").status_code, 201)
+        self.item.refresh_from_db()
+        bid_at = Bid.objects.get().created_at
+        self.assertEqual(self.item.claim_expires_at, bid_at + timedelta(seconds=30))
+        extended.assert_called_once_with(self.auction.id, self.item.id, self.item.claim_expires_at)
+        cmd = OutboxCommand.objects.get(command="extend_claim")
+        self.assertEqual(cmd.payload, {"item_id": self.item.id,
+                                       "claim_expires_at": self.item.claim_expires_at.isoformat()})
+
+    def test_extension_taken_by_worker_is_not_overwritten(self):
+        first = outbox.enqueue_claim_extension(self.auction.id, self.item.id, self.deadline)
+        real_filter = OutboxCommand.objects.filter
+
+        def racing_filter(*args, **kwargs):
+            if "payload__item_id" in kwargs:
+                # El worker manda el comando entre la lectura y el UPDATE
+                real_filter(pk=first.pk).update(status=OutboxCommand.Status.DONE)
+                return real_filter(pk=first.pk)
+            return real_filter(*args, **kwargs)
+
+        later = self.deadline + timedelta(seconds=30)
+        with mock.patch.object(OutboxCommand.objects, "filter", side_effect=racing_filter):
+            cmd = outbox.enqueue_claim_extension(self.auction.id, self.item.id, later)
+        self.assertNotEqual(cmd.pk, first.pk)
+        first.refresh_from_db()
+        self.assertEqual(first.payload["claim_expires_at"], self.deadline.isoformat())
+        self.assertEqual(cmd.payload["claim_expires_at"], later.isoformat())
+
+    def test_pending_extensions_are_coalesced(self):
+        self.bid("100")
+        self.bid("110")
+        self.item.refresh_from_db()
+        cmd = OutboxCommand.objects.get(command="extend_claim")
+        self.assertEqual(cmd.payload["claim_expires_at"], self.item.claim_expires_at.isoformat())
+
+        with mock.patch("subasta_app.services._request", return_value={"ok": True}) as req:
+            outbox.drain()
+        self.assertEqual(req.call_args.args[1], f"/auctions/{self.auction.id}/items/{self.item.id}/claim")
+        self.assertEqual(req.call_args.kwargs["json_body"], {"claim_expires_at": cmd.payload["claim_expires_at"]})
+
+    def test_no_extension_outside_window_or_without_rule(self):
+        Item.objects.filter(pk=self.item.pk).update(claim_expires_at=timezone.now() + timedelta(minutes=5))
+        self.bid("100")
+        with self.captureOnCommitCallbacks(execute=True):
+            Rule.objects.get(auction=self.auction).delete()
+        Item.objects.filter(pk=self.item.pk).update(claim_expires_at=self.deadline)
+        self.bid("110")
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.claim_expires_at, self.deadline)
+        self.assertFalse(OutboxCommand.objects.exists())
+
+    def test_extension_only_moves_forward(self):
+        now = timezone.now()
+        window = timedelta(seconds=30)
+        self.assertEqual(antisnipe.extend(self.item.id, now + timedelta(seconds=5), window),
+                         now + timedelta(seconds=35))
+        # Una oferta anterior que se aplica tarde no acorta el vencimiento
+        self.assertIsNone(antisnipe.extend(self.item.id, now + timedelta(seconds=1), window))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.claim_expires_at, now + timedelta(seconds=35))
+        # Claim ya vencido: no se revive
+        self.assertIsNone(antisnipe.extend(self.item.id, now + timedelta(seconds=40), window))
+
+    def test_bid_book_extends_in_redis_and_database(self):
+        book = bidbook.BidBook(fakeredis.FakeRedis())
+        with mock.patch("subasta_app.bidbook.get_bid_book", return_value=book):
+            self.assertEqual(self.bid("100", source_message_id="m1").status_code, 202)
+        expires_ms = int(book.r.hget(bidbook._item_key(self.item.id), "expires"))
+        self.item.refresh_from_db()
+        self.assertEqual(int(self.item.claim_expires_at.timestamp() * 1000), expires_ms)
+        self.assertGreater(self.item.claim_expires_at, self.deadline)
+
+
+@skipUnless(connection.vendor == "postgresql", "Trigger del resumen de ofertas: solo PostgreSQL")
+class BidSummaryTriggerTests(TransactionTestCase):
+    def setUp(self):
+        self.auction = Auction.objects.create(title="Subasta")
+        self.item = Item.objects.create(auction=self.auction, name="Lote", base_price=Decimal("100"))
+        self.ana = Participant.objects.create(display_name="Ana", wa_user_id="ana@whatsapp")
+        self.beto = Participant.objects.create(display_name="Beto", wa_user_id="beto@whatsapp")
+
+    def insert_as_node(self, participant, amount):
+        # bulk_create no pasa por Bid.save, como los INSERT de Node; sin la marca de Django
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL subasta.writer = 'node'")
+        Bid.objects.bulk_create([Bid(item=self.item, participant=participant, amount=Decimal(amount))])
+
+    def test_direct_insert_updates_summary_and_version(self):
+        version = Auction.objects.get(pk=self.auction.pk).version
+        with transaction.atomic():
+            self.insert_as_node(self.ana, "150")
+        self.item.refresh_from_db()
+        self.auction.refresh_from_db()
+        self.assertEqual((self.item.highest_bid_amount, self.item.leading_participant_id, self.item.bids_count),
+                         (Decimal("150"), self.ana.id, 1))
+        self.assertEqual(self.auction.version, version + 1)
+
+        Bid.objects.filter(item=self.item).update(is_valid=False)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.highest_bid_amount, self.item.bids_count), (None, 0))
+
+    def test_concurrent_inserts_on_the_same_item(self):
+        first_inserted = threading.Event()
+
+        def slow_writer():
+            try:
+                with transaction.atomic():
+                    self.insert_as_node(self.ana, "200")
+                    first_inserted.set()
+                    time.sleep(0.5)  # el otro INSERT espera el lock del item en su trigger
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(slow_writer)
+            self.assertTrue(first_inserted.wait(5))
+            with transaction.atomic():
+                self.insert_as_node(self.beto, "150")
+            future.result()
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.highest_bid_amount, self.item.leading_participant_id, self.item.bids_count),
+                         (Decimal("200"), self.ana.id, 2))
+
+
+class AntiSnipeConcurrencyTests(TransactionTestCase):
+    def test_parallel_bids_near_deadline(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        auction = Auction.objects.create(title="Subasta", status=Auction.Status.RUNNING)
+        Rule.objects.create(auction=auction, key="anti_snipe_sec", value="60")
+        item = Item.objects.create(auction=auction, name="Lote", base_price=Decimal("1"),
+                                   claim_expires_at=timezone.now() + timedelta(seconds=5))
+        people = [Participant.objects.create(wa_user_id=f"p{i}@whatsapp") for i in range(20)]
+
+        def fire(i):
+            # Por el camino real de las ofertas (validación + insert + anti-snipe), montos en desorden
+            data = {"participant_id": people[i].id, "amount": Decimal(10 + (i * 7) % 20 * 10)}
+            try:
+                while True:
+                    try:
+                        return bidding.place_bid(item.id, data)
+                    except bidding.BidRejected:
+                        return None
+                    except OperationalError:
+                        # SQLite (shared cache) falla en vez de esperar el lock como Postgres
+                        time.sleep(0.001)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            accepted = [r for r in pool.map(fire, range(len(people))) if r is not None]
+        self.assertTrue(accepted)
+        item.refresh_from_db()
+        last = max(r.bid.created_at for r in accepted)
+        self.assertEqual(item.claim_expires_at, last + timedelta(seconds=60))
+        cmd = OutboxCommand.objects.get(command="extend_claim")
+        self.assertEqual(cmd.payload["claim_expires_at"], item.claim_expires_at.isoformat())
+
+
+class ParticipantResolutionTests(ApiTestCase):
+    def participant_writes(self, ctx):
+        return [q["sql"] for q in ctx.captured_queries if "subasta_app_participant" in q["sql"]]
+
+    def test_upsert_creates_and_updates_in_one_statement(self):
+        old = Participant.objects.create(wa_user_id="old@whatsapp", display_name="Viejo", phone="111")
+        rows = [
+            {"wa_user_id": "old@whatsapp", "display_name": "Nuevo nombre"},
+            {"wa_user_id": "new1@whatsapp", "display_name": "Uno"},
+            {"wa_user_id": "new2@whatsapp", "display_name": "Dos"},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post("/api/participants/upsert/", {"participants": rows}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(self.participant_writes(ctx)), 1)
+        ids = {r["wa_user_id"]: r["id"] for r in resp.data["results"]}
+        self.assertEqual(ids["old@whatsapp"], old.id)
+        old.refresh_from_db()
+        self.assertEqual((old.display_name, old.phone), ("Nuevo nombre", "111"))  # phone no vino: no se toca
+        self.assertEqual(Participant.objects.get(pk=ids["new1@whatsapp"]).display_name, "Uno")
+
+    def test_upsert_mixed_batch_keeps_fields_a_row_omits(self):
+        kept = Participant.objects.create(wa_user_id="kept@whatsapp", display_name="Ana", phone="111")
+        rows = [
+            {"wa_user_id": "phone@whatsapp", "phone": "222"},
+            {"wa_user_id": "name@whatsapp", "display_name": "Beto"},
+            {"wa_user_id": "kept@whatsapp"},  # no trae nada: no se pisa nada
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post("/api/participants/upsert/", {"participants": rows}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(self.participant_writes(ctx)), 3)  # uno por combinación de campos
+        kept.refresh_from_db()
+        self.assertEqual((kept.display_name, kept.phone), ("Ana", "111"))
+        self.assertEqual(Participant.objects.get(wa_user_id="phone@whatsapp").phone, "222")
+
+        resp = self.client.post("/api/participants/upsert/", {"participants": [
+            {"wa_user_id": "kept@whatsapp", "phone": "333"}, {"wa_user_id": "name@whatsapp", "display_name": "B"},
+        ]}, format="json")
+        kept.refresh_from_db()
+        self.assertEqual((kept.display_name, kept.phone), ("Ana", "333"))
+
+    def test_upsert_phone_conflict(self):
+        Participant.objects.create(wa_user_id="a@whatsapp", phone="111")
+        resp = self.client.post("/api/participants/upsert/", {"participants": [
+            {"wa_user_id": "b@whatsapp", "phone": "111"},
+        ]}, format="json")
+        self.assertEqual(resp.status_code, 409)
+        self.assertFalse(Participant.objects.filter(wa_user_id="b@whatsapp").exists())
+
+    def test_batch_bids_from_new_members_resolve_in_one_statement(self):
+        auction = Auction.objects.create(title="Subasta", status=Auction.Status.RUNNING)
+        items = [Item.objects.create(auction=auction, name=f"Lote {i}", base_price=Decimal("10")) for i in range(5)]
+        Participant.objects.create(wa_user_id="m0@whatsapp", display_name="Ya estaba")
+        bids = [{"item": item.id, "wa_user_id": f"m{i}@whatsapp", "display_name": f"M{i}", "amount": "10"}
+                for i, item in enumerate(items)]
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post("/api/bids/batch/", {"bids": bids}, format="json")
+        self.assertTrue(all(r["ok"] for r in resp.data["results"]))
+        inserts = [sql for sql in self.participant_writes(ctx) if sql.startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Participant.objects.get(wa_user_id="m0@whatsapp").display_name, "Ya estaba")
+        self.assertEqual(Participant.objects.filter(wa_user_id__startswith="m").count(), 5)
+
+    def test_cache_skips_database(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            pk = participants.resolve_one("c@whatsapp", "C")
+        with self.assertNumQueries(0):
+            self.assertEqual(participants.resolve_one("c@whatsapp"), pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Participant.objects.get(pk=pk).delete()
+        self.assertIsNone(participants.cache.get("c@whatsapp"))
+
+    def test_ttl_cache_expiry_and_lru(self):
+        c = participants.TTLCache(maxsize=2, ttl=60)
+        c.set_many({"a": 1, "b": 2})
+        c.get("a")
+        c.set_many({"c": 3})  # desaloja "b", el menos usado
+        self.assertEqual((c.get("a"), c.get("b"), c.get("c")), (1, None, 3))
+        expired = participants.TTLCache(ttl=0)
+        expired.set_many({"a": 1})
+        time.sleep(0.001)
+        self.assertIsNone(expired.get("a"))
+
+
+@override_settings(METRICS_TOKEN="s3cret")
+class MetricsTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+    def scrape(self):
+        resp = self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return resp.content.decode()
+
+    def test_per_endpoint_latency_queries_and_size(self):
+        self.make_auction(3)
+        queries = self.count_queries("/api/items/")
+        resp = self.client.get("/api/items/")
+        self.client.get("/api/items/999999/")
+        text = self.scrape()
+        labels = 'view="item-list",method="GET"'
+        self.assertIn(f'subasta_http_requests_total{{{labels},status="200"}} 2', text)
+        self.assertIn('subasta_http_requests_total{view="item-detail",method="GET",status="404"} 1', text)
+        self.assertIn(f'subasta_http_request_duration_seconds_count{{{labels}}} 2', text)
+        self.assertIn(f'subasta_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', text)
+        self.assertIn(f"subasta_http_db_queries_sum{{{labels}}} {2 * queries:.6f}", text)
+        self.assertIn(f"subasta_http_response_size_bytes_total{{{labels}}} {2 * len(resp.content)}", text)
+
+    def test_endpoint_is_protected(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer nope").status_code, 403)
+        with override_settings(METRICS_TOKEN=""):
+            self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer ").status_code, 404)
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0.001)
+    def test_slow_request_log_includes_worst_sql(self):
+        self.make_auction(1)
+        with self.assertLogs("subasta_app.metrics", "WARNING") as logs:
+            self.client.get("/api/auctions/")
+        self.assertIn("Slow request GET /api/auctions/ (auction-list) 200", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
+
+class ConditionalGetTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.auction = self.make_auction(2)
+            self.other = self.make_auction(1)
+        self.url = f"/api/auctions/{self.auction.id}/"
+
+    def get(self, url, **headers):
+        return self.client.get(url, headers=headers)
+
+    def assertChanged(self, url, etag):
+        resp = self.get(url, if_none_match=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+        return resp["ETag"]
+
+    def test_not_modified_without_serializing(self):
+        resp = self.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["ETag"].startswith('W/"'))
+        self.assertIn("Last-Modified", resp)
+        with self.assertNumQueries(1):  # solo la versión de la subasta
+            again = self.get(self.url, if_none_match=resp["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+        self.assertEqual(again["ETag"], resp["ETag"])
+        self.assertEqual(self.get(self.url, if_modified_since=resp["Last-Modified"]).status_code, 304)
+        # Otra URL (?fields=) es otra representación
+        self.assertEqual(self.get(self.url + "?fields=id", if_none_match=resp["ETag"]).status_code, 200)
+
+    def test_mixin_is_not_conditional_by_default(self):
+        class PlainViewSet(views.ConditionalReadMixin, viewsets.ReadOnlyModelViewSet):
+            queryset = Auction.objects.all()
+            serializer_class = AuctionSerializer
+
+        request = APIRequestFactory().get("/plain/")
+        force_authenticate(request, user=self.user)
+        resp = PlainViewSet.as_view({"get": "list"})(request)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("ETag", resp)
+
+    def test_changes_bump_the_version(self):
+        etag = self.get(self.url)["ETag"]
+        item = self.auction.items.first()
+        participant = Participant.objects.get(wa_user_id=f"ana-{self.auction.id}@whatsapp")
+        changes = [
+            lambda: Rule.objects.filter(auction=self.auction).first().delete(),
+            lambda: MessageTemplate.objects.create(auction=self.auction, key="winner", template="Ganaste"),
+            lambda: Bid.objects.create(item=item, participant=participant, amount=Decimal("500")),
+            lambda: Item.objects.filter(pk=item.pk).refresh_bid_summary(),
+            lambda: Auction.objects.get(pk=self.auction.pk).save(),
+        ]
+        for change in changes:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            etag = self.assertChanged(self.url, etag)
+
+    def test_item_list_scoped_to_auction(self):
+        scoped = f"/api/items/?auction={self.auction.id}"
+        scoped_etag, all_etag = self.get(scoped)["ETag"], self.get("/api/items/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.create(auction=self.other, name="Nuevo", base_price=Decimal("1"))
+        self.assertEqual(self.get(scoped, if_none_match=scoped_etag).status_code, 304)
+        self.assertChanged("/api/items/", all_etag)
+        item_url = f"/api/items/{self.auction.items.first().id}/"
+        self.assertEqual(self.get(item_url, if_none_match=self.get(item_url)["ETag"]).status_code, 304)
+
+    def test_touches_are_applied_once_per_transaction(self):
+        version = Auction.objects.get(pk=self.auction.pk).version
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for item in self.auction.items.all():
+                    versioning.touch(item_ids=[item.id])
+                versioning.touch(auction_ids=[self.auction.id])
+        self.assertEqual(Auction.objects.get(pk=self.auction.pk).version, version + 1)
+        self.assertEqual(versioning.flush(), 0)
+
+    def test_failed_version_bump_does_not_fail_the_committed_change(self):
+        failing = mock.patch.object(Auction.objects, "filter", side_effect=OperationalError("locked"))
+        with self.assertLogs("django", "ERROR"), failing:
+            with self.captureOnCommitCallbacks(execute=True):
+                Item.objects.filter(pk=self.auction.items.first().pk).update(name="Cambiado")
+                versioning.touch(auction_ids=[self.auction.id])
+        self.assertTrue(Item.objects.filter(name="Cambiado").exists())
+
+    @override_settings(API_RESPONSE_CACHE_SECONDS=60)
+    def test_response_cache(self):
+        first = self.get(self.url)
+        with self.assertNumQueries(1):
+            cached = self.get(self.url)
+        self.assertEqual(cached.json(), first.json())
+        self.assertEqual(cached["ETag"], first["ETag"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.filter(auction=self.auction).first().delete()
+        self.assertEqual(len(self.get(self.url).json()["items"]), 1)
+
+class AsyncServingTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.auction = self.make_auction(2)
+        self.url = f"/api/auctions/{self.auction.id}/live/"
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def test_keep_alive(self):
+        resp = self.client.get("/keep-alive/")
+        self.assertEqual((resp.status_code, resp.json()["ok"]), (200, True))
+        self.assertEqual(self.client.post("/keep-alive/").status_code, 405)
+
+    def test_live_snapshot(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        resp = self.client.get(self.url, **self.auth)
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual((data["auction"]["id"], data["auction"]["status"]), (self.auction.id, "DRAFT"))
+        self.assertEqual([i["highest_bid"] for i in data["items"]], ["120.00", "120.00"])
+        self.assertEqual(self.client.get("/api/auctions/999999/live/", **self.auth).status_code, 404)
+
+    def test_live_snapshot_not_modified(self):
+        etag = self.client.get(self.url, **self.auth)["ETag"]
+        with self.assertNumQueries(1):
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(resp.status_code, 304)
+        Auction.objects.filter(pk=self.auction.pk).update(status=Auction.Status.RUNNING)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/auctions/{self.auction.id}/pause/")
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual((resp.status_code, resp.json()["auction"]["status"]), (200, "PAUSED"))
+
+    async def test_events_unknown_auction(self):
+        with mock.patch("subasta_app.events.get_event_bus", return_value=mock.Mock()):
+            resp = await self.async_client.get(
+                "/api/auctions/999999/events/", headers={"Authorization": self.auth["HTTP_AUTHORIZATION"]},
+            )
+        self.assertEqual(resp.status_code, 404)
+
+    def test_gunicorn_config_modes(self):
+        path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py")
+        with mock.patch.dict(os.environ, {"SERVER_MODE": "asgi", "PORT": "9000"}):
+            conf = runpy.run_path(path)
+        self.assertEqual(
+            (conf["worker_class"], conf["wsgi_app"], conf["bind"]),
+            ("uvicorn_worker.UvicornWorker", "subasta_backend.asgi:application", "0.0.0.0:9000"),
+        )
+        with mock.patch.dict(os.environ, {"SERVER_MODE": "wsgi"}):
+            self.assertEqual(runpy.run_path(path)["worker_class"], "sync")
+        with mock.patch.dict(os.environ, {"SERVER_MODE": "threads"}), self.assertRaises(RuntimeError):
+            runpy.run_path(path)
+
+    def test_loadtest_needs_a_target(self):
+        with self.assertRaisesMessage(CommandError, "--spawn"):
+            call_command("loadtest_connections", stdout=StringIO(), stderr=StringIO())
+
+class BenchmarkCommandTests(ApiTestCase):
+    def run_benchmark(self, *args):
+        path = os.path.join(tempfile.mkdtemp(), "bench.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), True)
+        call_command(
+            "benchmark_api", "--auctions", "1", "--items", "2", "--bids-per-item", "1", "--participants", "2",
+            "--requests", "2", "--warmup", "0", "--import-items", "2", "--output", path, *args,
+            stdout=StringIO(), stderr=StringIO(),
+        )
+        with open(path) as f:
+            return path, json.load(f)
+
+    def test_writes_results_and_rolls_back_data(self):
+        auctions = Auction.objects.count()
+        _, results = self.run_benchmark()
+        self.assertEqual(
+            set(results["scenarios"]),
+            {"auction_list", "auction_detail", "item_list", "bid_list", "crear_subasta_api", "start_finish"},
+        )
+        for result in results["scenarios"].values():
+            self.assertEqual(result["requests"], 2)
+            self.assertGreater(result["queries"], 0)
+        self.assertEqual(Auction.objects.count(), auctions)
+
+    def test_baseline_regression_fails(self):
+        path, results = self.run_benchmark()
+        results["scenarios"]["item_list"]["queries"] = 0
+        with open(path, "w") as f:
+            json.dump(results, f)
+        with self.assertRaisesMessage(CommandError, "metrics regressed"):
+            self.run_benchmark("--baseline", path, "--tolerance", "1000")
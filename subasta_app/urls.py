@@ -6,8 +6,8 @@ from django.conf.urls.static import static
 
 from .views import (
     AuctionViewSet, ItemViewSet, ParticipantViewSet, BidViewSet,
-    RuleViewSet, MessageTemplateViewSet, WhatsAppGroupViewSet,
-    keep_alive, crear_subasta_api,
+    RuleViewSet, MessageTemplateViewSet, WhatsAppGroupViewSet, OutboxCommandViewSet, ItemImportViewSet,
+    keep_alive, prometheus_metrics, crear_subasta_api, auction_events, auction_live, export_report,
     # Auth
     MyTokenObtainPairView, RegisterView,
 )
@@ -20,8 +20,18 @@ router.register(r"bids", BidViewSet, basename="bid")
 router.register(r"rules", RuleViewSet, basename="rule")
 router.register(r"messages", MessageTemplateViewSet, basename="message-template")
 router.register(r"whatsapp-groups", WhatsAppGroupViewSet, basename="whatsapp-group")
+router.register(r"outbox", OutboxCommandViewSet, basename="outbox-command")
+router.register(r"imports", ItemImportViewSet, basename="item-import")
 
 urlpatterns = [
+    # Feed en vivo (SSE), antes del router para que no lo tome como detail route
+    path("api/auctions/<int:auction_id>/events/", auction_events, name="auction_events"),
+    # Estado en vivo (async, con ETag)
+    path("api/auctions/<int:auction_id>/live/", auction_live, name="auction_live"),
+
+    # Exportes en streaming (CSV / XLSX)
+    path("api/exports/<str:kind>.<str:fmt>", export_report, name="export_report"),
+
     # API REST principal
     path("api/", include(router.urls)),
 
@@ -30,6 +40,8 @@ urlpatterns = [
 
     # Healthcheck local
     path("keep-alive/", keep_alive, name="keep_alive"),
+    # Métricas por endpoint (Prometheus, con METRICS_TOKEN)
+    path("metrics/", prometheus_metrics, name="metrics"),
 
     # Auth (admin-only)
     path("api/auth/login/", MyTokenObtainPairView.as_view(), name="auth_login"),
@@ -0,0 +1,63 @@
+"""
+Versión por subasta para los GET condicionales (ETag / Last-Modified) de subastas e items.
+
+Auction.version sube (y Auction.updated_at se actualiza) cada vez que cambia algo de lo que
+muestran esos endpoints: la subasta, sus items (incluido el resumen de ofertas), reglas, templates
+o el grupo de WhatsApp. Los modelos lo avisan por señal (signals.py) y los UPDATE/bulk_create que
+no pasan por save llaman a `touch` a mano.
+
+Los touch de una transacción se juntan y se aplican en un solo UPDATE al confirmar: la fila de la
+subasta no se bloquea dentro de cada transacción de oferta (si no, todas las ofertas de una subasta
+se serializarían en ese lock). Como la versión se lee antes que los datos, un lector nunca guarda
+datos viejos bajo una versión nueva; como mucho, durante unos milisegundos después del commit,
+datos nuevos bajo la versión anterior.
+"""
+import threading
+from typing import Iterable, Set, Tuple
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+_state = threading.local()
+
+
+def _pending() -> Tuple[Set[int], Set[int]]:
+    if not hasattr(_state, "pending"):
+        _state.pending = (set(), set())
+    return _state.pending
+
+
+def mark_connection(connection, **kwargs):
+    """
+    Receiver de connection_created: en PostgreSQL el trigger de ofertas (migración 0014) sube la
+    versión de la subasta salvo en las conexiones marcadas como de Django, que la suben con touch.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET subasta.writer = 'django'")
+
+
+def touch(auction_ids: Iterable[int] = (), item_ids: Iterable[int] = ()):
+    """Marca como modificadas las subastas (directo o por sus items) cuando confirme la transacción."""
+    auctions, items = _pending()
+    auctions.update(a for a in auction_ids if a is not None)
+    items.update(i for i in item_ids if i is not None)
+    # Un callback por touch: si el savepoint que registró el primero hace rollback, el siguiente
+    # igual aplica todo lo pendiente (los demás encuentran el set vacío). robust: si el UPDATE falla
+    # ya se confirmó el cambio; se loguea en vez de hacer fallar (y reintentar) la operación
+    transaction.on_commit(flush, robust=True)
+
+
+def flush() -> int:
+    """Aplica los touch pendientes de este thread. Devuelve cuántas subastas cambiaron de versión."""
+    from .models import Auction, Item
+
+    auctions, items = _pending()
+    if not auctions and not items:
+        return 0
+    _state.pending = (set(), set())
+    scope = Q(pk__in=auctions)
+    if items:
+        scope |= Q(pk__in=Item.objects.filter(pk__in=items).values("auction_id"))
+    return Auction.objects.filter(scope).update(version=F("version") + 1, updated_at=timezone.now())
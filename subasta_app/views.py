@@ -1,8 +1,26 @@
 # auctions/views.py
-from django.db import transaction
+import hashlib
+import hmac
+from datetime import datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Count, F, Max, Prefetch, Q, Sum
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-
-from rest_framework import viewsets, status, permissions
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date
+from django.utils.text import compress_sequence
+from django.views.decorators.http import require_http_methods
+
+from rest_framework import viewsets, status, permissions, serializers
 from rest_framework.decorators import api_view, permission_classes, parser_classes, action
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.response import Response
@@ -11,17 +29,26 @@ from rest_framework import generics
 from django.contrib.auth.models import User
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
 from .models import (
-    Auction, Item, Participant, Bid, Rule, MessageTemplate, WhatsAppGroup
+    Auction, Item, Participant, Bid, Rule, MessageTemplate, WhatsAppGroup, OutboxCommand, ItemImport
 )
 from .serializers import (
-    AuctionSerializer, ItemSerializer, ParticipantSerializer, BidSerializer,
+    AuctionSerializer, AuctionSummarySerializer, ItemSerializer, ParticipantSerializer, BidSerializer,
     RuleSerializer, MessageTemplateSerializer, WhatsAppGroupSerializer,
-    MyTokenObtainPairSerializer, AdminRegisterSerializer
+    MyTokenObtainPairSerializer, AdminRegisterSerializer, PlaceBidSerializer, BatchBidSerializer,
+    BulkRenderSerializer, OutboxCommandSerializer, BatchItemCommandSerializer, ItemImportSerializer,
+    ParticipantUpsertSerializer,
+)
+from . import (
+    auction_config, bidbook, events, exports, item_commands, item_import, lifecycle, metrics, outbox,
+    participants, settlement, templating,
 )
-from .services import wa_start, wa_close
+from .bidding import BidRejected, place_bid, place_bids
+from .pagination import KeysetPagination
+from .services import breaker
 
 
 # Auth / Admin
@@ -46,10 +73,161 @@ class RegisterView(generics.CreateAPIView):
         )
 
 
-# Utilidades
+# Utilidades. Las vistas async (healthcheck, feed SSE, estado en vivo) son las que se consultan en
+# loop o quedan abiertas: bajo ASGI (gunicorn.conf.py con SERVER_MODE=asgi) no ocupan un worker
+# ni un thread mientras esperan. Las de escritura siguen sync (transacciones / select_for_update).
+@require_http_methods(["GET", "HEAD"])
+async def keep_alive(request):
+    snapshot = await sync_to_async(breaker.snapshot)()  # lee el cache compartido (Redis en producción)
+    return JsonResponse({"ok": True, "whatsapp_breaker": snapshot}, status=200)
+
+
+# Métricas por endpoint en formato Prometheus (metrics.py). Vista Django plana: el scraper manda
+# `Authorization: Bearer <METRICS_TOKEN>`, que no es un JWT. Sin METRICS_TOKEN el endpoint no existe.
+def prometheus_metrics(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token:
+        return JsonResponse({"ok": False, "message": "Not found"}, status=404)
+    sent = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(sent.encode(), f"Bearer {token}".encode()):
+        return JsonResponse({"ok": False, "message": "Forbidden"}, status=403)
+    return HttpResponse(metrics.registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _live_token_error(request):
+    # EventSource no permite headers, así que el JWT puede venir como ?token=
+    header = request.headers.get("Authorization", "")
+    raw_token = header[7:] if header.startswith("Bearer ") else request.GET.get("token", "")
+    try:
+        AccessToken(raw_token)  # valida firma y vencimiento, sin ir a la base
+    except TokenError:
+        return JsonResponse({"ok": False, "message": "Invalid or missing token"}, status=401)
+    return None
+
+
+# Feed en vivo (SSE) de una subasta: bid-accepted, item-sold, claim-expired, auction-status.
+# Es una vista async y solo se sirve con asgi.py: bajo WSGI Django consume el stream entero (que no
+# termina nunca) antes de responder, así que cada cliente tomaría un worker para siempre.
+@require_http_methods(["GET"])
+async def auction_events(request, auction_id):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"ok": False, "message": "Live events require the ASGI server (SERVER_MODE=asgi)"},
+                            status=503)
+    bus = events.get_event_bus()
+    if bus is None:
+        return JsonResponse({"ok": False, "message": "Live events are not configured"}, status=503)
+    denied = _live_token_error(request)
+    if denied is not None:
+        return denied
+    if not await Auction.objects.filter(pk=auction_id).aexists():
+        return JsonResponse({"ok": False, "message": "Not found"}, status=404)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    if last_event_id and not events.STREAM_ID.fullmatch(last_event_id):
+        last_event_id = None  # id que no es de un stream: desde ahora (como "$")
+
+    async def stream():
+        yield "retry: 3000\n\n"
+        async for entry in bus.listen(auction_id, last_event_id):
+            if entry is None:
+                yield ": ping\n\n"  # heartbeat para proxies
+                continue
+            event_id, event, data = entry
+            yield f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+    resp = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"
+    return resp
+
+
+LIVE_ITEM_FIELDS = (
+    "id", "name", "order", "is_sold", "sold_to", "sold_at", "claim_expires_at", "bids_count",
+    "leading_participant", "last_bid_at",
+)
+
+
+# Estado en vivo de una subasta (estado + resumen de ofertas por item), para el panel y el servicio
+# de WhatsApp que lo consultan en loop. ETag por Auction.version: sin cambios, 304 con una query.
+@require_http_methods(["GET", "HEAD"])
+async def auction_live(request, auction_id):
+    denied = _live_token_error(request)
+    if denied is not None:
+        return denied
+    auction = await (
+        Auction.objects.filter(pk=auction_id)
+        .values("id", "status", "starts_at", "ends_at", "version", "updated_at").afirst()
+    )
+    if auction is None:
+        return JsonResponse({"ok": False, "message": "Not found"}, status=404)
+
+    etag = f'W/"live-{auction["id"]}-{auction.pop("version")}"'
+    last_modified = int(auction.pop("updated_at").timestamp())
+    headers = {"ETag": etag, "Last-Modified": http_date(last_modified), "Cache-Control": "private, no-cache"}
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    items = Item.objects.filter(auction_id=auction_id).order_by("order", "id")
+    rows = [row async for row in items.values(*LIVE_ITEM_FIELDS, highest_bid=F("highest_bid_amount"))]
+    return JsonResponse({"ok": True, "auction": auction, "items": rows}, status=200, headers=headers)
+
+
+def _parse_range_bound(raw, param, end=False):
+    # Fecha sola: desde el inicio del día (since) o hasta el fin del día inclusive (until)
+    value = parse_datetime(raw)
+    if value is None:
+        day = parse_date(raw)
+        if day is None:
+            raise serializers.ValidationError({param: f"Invalid date: {raw!r}"})
+        value = datetime.combine(day + timedelta(days=1) if end else day, datetime.min.time())
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+# Exportes en streaming: /api/exports/results.csv, /api/exports/bids.xlsx, ...
+# Filtros: ?auction=1&auction=2 (o auction=1,2), ?since=2024-01-01&until=2024-01-31.
+# Con Accept-Encoding: gzip se comprime al vuelo.
 @api_view(["GET"])
-def keep_alive(request):
-    return Response(status=status.HTTP_200_OK)
+@permission_classes([IsAuthenticated])
+def export_report(request, kind, fmt):
+    if kind not in exports.EXPORTS or fmt not in ("csv", "xlsx"):
+        return Response({"ok": False, "message": "Not found"}, status=404)
+    try:
+        auction_ids = [int(a) for raw in request.GET.getlist("auction") for a in raw.split(",") if a.strip()]
+    except ValueError:
+        return Response({"ok": False, "errors": {"auction": "Must be integers"}}, status=400)
+    try:
+        since = _parse_range_bound(request.GET["since"], "since") if request.GET.get("since") else None
+        until = _parse_range_bound(request.GET["until"], "until", end=True) if request.GET.get("until") else None
+    except serializers.ValidationError as e:
+        return Response({"ok": False, "errors": e.detail}, status=400)
+
+    content = exports.export(kind, fmt, auction_ids, since, until)
+    if fmt == "csv":
+        content = (chunk.encode() for chunk in content)
+        content_type = "text/csv; charset=utf-8"
+    else:
+        content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    gzipped = "gzip" in request.headers.get("Accept-Encoding", "")
+    resp = StreamingHttpResponse(compress_sequence(content) if gzipped else content, content_type=content_type)
+    if gzipped:
+        resp["Content-Encoding"] = "gzip"
+    resp["Vary"] = "Accept-Encoding"
+    suffix = f"-{'-'.join(map(str, auction_ids))}" if auction_ids else ""
+    resp["Content-Disposition"] = f'attachment; filename="{kind}{suffix}.{fmt}"'
+    resp["X-Accel-Buffering"] = "no"
+    return resp
+
+
+def _int_or_none(raw):
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
 
 
 class BaseAdminPermission(permissions.IsAuthenticated):
@@ -58,6 +236,29 @@ class BaseAdminPermission(permissions.IsAuthenticated):
 
 class BaseViewSet(viewsets.ModelViewSet):
     permission_classes = [BaseAdminPermission]
+    pagination_class = KeysetPagination
+    # query param -> lookup del ORM, ej {"since": "created_at__gte"}. Solo sobre columnas indexadas.
+    filter_params = {}
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action != "list":
+            return qs
+        for param, lookup in self.filter_params.items():
+            raw = self.request.query_params.get(param)
+            if raw is None or raw == "":
+                continue
+            field = qs.model._meta.get_field(lookup.split("__")[0])
+            if isinstance(field, BooleanField):
+                raw = raw.lower() in ("1", "true", "yes")
+            try:
+                value = field.target_field.to_python(raw) if field.is_relation else field.to_python(raw)
+            except DjangoValidationError:
+                raise serializers.ValidationError({param: f"Invalid value: {raw!r}"})
+            if value is None:
+                raise serializers.ValidationError({param: f"Invalid value: {raw!r}"})
+            qs = qs.filter(**{lookup: value})
+        return qs
 
     def get_serializer_context(self):
         # Para que DRF construya URLs absolutas de imágenes
@@ -66,9 +267,154 @@ class BaseViewSet(viewsets.ModelViewSet):
         return ctx
 
 
-class AuctionViewSet(BaseViewSet):
+class ConditionalReadMixin:
+    """
+    GET condicional para list/retrieve a partir de Auction.version (versioning.py): una query chica
+    arma el ETag (y Last-Modified) y si el cliente ya lo tiene se responde 304 sin armar el queryset
+    ni serializar. Con API_RESPONSE_CACHE_SECONDS > 0 el payload se cachea por ETag (nunca hay que
+    invalidarlo: un cambio sube la versión y con ella la clave).
+    """
+
+    def version_state(self, request, *args, **kwargs):
+        """
+        (marca de versión, updated_at o None). None si no aplica (ej. el objeto no existe): se responde
+        normal, sin ETag. Por defecto ningún request es condicional; las vistas lo redefinen.
+        """
+        return None
+
+    def collection_state(self, auctions):
+        # Varias subastas: cantidad + suma de versiones cambian con cualquier alta, baja o cambio.
+        # Sin Last-Modified: un borrado no lo movería
+        agg = auctions.aggregate(n=Count("id"), versions=Sum("version"), last=Max("id"))
+        return f"{agg['n']}-{agg['versions'] or 0}-{agg['last'] or 0}", None
+
+    def auction_state(self, auctions):
+        row = auctions.values_list("id", "version", "updated_at").first()
+        if row is None:
+            return None
+        return f"a{row[0]}-{row[1]}", row[2]
+
+    def _conditional(self, request, render, *args, **kwargs):
+        state = self.version_state(request, *args, **kwargs)
+        if state is None:
+            return render(request, *args, **kwargs)
+        marker, updated_at = state
+        # La URL completa (con query string y host, que va en las URLs de las imágenes) y el formato
+        # de salida cambian la respuesta aunque la versión sea la misma
+        key = "|".join([marker, request.build_absolute_uri(), request.accepted_renderer.format])
+        etag = f'W/"{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+        last_modified = int(updated_at.timestamp()) if updated_at else None
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if last_modified is not None:
+            headers["Last-Modified"] = http_date(last_modified)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            for header, value in headers.items():
+                not_modified[header] = value
+            return not_modified
+
+        timeout = getattr(settings, "API_RESPONSE_CACHE_SECONDS", 0)
+        cache_key = f"api-response:{etag}"
+        data = cache.get(cache_key) if timeout else None
+        if data is not None:
+            return Response(data, status=200, headers=headers)
+        response = render(request, *args, **kwargs)
+        if response.status_code == 200:
+            if timeout:
+                cache.set(cache_key, response.data, timeout)
+            for header, value in headers.items():
+                response[header] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, super().retrieve, *args, **kwargs)
+
+
+class AuctionViewSet(ConditionalReadMixin, BaseViewSet):
     queryset = Auction.objects.all().select_related("wa_group")
     serializer_class = AuctionSerializer
+    cursor_ordering = ("-created_at", "-id")
+    filter_params = {"status": "status", "wa_group": "wa_group"}
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return AuctionSummarySerializer
+        return AuctionSerializer
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == "list":
+            # Todo sale de un solo JOIN con items (los montos/cantidades de ofertas ya están en Item)
+            sold = Q(items__is_sold=True)
+            return qs.annotate(
+                items_count=Count("items"),
+                sold_count=Count("items", filter=sold),
+                unsold_count=Count("items", filter=~sold),
+                bids_count=Coalesce(Sum("items__bids_count"), 0),
+                revenue=Sum("items__highest_bid_amount", filter=sold),
+            )
+        if self.action in ("retrieve", "update", "partial_update"):
+            relations = {
+                "items": Prefetch("items", queryset=Item.objects.order_by("order", "id")),
+                "rules": Prefetch("rules", queryset=Rule.objects.order_by("key")),
+                "messages": Prefetch("messages", queryset=MessageTemplate.objects.order_by("key")),
+            }
+            fields = self.request.query_params.get("fields") if self.request.method == "GET" else None
+            if fields:
+                # Con ?fields= solo prefetcheamos las relaciones pedidas
+                requested = {f.strip() for f in fields.split(",")}
+                relations = {k: v for k, v in relations.items() if k in requested}
+            qs = qs.prefetch_related(*relations.values())
+        return qs
+
+    def perform_update(self, serializer):
+        lifecycle.status_changed(serializer.save())
+
+    def version_state(self, request, *args, **kwargs):
+        if self.action == "list":
+            return None  # el listado ya es una sola query con los totales: no vale una más para el ETag
+        return self.auction_state(Auction.objects.filter(pk=_int_or_none(kwargs.get("pk"))))
+
+    # Reglas tipadas + templates para el servicio de WhatsApp, desde cache y con ETag
+    @action(detail=True, methods=["get"])
+    def config(self, request, pk=None):
+        try:
+            auction_id = int(pk)
+        except ValueError:
+            return Response({"ok": False, "message": "Not found"}, status=404)
+        bundle = auction_config.get_bundle(auction_id)
+        if bundle is None:
+            return Response({"ok": False, "message": "Not found"}, status=404)
+
+        etag = f'"{bundle["version"]}"'
+        if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+            return Response(status=304, headers={"ETag": etag})
+        return Response(bundle, status=200, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    # Carga masiva: multipart con `manifest` (CSV/JSON) + `images` (zip), o JSON {"items": [...]}.
+    # Valida todo antes de escribir; el avance se consulta en /api/imports/{id}/
+    @action(detail=True, methods=["post"], url_path="import")
+    def import_items(self, request, pk=None):
+        auction = self.get_object()
+        try:
+            manifest = request.FILES.get("manifest")
+            if manifest is not None:
+                rows = item_import.parse_manifest(manifest.read(), manifest.name)
+            else:
+                rows = item_import.from_records(request.data.get("items"))
+            images = item_import.zip_images(request.FILES["images"]) if "images" in request.FILES else {}
+        except item_import.ManifestError as e:
+            return Response({"ok": False, "message": str(e)}, status=400)
+        if not rows:
+            return Response({"ok": False, "message": "No items received"}, status=400)
+
+        job = item_import.run(auction, rows, images)
+        ok = job.status == ItemImport.Status.DONE
+        return Response({"ok": ok, "import": ItemImportSerializer(job).data}, status=201 if ok else 400)
 
     @action(detail=True, methods=["post"])
     def start(self, request, pk=None):
@@ -76,17 +422,10 @@ class AuctionViewSet(BaseViewSet):
         if auction.status == Auction.Status.RUNNING:
             return Response({"ok": True, "message": "Auction already RUNNING"}, status=200)
 
-        auction.status = Auction.Status.RUNNING
-        auction.save(update_fields=["status"])
-        try:
-            wa_resp = wa_start(auction.id)
-        except Exception as e:
-            # La subasta en Django queda RUNNING, reportamos el problema
-            return Response(
-                {"ok": False, "message": "Auction set to RUNNING, but WA start failed", "error": str(e)},
-                status=502,
-            )
-        return Response({"ok": True, "auction_id": auction.id, "wa": wa_resp}, status=200)
+        cmd = lifecycle.start(auction)
+        return Response(
+            {"ok": True, "auction_id": auction.id, "command": OutboxCommandSerializer(cmd).data}, status=202,
+        )
 
     @action(detail=True, methods=["post"])
     def pause(self, request, pk=None):
@@ -95,6 +434,7 @@ class AuctionViewSet(BaseViewSet):
             return Response({"ok": False, "message": "Auction is not RUNNING"}, status=409)
         auction.status = Auction.Status.PAUSED
         auction.save(update_fields=["status"])
+        lifecycle.status_changed(auction)
         return Response({"ok": True, "auction_id": auction.id}, status=200)
 
     @action(detail=True, methods=["post"])
@@ -103,51 +443,247 @@ class AuctionViewSet(BaseViewSet):
         if auction.status in (Auction.Status.FINISHED, Auction.Status.CANCELLED):
             return Response({"ok": True, "message": f"Auction already {auction.status}"}, status=200)
 
-        auction.status = Auction.Status.FINISHED
-        auction.ends_at = auction.ends_at or auction.created_at  # o timezone.now()
-        auction.save(update_fields=["status", "ends_at"])
+        cmd, result = lifecycle.finish(auction)
+        return Response(
+            {
+                "ok": True,
+                "auction_id": auction.id,
+                "command": OutboxCommandSerializer(cmd).data,
+                "settlement": result.as_dict(),
+            },
+            status=202,
+        )
 
-        # Avisar a Node para que cierre si corresponde
+    # Adjudicación (ganador por item). `finish` ya la corre; esto es para reintentar, es idempotente
+    @action(detail=True, methods=["post"])
+    def settle(self, request, pk=None):
+        auction = self.get_object()
         try:
-            wa_resp = wa_close(auction.id)
-        except Exception as e:
-            return Response(
-                {"ok": True, "message": "Auction finished in Django, WA close failed", "error": str(e)},
-                status=200,
-            )
-        return Response({"ok": True, "auction_id": auction.id, "wa": wa_resp}, status=200)
+            result = settlement.settle(auction)
+        except settlement.SettlementError as e:
+            return Response({"ok": False, "message": str(e)}, status=409)
+        return Response({"ok": True, "settlement": result.as_dict()}, status=200)
 
 
-class ItemViewSet(BaseViewSet):
+class ItemViewSet(ConditionalReadMixin, BaseViewSet):
     queryset = Item.objects.all().select_related("auction", "sold_to")
     serializer_class = ItemSerializer
     parser_classes = (MultiPartParser, FormParser, JSONParser)
+    cursor_ordering = ("id",)
+    filter_params = {"auction": "auction", "is_sold": "is_sold"}
+
+    def version_state(self, request, *args, **kwargs):
+        if self.action == "retrieve":
+            item = Item.objects.filter(pk=_int_or_none(kwargs.get("pk")))
+            return self.auction_state(Auction.objects.filter(pk__in=item.values("auction_id")))
+        auction_id = request.query_params.get("auction")
+        if auction_id:
+            # ?auction=abc: que el list devuelva el 400 de siempre
+            auction_id = _int_or_none(auction_id)
+            return self.auction_state(Auction.objects.filter(pk=auction_id)) if auction_id else None
+        return self.collection_state(Auction.objects.all())
+
+    # Ingreso de ofertas (lo usa Node): valida y registra en una transacción corta
+    @action(detail=True, methods=["post"], url_path="bids")
+    def place_bid(self, request, pk=None):
+        s = PlaceBidSerializer(data=request.data)
+        if not s.is_valid():
+            return Response({"ok": False, "errors": s.errors}, status=400)
+        item_id = _int_or_none(pk)
+        if item_id is None:
+            return Response({"ok": False, "code": "item_not_found", "message": "Item not found"}, status=404)
+        book = bidbook.get_bid_book()
+        if book:
+            return self._place_bid_in_book(book, item_id, s.bid_data(s.validated_data))
+        try:
+            result = place_bid(item_id, s.bid_data(s.validated_data))
+        except Item.DoesNotExist:
+            return Response({"ok": False, "code": "item_not_found", "message": "Item not found"}, status=404)
+        except BidRejected as e:
+            return Response({"ok": False, "code": e.code, "message": e.message}, status=409)
+        return Response(
+            {"ok": True, "created": result.created, "bid": BidSerializer(result.bid).data},
+            status=201 if result.created else 200,
+        )
+
+    # Comandos por item para Node (publicar, vencer el claim, anunciar ganador), muchos en un request.
+    # Se encolan en el outbox (uno por subasta) y salen con drain_outbox; el request no llama a Node.
+    # Un resultado por comando, en orden: "queued" con su outbox_id e idempotency_key, o "rejected".
+    # El resultado de Node se consulta en GET /api/outbox/{outbox_id}/ (response.results, por key)
+    @action(detail=False, methods=["post"], url_path="commands")
+    def commands(self, request):
+        s = BatchItemCommandSerializer(data=request.data)
+        if not s.is_valid():
+            return Response({"ok": False, "errors": s.errors}, status=400)
+        commands, errors = item_commands.build(s.validated_data["commands"])
+        with transaction.atomic():
+            queued = outbox.enqueue_item_commands(commands)
+        outbox_ids = {cmd.auction_id: cmd.id for cmd in queued}
+        results = [
+            {
+                "index": c["index"], "ok": True, "status": "queued", "item_id": c["item_id"], "type": c["type"],
+                "idempotency_key": c["idempotency_key"], "outbox_id": outbox_ids[c["auction_id"]],
+            }
+            for c in commands
+        ] + [{**e, "status": "rejected"} for e in errors]
+        results.sort(key=lambda r: r["index"])
+        return Response(
+            {"ok": not errors, "results": results, "commands": OutboxCommandSerializer(queued, many=True).data},
+            status=202,
+        )
+
+    def _place_bid_in_book(self, book, item_id, data):
+        # Modo Redis: se acepta/rechaza en memoria y la fila Bid se escribe luego (flush_bid_book)
+        try:
+            result = book.place(item_id, data)
+        except Item.DoesNotExist:
+            return Response({"ok": False, "code": "item_not_found", "message": "Item not found"}, status=404)
+        amount = str(result.amount) if result.amount is not None else None
+        if not result.ok:
+            return Response({"ok": False, "code": result.status, "amount": amount}, status=409)
+        return Response(
+            {"ok": True, "created": result.status == "accepted", "queued": True, "amount": amount},
+            status=202 if result.status == "accepted" else 200,
+        )
 
 
 class ParticipantViewSet(BaseViewSet):
     queryset = Participant.objects.all()
     serializer_class = ParticipantSerializer
+    cursor_ordering = ("id",)
+    filter_params = {"wa_user_id": "wa_user_id", "phone": "phone"}
+
+    # Alta/actualización masiva por wa_user_id (ej. miembros nuevos del grupo), un statement por
+    # combinación de campos. De cada participante se pisan solo los campos que trae su fila
+    @action(detail=False, methods=["post"])
+    def upsert(self, request):
+        s = ParticipantUpsertSerializer(data=request.data)
+        if not s.is_valid():
+            return Response({"ok": False, "errors": s.errors}, status=400)
+        rows = s.validated_data["participants"]
+        try:
+            with transaction.atomic():
+                ids = participants.upsert(rows, update_fields=("display_name", "phone"))
+        except IntegrityError:
+            # phone repetido con otro wa_user_id
+            return Response({"ok": False, "message": "phone already belongs to another participant"}, status=409)
+        results = [{"index": idx, "wa_user_id": row["wa_user_id"], "id": ids[row["wa_user_id"]]}
+                   for idx, row in enumerate(rows)]
+        return Response({"ok": True, "results": results}, status=200)
 
 
 class BidViewSet(BaseViewSet):
     queryset = Bid.objects.select_related("item", "participant").all()
     serializer_class = BidSerializer
-    http_method_names = ["get", "head", "options", "delete"]  # Node inserta directo; admin puede borrar si es necesario
+    cursor_ordering = ("-created_at", "-id")
+    filter_params = {
+        "item": "item",
+        "participant": "participant",
+        "since": "created_at__gte",
+        "is_valid": "is_valid",
+    }
+    http_method_names = ["get", "head", "options", "post", "delete"]  # Node inserta directo; admin puede borrar/invalidar
+
+    def create(self, request, *args, **kwargs):
+        # El POST solo se habilita para las acciones (invalidate)
+        return self.http_method_not_allowed(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            item_id = instance.item_id
+            instance.delete()
+            Item.objects.filter(pk=item_id).refresh_bid_summary()
+
+    @action(detail=True, methods=["post"])
+    def invalidate(self, request, pk=None):
+        bid = self.get_object()
+        if bid.is_valid:
+            bid.is_valid = False
+            bid.save(update_fields=["is_valid"])  # Bid.save recalcula el resumen del item
+        return Response({"ok": True, "bid_id": bid.id, "item_id": bid.item_id}, status=200)
+
+    # Variante batch de ItemViewSet.place_bid: {"bids": [{"item": 1, "amount": "150", ...}, ...]}
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        if not isinstance(request.data, dict):
+            return Response({"ok": False, "errors": {"bids": ['Expected an object: {"bids": [...]}']}}, status=400)
+        s = BatchBidSerializer(data=request.data.get("bids", []), many=True)
+        if not s.is_valid():
+            return Response({"ok": False, "errors": s.errors}, status=400)
+        # Todos los remitentes del batch (nuevos incluidos) en un solo upsert
+        senders = {a["wa_user_id"]: a.get("display_name", "") for a in s.validated_data if not a.get("participant")}
+        participant_ids = participants.resolve(senders)
+        entries = [s.child.bid_data(attrs, participant_ids) for attrs in s.validated_data]
+        book = bidbook.get_bid_book()
+        if book:
+            results = bidbook.place_bids(book, entries)
+            for r in results:
+                if r.get("amount") is not None:
+                    r["amount"] = str(r["amount"])
+            return Response({"ok": True, "queued": True, "results": results}, status=200)
+        results = place_bids(entries)
+        for r in results:
+            if "bid" in r:
+                r["bid"] = BidSerializer(r["bid"]).data
+        return Response({"ok": True, "results": results}, status=200)
 
 
 class RuleViewSet(BaseViewSet):
     queryset = Rule.objects.select_related("auction").all()
     serializer_class = RuleSerializer
+    cursor_ordering = ("id",)
+    filter_params = {"auction": "auction"}
 
 
 class MessageTemplateViewSet(BaseViewSet):
     queryset = MessageTemplate.objects.select_related("auction").all()
     serializer_class = MessageTemplateSerializer
+    cursor_ordering = ("id",)
+    filter_params = {"auction": "auction"}
+
+    # Render masivo: un template contra muchos item/participante (ej. aviso "outbid" a 200 personas)
+    @action(detail=True, methods=["post"])
+    def render(self, request, pk=None):
+        template = self.get_object()
+        s = BulkRenderSerializer(data=request.data)
+        if not s.is_valid():
+            return Response({"ok": False, "errors": s.errors}, status=400)
+        try:
+            results = templating.render_many(template, s.validated_data["contexts"])
+        except templating.TemplateSyntaxError as e:
+            # Template guardado antes de que existiera la validación
+            return Response({"ok": False, "message": str(e)}, status=409)
+        return Response(
+            {
+                "ok": True,
+                "template_id": template.id,
+                "version": templating.template_version(template.template),
+                "results": results,
+            },
+            status=200,
+        )
+
+
+class OutboxCommandViewSet(BaseViewSet):
+    # Solo lectura: para consultar el estado de un comando devuelto por start/finish
+    queryset = OutboxCommand.objects.all()
+    serializer_class = OutboxCommandSerializer
+    http_method_names = ["get", "head", "options"]
+    filter_params = {"auction": "auction", "status": "status"}
+
+
+class ItemImportViewSet(BaseViewSet):
+    # Solo lectura: avance y errores de las cargas masivas
+    queryset = ItemImport.objects.all()
+    serializer_class = ItemImportSerializer
+    http_method_names = ["get", "head", "options"]
+    filter_params = {"auction": "auction", "status": "status"}
 
 
 class WhatsAppGroupViewSet(BaseViewSet):
     queryset = WhatsAppGroup.objects.all()
     serializer_class = WhatsAppGroupSerializer
+    cursor_ordering = ("id",)
 
 
 #
@@ -162,28 +698,8 @@ class WhatsAppGroupViewSet(BaseViewSet):
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser])
 def crear_subasta_api(request):
-    productos = []
-    i = 0
-    while True:
-        key_title = f"productos[{i}][title]"
-        key_price = f"productos[{i}][price]"
-        key_image = f"productos[{i}][image]"
-        if key_title in request.data or key_price in request.data or key_image in request.data:
-            producto_data = {
-                # mapeo a Item:
-                "name": request.data.get(key_title),
-                "base_price": request.data.get(key_price),
-                "image": request.data.get(key_image),
-                "description": request.data.get(f"productos[{i}][description]", ""),
-                "increment": request.data.get(f"productos[{i}][increment]", 0),
-                "order": request.data.get(f"productos[{i}][order]", i),
-            }
-            productos.append(producto_data)
-            i += 1
-        else:
-            break
-
-    if not productos:
+    rows, images = item_import.form_rows(request.data, request.FILES)
+    if not rows:
         return Response({"error": "No products received"}, status=status.HTTP_400_BAD_REQUEST)
 
     auction_id = request.data.get("auction_id")
@@ -194,30 +710,15 @@ def crear_subasta_api(request):
         title = request.data.get("auction_title", "Untitled Auction")
         auction = Auction.objects.create(title=title)
 
-    created = 0
-    errors = []
-
-    # Usamos transaction para que o bien se creen todos los items o ninguno
-    with transaction.atomic():
-        for idx, producto_data in enumerate(productos):
-            # Inyectar FK al serializer
-            producto_data["auction"] = auction.id
-            serializer = ItemSerializer(data=producto_data)
-            if serializer.is_valid():
-                serializer.save()
-                created += 1
-            else:
-                errors.append({"index": idx, "errors": serializer.errors})
-
-        if errors:
-            # rollback
-            transaction.set_rollback(True)
-            return Response(
-                {"ok": False, "auction_id": auction.id, "created": created, "errors": errors},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    # Valida todas las filas antes de escribir; si alguna falla no se crea ningún item
+    job = item_import.run(auction, rows, images, source="form")
+    if job.status != ItemImport.Status.DONE:
+        return Response(
+            {"ok": False, "auction_id": auction.id, "created": 0, "errors": job.errors, "import_id": job.id},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
     return Response(
-        {"ok": True, "auction_id": auction.id, "created": created},
+        {"ok": True, "auction_id": auction.id, "created": job.created_items, "import_id": job.id},
         status=status.HTTP_201_CREATED,
     )
@@ -0,0 +1,98 @@
+"""
+Servidor falso del servicio de WhatsApp para desarrollo y benchmarks (sin Node ni WhatsApp).
+
+Responde POST /auctions/{id}/start|close, POST /commands/batch y GET /health con JSON, con una
+latencia simulada. Los comandos del batch se deduplican por idempotency_key, como en Node.
+HTTP/1.1 con keep-alive, así mide lo mismo que el servicio real detrás de un pool.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+_COMMAND_RE = re.compile(r"^/auctions/(\d+)/(start|close)/?$")
+_CLAIM_RE = re.compile(r"^/auctions/(\d+)/items/(\d+)/claim/?$")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers y body van en writes separados
+    latency = 0.0  # segundos por request
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._send(200, {"ok": True, "stub": True})
+        else:
+            self._send(404, {"ok": False})
+
+    def do_POST(self):
+        body = self._read_body()
+        if self.latency:
+            time.sleep(self.latency)
+        if self.path.rstrip("/") == "/commands/batch":
+            self._batch(json.loads(body or b"{}").get("commands", []))
+            return
+        m = _CLAIM_RE.match(self.path)
+        if m:
+            self._send(200, {
+                "ok": True,
+                "auction_id": int(m.group(1)),
+                "item_id": int(m.group(2)),
+                "claim_expires_at": json.loads(body or b"{}").get("claim_expires_at"),
+                "idempotency_key": self.headers.get("Idempotency-Key"),
+            })
+            return
+        m = _COMMAND_RE.match(self.path)
+        if not m:
+            self._send(404, {"ok": False})
+            return
+        self._send(200, {
+            "ok": True,
+            "auction_id": int(m.group(1)),
+            "command": m.group(2),
+            "idempotency_key": self.headers.get("Idempotency-Key"),
+        })
+
+    def _batch(self, commands):
+        results = []
+        with self.seen_lock:
+            for c in commands:
+                key = c.get("idempotency_key")
+                results.append({"idempotency_key": key, "ok": True, "duplicate": key in self.seen_keys})
+                self.seen_keys.add(key)
+        self._send(200, {"ok": True, "results": results})
+
+    def log_message(self, format, *args):
+        pass  # sin log por request
+
+
+def make_server(host: str = "127.0.0.1", port: int = 3000, latency_ms: float = 0) -> ThreadingHTTPServer:
+    handler = type("Handler", (StubHandler,), {
+        "latency": latency_ms / 1000,
+        "seen_keys": set(),
+        "seen_lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve_in_background(host: str = "127.0.0.1", port: int = 3000, latency_ms: float = 0) -> Tuple[ThreadingHTTPServer, threading.Thread]:
+    server = make_server(host, port, latency_ms)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread